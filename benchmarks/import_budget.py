@@ -0,0 +1,154 @@
+"""
+Enforce the import-time budget of the wapp CLI.
+
+Runs lightweight commands under `python -X importtime`, fails if their total
+import time exceeds the budget or if they load heavy dependencies, e.g. in CI:
+
+    python benchmarks/import_budget.py --budget_ms 100
+
+Modules the bare interpreter imports at startup are not counted.
+tests/test_import_budget.py runs the same check as part of the test suite.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Set, Tuple
+
+# Dependencies only the commands working on repositories and wheels may load
+HEAVY_MODULES = ["git", "tomlkit", "giturlparse", "build", "coloredlogs"]
+
+SCENARIOS = {
+    "help": ["-h"],
+    "cache stats": ["cache", "stats"],
+    "list": ["list"],
+    "status": ["status"],
+}
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def _parse_import_times(stderr: str) -> List[Tuple[str, int, bool]]:
+    times = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            times.append((match.group(4), int(match.group(2)), not match.group(3)))
+    return times
+
+
+def get_startup_modules(env: Dict[str, str]) -> Set[str]:
+    """
+    Get the modules imported by the interpreter before running wapp.
+
+    Returns:
+        Set[str]: The names of the modules.
+    """
+    # Running runpy without a module exits right after the startup imports
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "runpy"],
+        env=env,
+        check=False,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        encoding="utf-8",
+    )
+    return {module for module, _, _ in _parse_import_times(result.stderr)}
+
+
+def measure(
+    args: List[str], env: Dict[str, str], startup_modules: Set[str] = frozenset()
+) -> Tuple[float, Dict[str, float]]:
+    """
+    Run wapp with the given arguments and parse its import times.
+
+    Returns:
+        Tuple[float, Dict[str, float]]: The total import time and the
+        cumulative import time of each module in milliseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "wapp"] + args,
+        env=env,
+        check=False,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        encoding="utf-8",
+    )
+    total = 0.0
+    modules = {}
+    for module, cumulative_us, top_level in _parse_import_times(result.stderr):
+        cumulative = cumulative_us / 1000
+        modules[module] = cumulative
+        if top_level and module not in startup_modules:
+            total += cumulative
+    return total, modules
+
+
+def check_budget(budget_ms: float, rounds: int, verbose: bool = False) -> List[str]:
+    """
+    Measure the import time of all scenarios and check them against the
+    budget. The best of several rounds is taken to filter out the noise of
+    a loaded machine.
+
+    Args:
+        budget_ms (float): The maximum import time of each scenario.
+        rounds (int): The number of runs of each scenario.
+        verbose (bool): Print the measurements.
+
+    Returns:
+        List[str]: The violations of the budget.
+    """
+    env = dict(os.environ)
+    env["WAPP_CACHE_DIR"] = tempfile.mkdtemp(prefix="wapp-import-")
+    env["WAPP_REGISTRY"] = os.path.join(env["WAPP_CACHE_DIR"], "registry.sqlite3")
+    startup_modules = get_startup_modules(env)
+    failures = []
+    for name, wapp_args in SCENARIOS.items():
+        total, modules = min(
+            (measure(wapp_args, env, startup_modules) for _ in range(rounds)),
+            key=lambda measurement: measurement[0],
+        )
+        heavy = [module for module in HEAVY_MODULES if module in modules]
+        if verbose:
+            slowest = sorted(
+                (
+                    (ms, module)
+                    for module, ms in modules.items()
+                    if module.startswith("wapp")
+                ),
+                reverse=True,
+            )[:3]
+            print(
+                f"{name:<12} {total:7.1f} ms  slowest: "
+                + ", ".join(f"{module} {ms:.1f} ms" for ms, module in slowest)
+            )
+        if total > budget_ms:
+            failures.append(
+                f"{name}: {total:.1f} ms exceeds budget of {budget_ms:.0f} ms"
+            )
+        if heavy:
+            failures.append(f"{name}: imports {', '.join(heavy)}")
+    shutil.rmtree(env["WAPP_CACHE_DIR"], ignore_errors=True)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget_ms", type=float, default=100.0)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    failures = check_budget(args.budget_ms, args.rounds, verbose=True)
+    if failures:
+        print("Import budget violated:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
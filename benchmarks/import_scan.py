@@ -0,0 +1,72 @@
+"""
+Time scanning the imports of a wrapped repo, cold and from the cache.
+
+Generates a synthetic repository, scans it with a single process and with
+a process pool, then rescans it after changing a few modules, e.g.:
+
+    python benchmarks/import_scan.py --files 2000 --lines 300
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from wapp.filters import PathFilter
+from wapp.imports import scan_imports
+
+
+def create_module(path: Path, lines: int, seed: int):
+    """
+    Create a module importing a few packages, followed by many small functions.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("import os\nimport requests\nfrom pkg import helpers\n\n")
+        f.write(f"SEED = {seed}\n\n")
+        for i in range(lines // 3):
+            f.write(f"def function_{i}(value):\n")
+            f.write(f"    return [value * {i} for _ in range(3)]\n\n")
+
+
+def time_scan(repo_dir: Path, workers=None) -> float:
+    start = time.perf_counter()
+    scan_imports(repo_dir, PathFilter(), workers)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=300)
+    parser.add_argument("--changed", type=int, default=10)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="wapp-bench-"))
+    os.environ["WAPP_CACHE_DIR"] = str(work_dir / "cache")
+    try:
+        repo_dir = work_dir / "repo"
+        (repo_dir / "pkg").mkdir(parents=True)
+        (repo_dir / "pkg" / "__init__.py").touch()
+        for i in range(args.files):
+            create_module(repo_dir / "pkg" / f"module{i}.py", args.lines, 0)
+
+        serial = time_scan(repo_dir, workers=1)
+        print(f"cold, 1 process  {serial:8.2f} s")
+        shutil.rmtree(work_dir / "cache")
+        parallel = time_scan(repo_dir)
+        print(f"cold, {os.cpu_count()} processes {parallel:8.2f} s")
+        warm = time_scan(repo_dir)
+        print(f"warm             {warm:8.2f} s")
+
+        for i in range(args.changed):
+            create_module(repo_dir / "pkg" / f"module{i}.py", args.lines, 1)
+        rescan = time_scan(repo_dir)
+        print(f"{args.changed} changed       {rescan:8.2f} s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare the startup latency of the runpy and the bytecode launcher.
+
+Wraps a synthetic script of the given size with both launchers and times
+running each wrapper in a fresh interpreter, e.g.:
+
+    python benchmarks/launcher_startup.py --lines 5000 --runs 20
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from wapp.commands import wrap_project
+from wapp.files.wapp_config import WappConfig
+
+
+def create_script(path: Path, lines: int):
+    """
+    Create a script defining many small functions, similar to large tools.
+    """
+    path.parent.mkdir(parents=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("import sys\n\n")
+        for i in range(lines // 4):
+            f.write(f"def function_{i}(value):\n")
+            f.write(f"    result = [value * {i} for _ in range(3)]\n")
+            f.write("    return sum(result)\n\n")
+        f.write("if __name__ == '__main__':\n    sys.exit(0)\n")
+
+
+def time_runs(dest_dir: Path, runs: int) -> float:
+    env = dict(os.environ, PYTHONPATH=str(dest_dir / "src"))
+    command = [
+        sys.executable,
+        "-c",
+        "from wrapped_bench._wapp_launcher import wrapped_main_py; wrapped_main_py()",
+    ]
+    # Warm up, lets the bytecode launcher populate a missing cache
+    subprocess.run(command, env=env, check=True)
+    start = time.perf_counter()
+    for _ in range(runs):
+        subprocess.run(command, env=env, check=True)
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="wapp-bench-"))
+    try:
+        timings = {}
+        for launcher in ("runpy", "bytecode"):
+            dest_dir = work_dir / launcher
+            repo_dir = dest_dir / "src" / "wrapped_bench" / "bench"
+            create_script(repo_dir / "main.py", args.lines)
+            wapp_config = WappConfig()
+            wapp_config.launcher = launcher
+            wapp_config.scan_imports = "off"
+            wrap_project(
+                dest_dir,
+                repo_dir,
+                [],
+                "bench",
+                "0.0.1",
+                {"main.py": "main.py"},
+                wapp_config,
+            )
+            timings[launcher] = time_runs(dest_dir, args.runs)
+            print(f"{launcher:<10} {timings[launcher] * 1000:8.1f} ms per invocation")
+
+        saved = timings["runpy"] - timings["bytecode"]
+        print(f"bytecode launcher saves {saved * 1000:.1f} ms per invocation")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
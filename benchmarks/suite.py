@@ -0,0 +1,264 @@
+"""
+Time the phases of wapp against synthetic local Git repositories.
+
+Repositories of several sizes are generated with git fast-import and served
+from file:// remotes, so the suite runs offline. Results can be compared
+against a baseline file, a regression beyond the tolerance fails the run:
+
+    python benchmarks/suite.py --sizes small medium --update_baseline
+    python benchmarks/suite.py --sizes small medium
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+SIZES = {
+    "small": {"files": 200, "commits": 10, "blob_mb": 0, "scripts": 5},
+    "medium": {"files": 2000, "commits": 200, "blob_mb": 8, "scripts": 20},
+    "large": {"files": 20000, "commits": 1000, "blob_mb": 64, "scripts": 50},
+}
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+# Regressions below this many seconds are considered noise
+MIN_REGRESSION = 0.05
+
+
+class FastImport:
+    """
+    Writes a git fast-import stream into a bare repository.
+    """
+
+    def __init__(self, repo_dir: Path) -> None:
+        self.process = subprocess.Popen(
+            ["git", "fast-import", "--quiet"], cwd=repo_dir, stdin=subprocess.PIPE
+        )
+        self.timestamp = 1700000000
+
+    def _write(self, data: bytes):
+        self.process.stdin.write(data)
+
+    def commit(self, message: str, files: Dict[str, bytes], parent: str = ""):
+        self.timestamp += 60
+        header = (
+            "commit refs/heads/main\n"
+            f"committer bench <bench@example.com> {self.timestamp} +0000\n"
+            f"data {len(message)}\n{message}\n"
+        )
+        self._write(header.encode("utf-8"))
+        if parent:
+            self._write(f"from {parent}\n".encode("utf-8"))
+        for path, content in files.items():
+            mode = "100755" if content.startswith(b"#!") else "100644"
+            self._write(f"M {mode} inline {path}\ndata {len(content)}\n".encode("utf-8"))
+            self._write(content + b"\n")
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait():
+            raise RuntimeError("git fast-import failed")
+
+
+def create_remote(remote_dir: Path, files: int, commits: int, blob_mb: int, scripts: int):
+    """
+    Create a bare repository with Python modules spread over nested packages,
+    root scripts, binary blobs and a linear history.
+    """
+    subprocess.run(
+        ["git", "init", "--quiet", "--bare", "--initial-branch=main", str(remote_dir)],
+        check=True,
+    )
+    tree = {}
+    for i in range(scripts):
+        if i % 2:
+            tree[f"tool{i}"] = f"#!/usr/bin/env python\nprint({i})\n".encode("utf-8")
+        else:
+            tree[f"tool{i}.py"] = f"print({i})\n".encode("utf-8")
+    for i in range(files):
+        directory = "/".join(f"pkg{(i >> (4 * d)) % 16}" for d in range(2))
+        tree[f"{directory}/module{i}.py"] = (
+            f"def function_{i}(value):\n    return value * {i}\n" * 20
+        ).encode("utf-8")
+        tree[f"{directory}/data{i}.txt"] = b"x" * 256
+    for i in range(blob_mb):
+        tree[f"assets/blob{i}.bin"] = os.urandom(1024 * 1024)
+
+    fast_import = FastImport(remote_dir)
+    fast_import.commit("initial", tree)
+    for i in range(1, commits):
+        fast_import.commit(
+            f"change {i}", {"pkg0/pkg0/module0.py": f"VERSION = {i}\n".encode("utf-8")}
+        )
+    fast_import.close()
+
+
+def push_change(remote_dir: Path, revision: int):
+    """
+    Add a commit on top of the main branch of a bare repository.
+    """
+    fast_import = FastImport(remote_dir)
+    fast_import.timestamp += 10**6 + revision * 60
+    fast_import.commit(
+        f"update {revision}",
+        {"pkg0/pkg0/module0.py": f"UPDATE = {revision}\n".encode("utf-8")},
+        parent="refs/heads/main^0",
+    )
+    fast_import.close()
+
+
+def best_of(rounds: int, function: Callable[[int], None]) -> float:
+    timings = []
+    for i in range(rounds):
+        start = time.perf_counter()
+        function(i)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_size(work_dir: Path, size: str, rounds: int) -> Dict[str, float]:
+    # Imported late so WAPP_CACHE_DIR points into the work directory
+    import git  # pylint: disable=C0415
+
+    from wapp.argparser import create_argparser  # pylint: disable=C0415
+    from wapp.commands import wrap_project  # pylint: disable=C0415
+    from wapp.commands.create import create  # pylint: disable=C0415
+    from wapp.commands.update import update  # pylint: disable=C0415
+    from wapp.discovery import (  # pylint: disable=C0415
+        discover_python_files,
+        resolve_scripts,
+    )
+    from wapp.utils import build_wheel  # pylint: disable=C0415
+
+    parser = create_argparser()
+    remote_dir = work_dir / f"{size}.git"
+    create_remote(remote_dir, **SIZES[size])
+    url = remote_dir.as_uri()
+    results = {}
+
+    def _create(i: int, extra: List[str]):
+        dest_dir = work_dir / f"{size}-create-{extra and extra[0]}-{i}"
+        create(parser.parse_args(["create", "--dest_dir", str(dest_dir)] + extra + [url]))
+
+    results["create_cold"] = best_of(
+        1, lambda i: _create(i, ["--no_cache"])
+    )
+    results["create"] = best_of(rounds, lambda i: _create(i, ["--backend", "native"]))
+
+    dest_dir = work_dir / f"{size}-project"
+    create(parser.parse_args(["create", "--dest_dir", str(dest_dir), url]))
+    results["update_noop"] = best_of(
+        rounds, lambda i: update(parser.parse_args(["update", str(dest_dir)]))
+    )
+
+    def _update_changed(i: int):
+        push_change(remote_dir, i)
+        update(parser.parse_args(["update", str(dest_dir)]))
+
+    results["update_changed"] = best_of(rounds, _update_changed)
+
+    repo_dir = dest_dir / "src" / f"wrapped_{size}" / size
+    repo = git.Repo(repo_dir)
+    python_files = []
+
+    def _discover(_: int):
+        python_files[:] = discover_python_files(repo, use_cache=False)
+
+    results["discovery"] = best_of(rounds, _discover)
+    scripts = resolve_scripts([], python_files)
+    results["wrap_project"] = best_of(
+        rounds,
+        lambda _: wrap_project(dest_dir, repo_dir, [], size, "0.0.1", scripts),
+    )
+    for backend in ("setuptools", "native"):
+        results[f"build_wheel_{backend}"] = best_of(
+            rounds, lambda _: build_wheel(dest_dir, backend=backend)
+        )
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"  {name:<40} {seconds:8.3f}s (no baseline)")
+            continue
+        change = (seconds - reference) / reference if reference else 0.0
+        marker = ""
+        if seconds > reference * (1 + tolerance) and seconds - reference > MIN_REGRESSION:
+            marker = "  REGRESSION"
+            regressions.append(name)
+        print(f"  {name:<40} {seconds:8.3f}s {reference:8.3f}s {change:+7.1%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--update_baseline",
+        help="Store the results as new baseline instead of comparing",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--tolerance",
+        help="Allowed slowdown relative to the baseline",
+        type=float,
+        default=0.25,
+    )
+    parser.add_argument("--output", help="Write the results as JSON", type=Path)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    work_dir = Path(tempfile.mkdtemp(prefix="wapp-suite-"))
+    os.environ["WAPP_CACHE_DIR"] = str(work_dir / "cache")
+    try:
+        results = {}
+        for size in args.sizes:
+            print(f"Benchmarking {size} repository {SIZES[size]}", flush=True)
+            for name, seconds in run_size(work_dir, size, args.rounds).items():
+                results[f"{size}.{name}"] = seconds
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    if args.update_baseline:
+        baseline = {}
+        if args.baseline.is_file():
+            baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Updated baseline {args.baseline}")
+        for name, seconds in sorted(results.items()):
+            print(f"  {name:<40} {seconds:8.3f}s")
+        return
+
+    baseline = {}
+    if args.baseline.is_file():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    else:
+        print(f"No baseline at {args.baseline}, run with --update_baseline to create it")
+    print(f"  {'benchmark':<40} {'result':>9} {'baseline':>9} {'change':>7}")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed by more than {args.tolerance:.0%}:")
+        for name in regressions:
+            print(f"  {name}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare the setuptools build backend with the native wheel writer.
+
+Generates a wrapped project from a synthetic repository and times building
+its wheel with both backends, e.g.:
+
+    python benchmarks/wheel_backends.py --files 20000 --file_size 4096
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from wapp.commands import wrap_project
+from wapp.utils import build_wheel
+
+
+def create_repo(repo_dir: Path, files: int, file_size: int, depth: int):
+    """
+    Create a synthetic repository tree with files spread over nested directories.
+    """
+    repo_dir.mkdir(parents=True)
+    (repo_dir / "main.py").write_text("print('main')\n", encoding="utf-8")
+    for i in range(files):
+        directory = repo_dir.joinpath(
+            *[f"dir{(i >> (4 * d)) % 16}" for d in range(depth)]
+        )
+        directory.mkdir(parents=True, exist_ok=True)
+        content = os.urandom(file_size // 2).hex()
+        (directory / f"module{i}.py").write_text(content, encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--file_size", type=int, default=2048)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="wapp-bench-"))
+    try:
+        dest_dir = work_dir / "bench"
+        repo_dir = dest_dir / "src" / "wrapped_bench" / "bench"
+        create_repo(repo_dir, args.files, args.file_size, args.depth)
+        wrap_project(dest_dir, repo_dir, [], "bench", "0.0.1", {"main.py": "main.py"})
+
+        names = {}
+        for backend in ("setuptools", "native"):
+            timings = []
+            for _ in range(args.rounds):
+                shutil.rmtree(dest_dir / "dist", ignore_errors=True)
+                shutil.rmtree(dest_dir / "build", ignore_errors=True)
+                start = time.perf_counter()
+                wheel = build_wheel(dest_dir, backend=backend)
+                timings.append(time.perf_counter() - start)
+            with zipfile.ZipFile(wheel) as archive:
+                names[backend] = {
+                    name for name in archive.namelist() if ".dist-info/" not in name
+                }
+            print(
+                f"{backend:<10} best {min(timings):7.2f}s "
+                f"mean {sum(timings) / len(timings):7.2f}s "
+                f"size {wheel.stat().st_size / 1024 / 1024:7.1f} MiB"
+            )
+
+        if names["setuptools"] != names["native"]:
+            print("Wheel contents differ:")
+            only_setuptools = sorted(names["setuptools"] - names["native"])
+            only_native = sorted(names["native"] - names["setuptools"])
+            print("  only setuptools:", only_setuptools[:10])
+            print("  only native:", only_native[:10])
+            raise SystemExit(1)
+        print(f"Wheel contents identical ({len(names['native'])} files)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "wapp",
+    "GIT_AUTHOR_EMAIL": "wapp@localhost",
+    "GIT_COMMITTER_NAME": "wapp",
+    "GIT_COMMITTER_EMAIL": "wapp@localhost",
+    "GIT_CONFIG_NOSYSTEM": "1",
+}
+
+
+def git(cwd: Path, *args: str) -> str:
+    """
+    Run git in a directory, isolated from the user's configuration.
+    """
+    result = subprocess.run(
+        ["git", *args],
+        cwd=str(cwd),
+        env={**os.environ, **GIT_ENV},
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        encoding="utf-8",
+    )
+    return result.stdout.strip()
+
+
+def write_files(root: Path, files: Dict[str, str]):
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+
+
+def commit(repo_dir: Path, files: Dict[str, str], message: str = "update") -> str:
+    """
+    Write files into a work tree and commit them.
+
+    Returns:
+        str: The hash of the new commit.
+    """
+    write_files(repo_dir, files)
+    git(repo_dir, "add", "-A")
+    git(repo_dir, "commit", "-q", "-m", message)
+    return git(repo_dir, "rev-parse", "HEAD")
+
+
+def create_upstream(root: Path, name: str, files: Dict[str, str]) -> Path:
+    """
+    Create a bare repository holding one commit of files, standing in for a
+    remote upstream.
+
+    Returns:
+        Path: The bare repository.
+    """
+    work_dir = root / f"{name}-work"
+    work_dir.mkdir(parents=True)
+    git(work_dir, "init", "-q", "-b", "main")
+    commit(work_dir, files, "initial")
+    bare_dir = root / f"{name}.git"
+    git(root, "clone", "-q", "--bare", str(work_dir), str(bare_dir))
+    return bare_dir
+
+
+def push_upstream(bare_dir: Path, files: Dict[str, str]) -> str:
+    """
+    Commit files on top of an upstream created by create_upstream.
+
+    Returns:
+        str: The hash of the new commit.
+    """
+    work_dir = bare_dir.with_name(bare_dir.stem + "-work")
+    sha = commit(work_dir, files)
+    git(work_dir, "push", "-q", str(bare_dir), "main")
+    return sha
+
+
+def parse_args(*args: str) -> argparse.Namespace:
+    """
+    Parse a wapp command line.
+    """
+    from wapp.argparser import create_argparser  # pylint: disable=C0415
+
+    return create_argparser().parse_args(args)
+
+
+def create_project(upstream: Path, dest_dir: Path, *options: str) -> Path:
+    """
+    Wrap an upstream created by create_upstream without installing it.
+
+    Returns:
+        Path: The directory of the wrapped project.
+    """
+    from wapp.commands.create import create  # pylint: disable=C0415
+
+    create(parse_args("create", str(upstream), "--dest_dir", str(dest_dir), *options))
+    return dest_dir
+
+
+class TempDirTestCase(unittest.TestCase):
+    """
+    Runs each test in a temporary directory with caches and data redirected
+    below it.
+
+    Attributes:
+        tmp_dir (Path): The temporary directory, removed after the test.
+    """
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="wapp-test-")).resolve()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        environ = {
+            "WAPP_CACHE_DIR": str(self.tmp_dir / "cache"),
+            "WAPP_DATA_DIR": str(self.tmp_dir / "data"),
+            "WAPP_REGISTRY": str(self.tmp_dir / "registry.sqlite3"),
+        }
+        saved = {name: os.environ.get(name) for name in environ}
+        os.environ.update(environ)
+        self.addCleanup(self._restore_environ, saved)
+
+    @staticmethod
+    def _restore_environ(saved: Dict):
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def write_wheel(
+    wheel_dir: Path,
+    name: str,
+    version: str = "1.0",
+    requires: Sequence[str] = (),
+    requires_python: str = "",
+) -> Path:
+    """
+    Write a minimal pure Python wheel holding an empty module.
+
+    Returns:
+        Path: The written wheel.
+    """
+    dist_info = f"{name}-{version}.dist-info"
+    metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+    metadata += "".join(f"Requires-Dist: {requirement}\n" for requirement in requires)
+    if requires_python:
+        metadata += f"Requires-Python: {requires_python}\n"
+    files = {
+        f"{name}.py": "",
+        f"{dist_info}/METADATA": metadata,
+        f"{dist_info}/WHEEL": "Wheel-Version: 1.0\nGenerator: wapp-tests\n"
+        "Root-Is-Purelib: true\nTag: py3-none-any\n",
+    }
+    record = "".join(f"{path},,\n" for path in files) + f"{dist_info}/RECORD,,\n"
+    files[f"{dist_info}/RECORD"] = record
+
+    wheel_dir.mkdir(parents=True, exist_ok=True)
+    wheel_path = wheel_dir / f"{name}-{version}-py3-none-any.whl"
+    with zipfile.ZipFile(wheel_path, "w") as wheel:
+        for path, content in files.items():
+            wheel.writestr(path, content)
+    return wheel_path
+
+
+def write_index(index_dir: Path, wheels: List[Path]):
+    """
+    Write a local simple repository serving the given wheels.
+    """
+    links = {}  # type: Dict[str, List[str]]
+    for wheel in wheels:
+        name = wheel.name.split("-")[0]
+        links.setdefault(name, []).append(
+            f'<a href="{wheel.as_uri()}">{wheel.name}</a>\n'
+        )
+    for name, anchors in links.items():
+        page = index_dir / name / "index.html"
+        page.parent.mkdir(parents=True, exist_ok=True)
+        page.write_text("".join(anchors))
+
+
+def find_other_python() -> Optional[str]:
+    """
+    Find an installed interpreter of another minor version than the one
+    running the tests.
+
+    Returns:
+        Optional[str]: The path of the interpreter, None if there is none.
+    """
+    for minor in range(8, 15):
+        if minor == sys.version_info.minor:
+            continue
+        executable = shutil.which(f"python3.{minor}")
+        if not executable:
+            continue
+        result = subprocess.run(
+            [executable, "-c", "import sys; print(sys.executable)"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            encoding="utf-8",
+            check=False,
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+    return None
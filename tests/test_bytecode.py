@@ -0,0 +1,70 @@
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+
+from tests.helpers import TempDirTestCase, write_files
+from wapp.bytecode import compile_script, compile_tree
+from wapp.filters import PathFilter
+
+
+def cache_path(path: Path, tag: str = sys.implementation.cache_tag) -> Path:
+    return path.parent / "__pycache__" / f"{path.stem}.{tag}.pyc"
+
+
+class CompileTreeTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo_dir = self.tmp_dir / "repo"
+        write_files(
+            self.repo_dir,
+            {
+                "tool.py": "import lib.helper\n",
+                "lib/__init__.py": "",
+                "lib/helper.py": "VALUE = 1\n",
+                "tests/test_tool.py": "",
+                "bin/tool": "#!/usr/bin/env python\nprint(1)\n",
+            },
+        )
+
+    def test_compiles_packaged_modules(self):
+        report = compile_tree(self.repo_dir, PathFilter(["tests"]), workers=1)
+        self.assertEqual(report.compiled, 3)
+        self.assertFalse(report.failed)
+        self.assertTrue(cache_path(self.repo_dir / "lib" / "helper.py").is_file())
+        self.assertFalse(cache_path(self.repo_dir / "tests" / "test_tool.py").exists())
+
+    def test_removes_stale_caches(self):
+        other_tag = cache_path(self.repo_dir / "tool.py", "cpython-39")
+        removed_source = cache_path(self.repo_dir / "lib" / "removed.py")
+        excluded = cache_path(self.repo_dir / "tests" / "test_tool.py")
+        for path in (other_tag, removed_source, excluded):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"stale")
+        script_cache = compile_script(self.repo_dir / "bin" / "tool")
+
+        compile_tree(self.repo_dir, PathFilter(["tests"]), workers=1)
+        self.assertFalse(other_tag.exists())
+        self.assertFalse(removed_source.exists())
+        self.assertFalse(excluded.exists())
+        # The cache of the bytecode launcher's script is kept
+        self.assertTrue(script_cache.is_file())
+
+        cache = cache_path(self.repo_dir / "tool.py")
+        self.assertEqual(cache.read_bytes()[:4], importlib.util.MAGIC_NUMBER)
+
+    def test_compile_script_skips_unchanged_source(self):
+        script = self.repo_dir / "bin" / "tool"
+        script_cache = compile_script(script)
+        script_cache.write_bytes(script_cache.read_bytes() + b"marker")
+
+        self.assertEqual(compile_script(script), script_cache)
+        self.assertTrue(script_cache.read_bytes().endswith(b"marker"))
+
+        script.write_text("#!/usr/bin/env python\nprint(2)\n")
+        self.assertEqual(compile_script(script), script_cache)
+        self.assertFalse(script_cache.read_bytes().endswith(b"marker"))
+
+
+if __name__ == "__main__":
+    unittest.main()
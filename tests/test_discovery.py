@@ -0,0 +1,49 @@
+import unittest
+
+from tests.helpers import TempDirTestCase, create_upstream
+from wapp.cache.discovery import list_discovery_entries
+from wapp.discovery import discover_python_files, resolve_scripts
+from wapp.utils import clone_repo
+
+FILES = {
+    "tool.py": "print(1)\n",
+    "README.md": "tool\n",
+    "bin/run": "#!/usr/bin/env python3\nprint(2)\n",
+    "bin/run.sh": "#!/bin/sh\n",
+    "lib/helper.py": "VALUE = 1\n",
+    "extra/other.py": "print(3)\n",
+    "extra/script": "#!/usr/bin/python\nprint(4)\n",
+}
+
+
+class DiscoveryTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = str(create_upstream(self.tmp_dir, "tool", FILES))
+
+    def test_discovers_python_files_and_shebangs(self):
+        repo = clone_repo(self.url, self.tmp_dir / "clone")
+        python_files = discover_python_files(repo)
+        self.assertEqual(
+            python_files,
+            ["bin/run", "extra/other.py", "extra/script", "lib/helper.py", "tool.py"],
+        )
+        self.assertEqual(len(list_discovery_entries()), 1)
+        self.assertEqual(discover_python_files(repo), python_files)
+
+    def test_sparse_checkout_skips_missing_files(self):
+        repo = clone_repo(self.url, self.tmp_dir / "clone", sparse=["bin", "lib"])
+        python_files = discover_python_files(repo)
+        self.assertEqual(python_files, ["bin/run", "lib/helper.py", "tool.py"])
+        # A sparse result must not be served for the complete tree
+        self.assertEqual(list_discovery_entries(), [])
+
+        with self.assertRaisesRegex(RuntimeError, "not found"):
+            resolve_scripts(["extra/other.py"], python_files)
+        with self.assertRaisesRegex(RuntimeError, "No scripts match"):
+            resolve_scripts(["extra/*"], python_files)
+        self.assertEqual(resolve_scripts(["bin/*"], python_files), {"bin/run": "run"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from tests.helpers import TempDirTestCase, write_files
+from wapp.filters import PathFilter
+
+FILES = {
+    "tool.py": "",
+    "test/utils.py": "",
+    "docs/build.py": "",
+    "docs/index.md": "",
+    ".git/config": "",
+    "lib/.gitmodules": "",
+}
+
+
+class PathFilterTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo_dir = self.tmp_dir / "repo"
+        write_files(self.repo_dir, FILES)
+
+    def test_only_vcs_metadata_excluded_by_default(self):
+        path_filter = PathFilter()
+        self.assertEqual(
+            list(path_filter.iter_packaged(self.repo_dir)),
+            ["tool.py", "docs/build.py", "docs/index.md", "test/utils.py"],
+        )
+        self.assertTrue(path_filter.is_excluded(".git/config"))
+        self.assertTrue(path_filter.is_excluded("lib/.gitmodules"))
+
+    def test_exclude_and_include(self):
+        path_filter = PathFilter(["docs", "test"], ["docs/*.py", ".git"])
+        self.assertEqual(
+            list(path_filter.iter_packaged(self.repo_dir)),
+            ["tool.py", "docs/build.py"],
+        )
+        self.assertEqual(
+            list(path_filter.iter_excluded(self.repo_dir)),
+            ["docs/index.md", "test/utils.py"],
+        )
+        self.assertTrue(path_filter.is_excluded(".git/config"))
+
+
+if __name__ == "__main__":
+    unittest.main()
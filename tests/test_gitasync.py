@@ -0,0 +1,235 @@
+import asyncio
+import os
+import stat
+import sys
+import time
+import unittest
+from pathlib import Path
+
+from tests.helpers import (
+    TempDirTestCase,
+    create_upstream,
+    git,
+    push_upstream,
+)
+from wapp.gitasync import GitCommandError, GitEngine, get_host
+
+# Stand-in for git: fails the first $FAKE_GIT_FAILURES calls with
+# $FAKE_GIT_ERROR, sleeps for
+# $FAKE_GIT_DELAY seconds in a child process and logs start and end times
+FAKE_GIT = """#!{python}
+import os, subprocess, sys, time
+
+NETWORK_ERROR = "fatal: unable to access remote: Could not resolve host: example.com"
+
+state_dir = os.environ["FAKE_GIT_STATE"]
+calls = len(os.listdir(state_dir))
+with open(os.path.join(state_dir, f"call-{{calls}}-{{os.getpid()}}"), "w") as f:
+    f.write(f"{{time.monotonic()}}\\n")
+    f.flush()
+    if calls < int(os.environ.get("FAKE_GIT_FAILURES", "0")):
+        sys.stderr.write(os.environ.get("FAKE_GIT_ERROR", NETWORK_ERROR) + "\\n")
+        sys.exit(128)
+    sleeper = subprocess.Popen(
+        [sys.executable, "-c", "import sys, time; time.sleep(float(sys.argv[1]))",
+         os.environ.get("FAKE_GIT_DELAY", "0")]
+    )
+    with open(os.path.join(state_dir, "..", "sleeper.pid"), "w") as pid_file:
+        pid_file.write(str(sleeper.pid))
+    sleeper.wait()
+    sys.stderr.write("Receiving objects: 50%\\rReceiving objects: 100%\\n")
+    print("0123abcd\\trefs/heads/main")
+    f.write(f"{{time.monotonic()}}\\n")
+"""
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Reaped children of the test are gone, zombies of killed groups too
+    try:
+        with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+class FakeGitTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.state_dir = self.tmp_dir / "state"
+        self.state_dir.mkdir()
+        self.fake_git = self.tmp_dir / "git"
+        self.fake_git.write_text(FAKE_GIT.format(python=sys.executable))
+        self.fake_git.chmod(self.fake_git.stat().st_mode | stat.S_IXUSR)
+        self.environ = {"FAKE_GIT_STATE": str(self.state_dir)}
+        os.environ.update(self.environ)
+        self.addCleanup(self._clear_environ)
+
+    def _clear_environ(self):
+        for name in (
+            "FAKE_GIT_STATE",
+            "FAKE_GIT_FAILURES",
+            "FAKE_GIT_ERROR",
+            "FAKE_GIT_DELAY",
+        ):
+            os.environ.pop(name, None)
+
+    def engine(self, **kwargs) -> GitEngine:
+        kwargs.setdefault("backoff", 0.01)
+        engine = GitEngine(**kwargs)
+        engine.executable = str(self.fake_git)
+        return engine
+
+    def calls(self):
+        """
+        Get the start and end times of all calls of the stand-in.
+        """
+        times = []
+        for path in self.state_dir.iterdir():
+            lines = path.read_text().split()
+            end = float(lines[1]) if len(lines) > 1 else None
+            times.append((float(lines[0]), end))
+        return times
+
+    def max_concurrency(self) -> int:
+        events = []
+        for start, end in self.calls():
+            events += [(start, 1), (end, -1)]
+        running = peak = 0
+        for _, delta in sorted(events):
+            running += delta
+            peak = max(peak, running)
+        return peak
+
+    def test_retries_failed_network_command(self):
+        os.environ["FAKE_GIT_FAILURES"] = "2"
+        progress = []
+        engine = self.engine(
+            retries=2, on_progress=lambda repo_dir, line: progress.append(line)
+        )
+        output = asyncio.run(
+            engine.run(["ls-remote"], self.tmp_dir, "https://example.com/a.git")
+        )
+        self.assertEqual(output, "0123abcd\trefs/heads/main")
+        self.assertEqual(len(self.calls()), 3)
+        # stderr of every attempt is streamed, progress updates split at \r
+        self.assertEqual(len([line for line in progress if "resolve host" in line]), 2)
+        self.assertEqual(
+            progress[-2:], ["Receiving objects: 50%", "Receiving objects: 100%"]
+        )
+
+    def test_gives_up_after_retries(self):
+        os.environ["FAKE_GIT_FAILURES"] = "5"
+        engine = self.engine(retries=1)
+        with self.assertRaises(GitCommandError) as context:
+            asyncio.run(
+                engine.run(["ls-remote"], self.tmp_dir, "https://example.com/a.git")
+            )
+        self.assertEqual(context.exception.returncode, 128)
+        self.assertIn("unable to access remote", str(context.exception))
+        self.assertEqual(len(self.calls()), 2)
+
+    def test_deterministic_failures_are_not_retried(self):
+        os.environ["FAKE_GIT_FAILURES"] = "1"
+        os.environ["FAKE_GIT_ERROR"] = "fatal: couldn't find remote ref nope"
+        engine = self.engine(retries=3)
+        with self.assertRaises(GitCommandError) as context:
+            asyncio.run(
+                engine.run(["fetch"], self.tmp_dir, "https://example.com/a.git")
+            )
+        self.assertFalse(context.exception.transient)
+        self.assertEqual(len(self.calls()), 1)
+
+    def test_local_commands_are_not_retried(self):
+        os.environ["FAKE_GIT_FAILURES"] = "1"
+        with self.assertRaises(GitCommandError):
+            asyncio.run(self.engine(retries=3).run(["status"], self.tmp_dir))
+        self.assertEqual(len(self.calls()), 1)
+
+    def test_timeout_kills_process_group(self):
+        os.environ["FAKE_GIT_DELAY"] = "30"
+        engine = self.engine(timeout=1.0, retries=1)
+        start = time.monotonic()
+        with self.assertRaises(GitCommandError) as context:
+            asyncio.run(
+                engine.run(["fetch"], self.tmp_dir, "https://example.com/a.git")
+            )
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertIsNone(context.exception.returncode)
+        self.assertIn("timed out", str(context.exception))
+        # Both attempts timed out
+        self.assertEqual(len(self.calls()), 2)
+        sleeper = int((self.tmp_dir / "sleeper.pid").read_text())
+        deadline = time.monotonic() + 5
+        while is_running(sleeper) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(is_running(sleeper))
+
+    def run_all(self, engine: GitEngine, urls):
+        async def _run_all():
+            await asyncio.gather(
+                *(engine.run(["ls-remote"], self.tmp_dir, url) for url in urls)
+            )
+
+        asyncio.run(_run_all())
+
+    def test_limits_commands_per_host(self):
+        os.environ["FAKE_GIT_DELAY"] = "0.3"
+        urls = [f"https://example.com/repo{i}.git" for i in range(4)]
+        self.run_all(self.engine(jobs_per_host=2), urls)
+        self.assertEqual(len(self.calls()), 4)
+        self.assertLessEqual(self.max_concurrency(), 2)
+
+    def test_limits_commands_across_hosts(self):
+        os.environ["FAKE_GIT_DELAY"] = "0.3"
+        urls = [f"https://host{i}.example.com/repo.git" for i in range(6)]
+        self.run_all(self.engine(jobs_per_host=4, max_jobs=2), urls)
+        self.assertEqual(len(self.calls()), 6)
+        self.assertLessEqual(self.max_concurrency(), 2)
+
+
+class LocalRepoTest(TempDirTestCase):
+    def test_pull_many_repos(self):
+        clones = []
+        for i in range(6):
+            upstream = create_upstream(self.tmp_dir, f"tool{i}", {"tool.py": "1\n"})
+            clone_dir = self.tmp_dir / f"clone{i}"
+            git(self.tmp_dir, "clone", "-q", str(upstream), str(clone_dir))
+            clones.append((upstream, clone_dir))
+        new_heads = [
+            push_upstream(upstream, {"tool.py": "2\n"}) for upstream, _ in clones[:3]
+        ]
+
+        engine = GitEngine(jobs_per_host=2, max_jobs=3)
+
+        async def _update_all():
+            async def _update(upstream: Path, clone_dir: Path) -> bool:
+                remote_head = await engine.get_remote_head(clone_dir, str(upstream))
+                local_head = await engine.run(["rev-parse", "HEAD"], clone_dir)
+                if remote_head == local_head:
+                    return False
+                await engine.pull(clone_dir, str(upstream))
+                return True
+
+            return await asyncio.gather(*(_update(*clone) for clone in clones))
+
+        self.assertEqual(asyncio.run(_update_all()), [True] * 3 + [False] * 3)
+        for (_, clone_dir), new_head in zip(clones, new_heads):
+            self.assertEqual(git(clone_dir, "rev-parse", "HEAD"), new_head)
+
+
+class GetHostTest(unittest.TestCase):
+    def test_hosts(self):
+        self.assertEqual(
+            get_host("https://user@github.com:443/a/b.git"), "github.com"
+        )
+        self.assertEqual(get_host("git@github.com:a/b.git"), "github.com")
+        self.assertEqual(get_host("file:///srv/git/b.git"), "local")
+        self.assertEqual(get_host("/srv/git/b.git"), "local")
+
+
+if __name__ == "__main__":
+    unittest.main()
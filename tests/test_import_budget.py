@@ -0,0 +1,17 @@
+import os
+import unittest
+
+from benchmarks.import_budget import check_budget
+
+# CI machines may set a looser budget, the measurement is noisy on shared hosts
+IMPORT_BUDGET_MS = float(os.environ.get("WAPP_IMPORT_BUDGET_MS", "100"))
+
+
+class ImportBudgetTest(unittest.TestCase):
+    def test_lightweight_commands_within_budget(self):
+        failures = check_budget(IMPORT_BUDGET_MS, rounds=5)
+        self.assertEqual(failures, [], "\n".join(failures))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from tests.helpers import TempDirTestCase, write_files
+from wapp.files.import_hook import ImportHook, get_module_index
+from wapp.filters import PathFilter
+
+
+class ImportHookTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.site_dir = self.tmp_dir / "site"
+        # Both repos share the lib package and import it absolutely
+        for name in ("pka", "pkb"):
+            package_dir = self.site_dir / f"wrapped_{name}"
+            repo_dir = package_dir / name
+            write_files(
+                repo_dir,
+                {
+                    f"main{name[-1]}.py": (
+                        "from lib import helper\n"
+                        "import lib.helper\n"
+                        f"print('{name[-1]} main sees', helper.NAME, lib.helper.NAME)\n"
+                    ),
+                    "lib/__init__.py": "",
+                    "lib/helper.py": f"NAME = '{name[-1]}'\n",
+                    "lib/late.py": "def get_late():\n    return LATE\n",
+                },
+            )
+            modules = get_module_index(repo_dir, PathFilter())
+            ImportHook(name, modules).write(package_dir / "__init__.py")
+
+    def run_python(self, code: str) -> str:
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+            env={**os.environ, "PYTHONPATH": str(self.site_dir)},
+        )
+        return result.stdout
+
+    def test_packages_sharing_module_names(self):
+        output = self.run_python(
+            "import sys\n"
+            "import wrapped_pka.maina\n"
+            "import wrapped_pkb.mainb\n"
+            "print('lib' in sys.modules, 'lib.helper' in sys.modules)\n"
+            "print(wrapped_pka.maina.helper is wrapped_pka.lib.helper)\n"
+        )
+        self.assertEqual(
+            output.splitlines(),
+            ["a main sees a a", "b main sees b b", "False False", "True"],
+        )
+
+    def test_bare_names_not_importable_outside(self):
+        output = self.run_python(
+            "import wrapped_pka.maina\n"
+            "try:\n"
+            "    import lib\n"
+            "except ImportError:\n"
+            "    print('not importable')\n"
+        )
+        self.assertEqual(output.splitlines(), ["a main sees a a", "not importable"])
+
+    def test_builtins_are_shared(self):
+        output = self.run_python(
+            "import builtins\n"
+            "import wrapped_pka.lib.late as late\n"
+            "print(late.__builtins__ is builtins.__dict__)\n"
+            "builtins.LATE = 'late'\n"
+            "print(late.get_late())\n"
+        )
+        self.assertEqual(output.splitlines(), ["True", "late"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from tests.helpers import TempDirTestCase, create_upstream, write_files
+from wapp.discovery import get_python_tree
+from wapp.filters import PathFilter
+from wapp.imports import parse_imports, scan_imports
+from wapp.utils import clone_repo
+
+FILES = {
+    "tool.py": "import requests\nfrom lib import helper\n",
+    "lib/__init__.py": "",
+    "lib/helper.py": "try:\n    import yaml\nexcept ImportError:\n    yaml = None\n",
+}
+
+
+class ParseImportsTest(unittest.TestCase):
+    def test_import_guards(self):
+        source = (
+            b"try:\n    import yaml\nexcept (ImportError, OSError):\n    pass\n"
+            b"try:\n    import toml\nexcept ModuleNotFoundError:\n    pass\n"
+            b"try:\n    import rich\nexcept Exception:\n    pass\n"
+            b"try:\n    import tqdm\nexcept:\n    pass\n"
+        )
+        self.assertEqual(
+            parse_imports(source),
+            {"yaml": True, "toml": True, "rich": False, "tqdm": False},
+        )
+
+
+class ScanImportsTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        url = str(create_upstream(self.tmp_dir, "tool", FILES))
+        self.repo = clone_repo(url, self.tmp_dir / "clone")
+        self.repo_dir = self.tmp_dir / "clone"
+
+    def test_unchanged_tree_is_not_scanned(self):
+        tree = get_python_tree(self.repo)
+        self.assertEqual(tree, self.repo.head.commit.tree.hexsha)
+        scan = scan_imports(self.repo_dir, PathFilter(), tree=tree)
+        self.assertEqual(scan.parsed, 3)
+        self.assertEqual(scan.get_third_party(), {"requests": False, "yaml": True})
+
+        # The tree alone keys the scan, the working tree is not read again
+        write_files(self.repo_dir, {"tool.py": "import numpy\n"})
+        cached = scan_imports(self.repo_dir, PathFilter(), tree=tree)
+        self.assertEqual(cached.parsed, 0)
+        self.assertEqual(cached.scanned, 3)
+        self.assertEqual(cached.get_third_party(), scan.get_third_party())
+
+        # Other filter settings scan again
+        rescan = scan_imports(self.repo_dir, PathFilter(["lib"]), tree=tree)
+        self.assertEqual(rescan.get_third_party(), {"numpy": False})
+
+    def test_changed_python_files_have_no_tree(self):
+        write_files(self.repo_dir, {"tool.py": "import numpy\n"})
+        self.assertIsNone(get_python_tree(self.repo))
+        self.repo.git.checkout("tool.py")
+        write_files(self.repo_dir, {"build/generated.py": ""})
+        self.assertIsNone(get_python_tree(self.repo))
+        self.repo.git.clean("-fdq")
+        write_files(self.repo_dir, {"notes.txt": ""})
+        self.assertEqual(get_python_tree(self.repo), self.repo.head.commit.tree.hexsha)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests.helpers import TempDirTestCase, write_index, write_wheel
+from wapp.utils import get_data_dir, install_via_layers
+
+
+class LayeredInstallTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        dist_dir = self.tmp_dir / "dist"
+        wheels = [
+            write_wheel(dist_dir, "dep1", "1.0"),
+            write_wheel(dist_dir, "dep1", "2.0"),
+            write_wheel(dist_dir, "dep2", "1.0", requires=["dep1>=2"]),
+        ]
+        index_dir = self.tmp_dir / "simple"
+        write_index(index_dir, wheels)
+        environ = {
+            "PIP_CONFIG_FILE": os.devnull,
+            "PIP_INDEX_URL": index_dir.as_uri(),
+            "PIP_NO_CACHE_DIR": "1",
+            "WAPP_BIN_DIR": str(self.tmp_dir / "bin"),
+        }
+        patcher = mock.patch.dict(os.environ, environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def install(self, name: str, *requires: str):
+        wheel = write_wheel(self.tmp_dir / "packages", name, requires=requires)
+        requirements_path = self.tmp_dir / f"{name}-requirements.txt"
+        requirements_path.write_text("".join(f"{line}\n" for line in requires))
+        retval, output = install_via_layers(name, wheel, requirements_path, [])
+        self.assertEqual(retval, 0, output)
+
+    def get_version(self, name: str, distribution: str) -> str:
+        python = get_data_dir() / "venvs" / name / "bin" / "python"
+        code = f"import importlib.metadata as m; print(m.version('{distribution}'))"
+        return subprocess.run(
+            [str(python), "-c", code],
+            check=True,
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+        ).stdout.strip()
+
+    @staticmethod
+    def get_installed(venv_dir: Path):
+        paths = venv_dir.glob("lib/*/site-packages/*.dist-info")
+        return sorted(path.name for path in paths)
+
+    def get_base_requirements(self) -> str:
+        return (get_data_dir() / "base" / "wapp-requirements.txt").read_text()
+
+    def test_shares_base_environment(self):
+        self.install("pka", "dep1==1.0")
+        self.install("pkb", "dep1>=1.0")
+        self.assertEqual(self.get_base_requirements(), "dep1==1.0\n")
+        self.assertEqual(
+            self.get_installed(get_data_dir() / "base"), ["dep1-1.0.dist-info"]
+        )
+        # Only the package itself is installed into its venv
+        for name in ("pka", "pkb"):
+            venv_dir = get_data_dir() / "venvs" / name
+            self.assertEqual(self.get_installed(venv_dir), [f"{name}-1.0.dist-info"])
+            self.assertEqual(self.get_version(name, "dep1"), "1.0")
+
+    def test_conflicting_requirement_installed_into_venv(self):
+        self.install("pka", "dep1==1.0")
+        self.install("pkb", "dep1>=2")
+        self.assertEqual(self.get_base_requirements(), "dep1==1.0\n")
+        self.assertEqual(
+            self.get_installed(get_data_dir() / "base"), ["dep1-1.0.dist-info"]
+        )
+        self.assertEqual(self.get_version("pka", "dep1"), "1.0")
+        self.assertEqual(self.get_version("pkb", "dep1"), "2.0")
+
+    def test_base_never_upgraded(self):
+        self.install("pka", "dep1==1.0")
+        # dep2 needs dep1>=2, which would upgrade dep1 under pka
+        self.install("pkb", "dep2")
+        self.assertEqual(self.get_base_requirements(), "dep1==1.0\n")
+        self.assertEqual(
+            self.get_installed(get_data_dir() / "base"), ["dep1-1.0.dist-info"]
+        )
+        self.assertEqual(self.get_version("pka", "dep1"), "1.0")
+        self.assertEqual(self.get_version("pkb", "dep1"), "2.0")
+        self.assertEqual(self.get_version("pkb", "dep2"), "1.0")
+
+    def test_requires_pip(self):
+        python_dir = self.tmp_dir / "nopip"
+        subprocess.run(
+            [sys.executable, "-m", "venv", "--without-pip", str(python_dir)], check=True
+        )
+        python = str(python_dir / "bin" / "python")
+        with mock.patch("wapp.utils.get_installer_python", return_value=python):
+            with self.assertRaisesRegex(RuntimeError, "pip is not installed"):
+                self.install("pka", "dep1==1.0")
+
+
+if __name__ == "__main__":
+    unittest.main()
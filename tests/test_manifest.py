@@ -0,0 +1,61 @@
+import unittest
+
+from tests.helpers import TempDirTestCase, write_files
+from wapp.files.manifest import Manifest
+
+MANIFEST = """\
+[defaults]
+root = "tools"
+pipx = true
+
+[[package]]
+url = "https://github.com/dirkjanm/krbrelayx"
+dest_dir = "ad/krbrelayx"
+requires = ["impacket", "ldap3"]
+"""
+
+
+class ManifestTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        write_files(self.tmp_dir, {"manifest.toml": MANIFEST})
+        self.path = self.tmp_dir / "manifest.toml"
+
+    def test_root_is_relative_to_manifest(self):
+        manifest = Manifest.from_config(self.path)
+        self.assertEqual(manifest.root, self.tmp_dir / "tools")
+        self.assertEqual(
+            manifest.get_create_args(0),
+            [
+                "create",
+                "--pipx",
+                "--dest_dir",
+                str(self.tmp_dir / "tools" / "ad" / "krbrelayx"),
+                "--requires",
+                "impacket",
+                "ldap3",
+                "--",
+                "https://github.com/dirkjanm/krbrelayx",
+            ],
+        )
+
+    def test_rendered_manifest_keeps_root(self):
+        Manifest.from_config(self.path).write(self.path)
+        manifest = Manifest.from_config(self.path)
+        self.assertEqual(manifest.root, self.tmp_dir / "tools")
+        self.assertEqual(manifest.defaults["root"], "tools")
+
+    def test_default_root(self):
+        manifest = Manifest({"package": [{"url": "https://example.com/a"}]})
+        manifest.write(self.path)
+        self.assertNotIn("root", Manifest.from_config(self.path).defaults)
+        self.assertEqual(Manifest.from_config(self.path).root, self.tmp_dir)
+
+    def test_unknown_option(self):
+        manifest = Manifest({"package": [{"url": "https://a", "root": "/opt"}]})
+        with self.assertRaisesRegex(RuntimeError, 'Unknown option "root"'):
+            manifest.get_create_args(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import unittest
+
+from tests.helpers import (
+    TempDirTestCase,
+    commit,
+    create_upstream,
+    git,
+    push_upstream,
+)
+from wapp.cache import get_size
+from wapp.cache.mirror import (
+    get_mirror_lock,
+    get_mirror_path,
+    list_mirrors,
+    prune_mirrors,
+    update_mirror,
+)
+from wapp.utils import clone_repo
+
+
+class MirrorTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upstream = create_upstream(self.tmp_dir, "tool", {"tool.py": "print(1)\n"})
+        self.url = str(self.upstream)
+
+    def test_clone_from_mirror(self):
+        mirror_path = update_mirror(self.url)
+        self.assertEqual(mirror_path, get_mirror_path(self.url))
+        self.assertEqual(list_mirrors(), [mirror_path])
+
+        repo = clone_repo(self.url, self.tmp_dir / "clone", reference=mirror_path)
+        self.assertEqual(repo.remotes.origin.url, self.url)
+        self.assertTrue((self.tmp_dir / "clone" / "tool.py").is_file())
+
+    def test_refresh_fetches_into_existing_mirror(self):
+        mirror_path = update_mirror(self.url)
+        marker = mirror_path / "marker"
+        marker.touch()
+
+        sha = push_upstream(self.upstream, {"tool.py": "print(2)\n"})
+        self.assertEqual(update_mirror(self.url), mirror_path)
+        # The mirror was fetched into rather than cloned again
+        self.assertTrue(marker.exists())
+        self.assertEqual(git(mirror_path, "rev-parse", "main"), sha)
+
+        repo = clone_repo(self.url, self.tmp_dir / "clone", reference=mirror_path)
+        self.assertEqual(repo.head.commit.hexsha, sha)
+
+    def test_branch_clone_from_mirror(self):
+        work_dir = self.tmp_dir / "tool-work"
+        git(work_dir, "checkout", "-q", "-b", "dev")
+        commit(work_dir, {"dev.py": "print(3)\n"})
+        git(work_dir, "push", "-q", str(self.upstream), "dev")
+
+        mirror_path = update_mirror(self.url)
+        clone_repo(
+            self.url, self.tmp_dir / "clone", branch="dev", reference=mirror_path
+        )
+        self.assertTrue((self.tmp_dir / "clone" / "dev.py").is_file())
+
+    def test_prune_evicts_least_recently_used(self):
+        other = create_upstream(self.tmp_dir, "other", {"other.py": "print(1)\n"})
+        old_mirror = update_mirror(self.url)
+        new_mirror = update_mirror(str(other))
+        os.utime(old_mirror, (1, 1))
+
+        self.assertEqual(prune_mirrors(get_size(new_mirror)), [old_mirror])
+        self.assertEqual(list_mirrors(), [new_mirror])
+
+    def test_prune_keeps_requested_mirrors(self):
+        other = create_upstream(self.tmp_dir, "other", {"other.py": "print(1)\n"})
+        old_mirror = update_mirror(self.url)
+        new_mirror = update_mirror(str(other))
+        os.utime(old_mirror, (1, 1))
+
+        self.assertEqual(prune_mirrors(0, keep=[old_mirror]), [new_mirror])
+        self.assertEqual(list_mirrors(), [old_mirror])
+
+    def test_prune_skips_locked_mirrors(self):
+        other = create_upstream(self.tmp_dir, "other", {"other.py": "print(1)\n"})
+        old_mirror = update_mirror(self.url)
+        new_mirror = update_mirror(str(other))
+        os.utime(old_mirror, (1, 1))
+
+        with get_mirror_lock(old_mirror, blocking=False):
+            self.assertEqual(prune_mirrors(0), [new_mirror])
+        self.assertEqual(list_mirrors(), [old_mirror])
+
+        self.assertEqual(prune_mirrors(0), [old_mirror])
+        self.assertEqual(list_mirrors(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import logging
+import os
+import stat
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests.helpers import TempDirTestCase
+from wapp.utils import install_via_pipx, run_process
+
+# Stand-in for pipx: echoes its arguments, spawns a child which outlives it
+# unless its process group is killed, then sleeps for $FAKE_PIPX_DELAY
+FAKE_PIPX = """#!{python}
+import os, subprocess, sys, time
+
+print("args:", " ".join(sys.argv[1:]), flush=True)
+child = subprocess.Popen(
+    [sys.executable, "-c", "import time; time.sleep(60)"],
+    stdout=subprocess.DEVNULL,
+    stderr=subprocess.DEVNULL,
+)
+with open(os.environ["FAKE_PIPX_PID"], "w") as f:
+    f.write(str(child.pid))
+print("installing", flush=True)
+time.sleep(float(os.environ.get("FAKE_PIPX_DELAY", "0")))
+print("done", flush=True)
+sys.exit(int(os.environ.get("FAKE_PIPX_EXIT", "0")))
+"""
+
+
+def wait_for_exit(pid: int, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+                if f.read().split(")")[-1].split()[0] == "Z":
+                    return True
+        except OSError:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class RunProcessTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        bin_dir = self.tmp_dir / "bin"
+        bin_dir.mkdir()
+        pipx = bin_dir / "pipx"
+        pipx.write_text(FAKE_PIPX.format(python=sys.executable))
+        pipx.chmod(pipx.stat().st_mode | stat.S_IXUSR)
+        self.pid_path = self.tmp_dir / "child.pid"
+        environ = {
+            "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+            "FAKE_PIPX_PID": str(self.pid_path),
+        }
+        patcher = mock.patch.dict(os.environ, environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._kill_child)
+
+    def _kill_child(self):
+        try:
+            os.kill(int(self.pid_path.read_text()), 9)
+        except (OSError, ValueError):
+            pass
+
+    def test_streams_prefixed_output(self):
+        with self.assertLogs("wapp.utils", logging.INFO) as logs:
+            retval, output = install_via_pipx(
+                Path("/tmp/pkg"), force=True, pip_args=["--no-index"], prefix="pkg"
+            )
+        self.assertEqual(retval, 0)
+        self.assertEqual(
+            output.splitlines(),
+            [
+                "args: install --pip-args=--no-index --force /tmp/pkg",
+                "installing",
+                "done",
+            ],
+        )
+        self.assertIn("INFO:wapp.utils:  [pkg] installing", logs.output)
+
+    def test_returns_exit_code(self):
+        os.environ["FAKE_PIPX_EXIT"] = "3"
+        retval, _ = run_process(["pipx", "install", "x"])
+        self.assertEqual(retval, 3)
+
+    def test_output_is_streamed_live(self):
+        os.environ["FAKE_PIPX_DELAY"] = "2"
+        seen = []
+
+        class Handler(logging.Handler):
+            def emit(self, record):
+                seen.append((time.monotonic(), record.getMessage()))
+
+        handler = Handler()
+        logger = logging.getLogger("wapp.utils")
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        logger.setLevel(logging.INFO)
+        self.addCleanup(logger.setLevel, logging.NOTSET)
+
+        run_process(["pipx", "install", "x"])
+        installing = next(t for t, message in seen if "installing" in message)
+        done = next(t for t, message in seen if "done" in message)
+        self.assertGreater(done - installing, 1)
+
+    def test_timeout_kills_process_group(self):
+        os.environ["FAKE_PIPX_DELAY"] = "60"
+        start = time.monotonic()
+        with self.assertRaisesRegex(RuntimeError, "timed out"):
+            run_process(["pipx", "install", "x"], timeout=1)
+        self.assertLess(time.monotonic() - start, 10)
+        # The grandchild spawned by the fake pipx is killed with its group
+        self.assertTrue(wait_for_exit(int(self.pid_path.read_text())))
+
+    def test_concurrent_runs_with_timeouts(self):
+        os.environ["FAKE_PIPX_DELAY"] = "0.5"
+        results = []
+
+        def _run(prefix):
+            results.append(run_process(["pipx", "install", prefix], prefix, 30))
+
+        threads = [threading.Thread(target=_run, args=(f"pkg{i}",)) for i in range(3)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([retval for retval, _ in results], [0, 0, 0])
+        # Sequential runs would take at least 1.5s
+        self.assertLess(time.monotonic() - start, 1.4)
+
+
+if __name__ == "__main__":
+    unittest.main()
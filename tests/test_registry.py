@@ -0,0 +1,88 @@
+import contextlib
+import io
+import json
+import shutil
+import unittest
+from typing import Dict, List
+
+from tests.helpers import (
+    TempDirTestCase,
+    create_project,
+    create_upstream,
+    parse_args,
+    push_upstream,
+)
+from wapp.commands.registry import list_projects, reindex, status
+from wapp.commands.update import update
+from wapp.registry import BUILT, Registry, get_registry_path
+
+
+def run_json(command, *args: str) -> List[Dict]:
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        command(parse_args(*args, "--json"))
+    return json.loads(output.getvalue())
+
+
+class RegistryTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = self.tmp_dir / "tools"
+        self.upstream = create_upstream(self.tmp_dir, "tool", {"tool.py": "print(1)\n"})
+        self.dest_dir = create_project(self.upstream, self.root / "tool")
+
+    def test_create_records_project(self):
+        with Registry() as registry:
+            entry = registry.get(self.dest_dir)
+        self.assertEqual(entry.package_name, "tool")
+        self.assertEqual(entry.url, str(self.upstream))
+        self.assertEqual(entry.scripts, {"tool.py": "tool.py"})
+        self.assertEqual(entry.install_state, BUILT)
+        wheel_name = f"tool-{entry.version}-py3-none-any.whl"
+        self.assertTrue(entry.wheel_path.endswith(wheel_name))
+
+        (result,) = run_json(list_projects, "list")
+        self.assertEqual(result["dest_dir"], str(self.dest_dir))
+        self.assertEqual(result["commit_sha"], entry.commit_sha)
+
+    def test_status_refresh_detects_new_commits(self):
+        (result,) = run_json(status, "status", "--refresh")
+        self.assertEqual(result["status"], "current")
+
+        sha = push_upstream(self.upstream, {"tool.py": "print(2)\n"})
+        # Without --refresh the last check is reported
+        (result,) = run_json(status, "status")
+        self.assertEqual(result["status"], "current")
+        (result,) = run_json(status, "status", "--refresh")
+        self.assertEqual(result["status"], "behind")
+        self.assertEqual(result["remote_head"], sha)
+
+        update(parse_args("update", str(self.dest_dir)))
+        (result,) = run_json(status, "status")
+        self.assertEqual(result["status"], "current")
+        self.assertEqual(result["commit_sha"], sha)
+
+    def test_reindex_rebuilds_registry(self):
+        other = create_upstream(self.tmp_dir, "other", {"other.py": "print(1)\n"})
+        other_dir = create_project(other, self.root / "other")
+        with Registry() as registry:
+            expected = registry.get(self.dest_dir)
+        get_registry_path().unlink()
+        self.assertEqual(run_json(list_projects, "list"), [])
+
+        reindex(parse_args("reindex", str(self.root)))
+        with Registry() as registry:
+            entries = registry.entries()
+        self.assertEqual([entry.package_name for entry in entries], ["other", "tool"])
+        entry = entries[1]
+        for field in ("url", "commit_sha", "version", "scripts", "wheel_sha256"):
+            self.assertEqual(getattr(entry, field), getattr(expected, field), field)
+
+        shutil.rmtree(other_dir)
+        reindex(parse_args("reindex", str(self.root)))
+        (result,) = run_json(list_projects, "list")
+        self.assertEqual(result["package_name"], "tool")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+from wapp.files.requirements import Requirements, RequirementsIndex
+
+
+def make_requirements(*lines: str) -> Requirements:
+    requirements = Requirements()
+    for line in lines:
+        requirements.add_dependency(line)
+    return requirements
+
+
+class ConflictsTest(unittest.TestCase):
+    def test_compatible_specifiers(self):
+        base = make_requirements("foo>=1.0", "bar==2.1", "baz~=1.4.2")
+        other = make_requirements("Foo>=1.0,<2", "bar>=2", "baz!=1.4.3")
+        self.assertEqual(base.get_conflicts(other), [])
+
+    def test_disjoint_specifiers(self):
+        base = make_requirements("foo>=2", "bar==2.1", "baz==1.*", "qux")
+        other = make_requirements("foo<2", "bar>2.1", "baz!=1.*", "qux<1")
+        self.assertEqual(base.get_conflicts(other), ["foo", "bar", "baz"])
+
+    def test_urls_and_markers(self):
+        base = make_requirements(
+            "foo @ https://example.com/foo-1.0.tar.gz",
+            'bar>=2; python_version < "3"',
+        )
+        other = make_requirements("foo @ https://example.com/foo-2.0.tar.gz", "bar<2")
+        self.assertEqual(base.get_conflicts(other), ["foo"])
+
+    def test_index_conflicts(self):
+        index = RequirementsIndex()
+        index.add("a", ["foo>=1.0", "bar>=2"])
+        index.add("b", ["foo>=1.0,<2", "bar<2"])
+        self.assertEqual(list(index.get_shared()), ["bar", "foo"])
+        self.assertEqual(
+            index.get_conflicts(), {"bar": {"bar>=2": ["a"], "bar<2": ["b"]}}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
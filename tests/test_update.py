@@ -0,0 +1,245 @@
+import json
+import threading
+import unittest
+from typing import Dict
+from unittest import mock
+
+from tests.helpers import (
+    TempDirTestCase,
+    create_project,
+    create_upstream,
+    git,
+    parse_args,
+    push_upstream,
+)
+from wapp.commands.update import WrappedProject, update
+from wapp.files.pyproject import Pyproject
+from wapp.files.wapp_config import WappConfig
+from wapp import profiling
+from wapp.gitasync import GitEngine
+from wapp.utils import DirectoryLock
+
+
+def get_version(dest_dir) -> str:
+    return Pyproject.from_config(dest_dir / "pyproject.toml").version
+
+
+class DirectoryLockTest(TempDirTestCase):
+    def test_lock_is_exclusive(self):
+        with DirectoryLock(self.tmp_dir):
+            with self.assertRaisesRegex(RuntimeError, "locked by another"):
+                DirectoryLock(self.tmp_dir).acquire()
+        with DirectoryLock(self.tmp_dir):
+            pass
+
+    def test_blocking_lock_waits_for_release(self):
+        lock = DirectoryLock(self.tmp_dir)
+        lock.acquire()
+        acquired = threading.Event()
+
+        def _wait():
+            with DirectoryLock(self.tmp_dir, blocking=True):
+                acquired.set()
+
+        thread = threading.Thread(target=_wait)
+        thread.start()
+        self.assertFalse(acquired.wait(0.2))
+        lock.release()
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+
+    def test_update_fails_on_locked_project(self):
+        upstream = create_upstream(self.tmp_dir, "tool", {"tool.py": "print(1)\n"})
+        dest_dir = create_project(upstream, self.tmp_dir / "tool")
+
+        with DirectoryLock(dest_dir):
+            with self.assertRaisesRegex(RuntimeError, "locked by another"):
+                update(parse_args("update", str(dest_dir)))
+
+    def test_update_all_skips_locked_projects(self):
+        root = self.tmp_dir / "tools"
+        upstreams = {}
+        versions = {}
+        for name in ("one", "two"):
+            upstreams[name] = create_upstream(
+                self.tmp_dir, name, {f"{name}.py": "print(1)\n"}
+            )
+            create_project(upstreams[name], root / name)
+            push_upstream(upstreams[name], {f"{name}.py": "print(2)\n"})
+            versions[name] = get_version(root / name)
+
+        with DirectoryLock(root / "one"):
+            with self.assertRaisesRegex(RuntimeError, "1 of 2 packages failed"):
+                update(parse_args("update", "--all", str(root)))
+
+        self.assertEqual(get_version(root / "one"), versions["one"])
+        self.assertNotEqual(get_version(root / "two"), versions["two"])
+
+
+class FastPathTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upstream = create_upstream(self.tmp_dir, "tool", {"tool.py": "print(1)\n"})
+        self.dest_dir = create_project(self.upstream, self.tmp_dir / "tool")
+
+    def test_unchanged_upstream_skips_pull(self):
+        project = WrappedProject(self.dest_dir)
+        with mock.patch.object(GitEngine, "pull") as pull:
+            project.pull()
+        pull.assert_not_called()
+        self.assertTrue(project.fast_path)
+        self.assertFalse(project.changed)
+
+    def test_moved_upstream_is_pulled(self):
+        sha = push_upstream(self.upstream, {"tool.py": "print(2)\n"})
+
+        project = WrappedProject(self.dest_dir)
+        project.pull()
+        self.assertFalse(project.fast_path)
+        self.assertTrue(project.changed)
+        self.assertEqual(project.repo.head.commit.hexsha, sha)
+        # The version is computed after the pull
+        self.assertTrue(project.version.endswith(sha[:7]))
+
+
+class ShallowUpdateTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        files = {"tool.py": "print(1)\n", "lib/util.py": "", "docs/big.md": "x\n"}
+        self.upstream = create_upstream(self.tmp_dir, "tool", files)
+        push_upstream(self.upstream, {"tool.py": "print(2)\n"})
+        self.dest_dir = self.tmp_dir / "tool"
+        self.repo_dir = self.dest_dir / "src" / "wrapped_tool" / "tool"
+
+    def assertShallow(self, sha: str):
+        self.assertEqual(git(self.repo_dir, "rev-parse", "HEAD"), sha)
+        self.assertEqual(
+            git(self.repo_dir, "rev-parse", "--is-shallow-repository"), "true"
+        )
+        self.assertEqual(git(self.repo_dir, "rev-list", "--count", "HEAD"), "1")
+
+    def test_shallow_clone_stays_shallow(self):
+        create_project(self.upstream, self.dest_dir, "--depth", "1")
+        sha = push_upstream(self.upstream, {"tool.py": "print(3)\n"})
+
+        update(parse_args("update", str(self.dest_dir)))
+        self.assertShallow(sha)
+        self.assertEqual((self.repo_dir / "tool.py").read_text(), "print(3)\n")
+
+    def test_sparse_checkout_survives_update(self):
+        create_project(
+            self.upstream,
+            self.dest_dir,
+            "--depth",
+            "1",
+            "--filter",
+            "blob:none",
+            "--sparse",
+            "lib",
+        )
+        self.assertFalse((self.repo_dir / "docs").exists())
+        sha = push_upstream(
+            self.upstream, {"tool.py": "print(3)\n", "docs/big.md": "y\n"}
+        )
+
+        update(parse_args("update", str(self.dest_dir)))
+        self.assertShallow(sha)
+        self.assertEqual((self.repo_dir / "tool.py").read_text(), "print(3)\n")
+        self.assertTrue((self.repo_dir / "lib" / "util.py").is_file())
+        self.assertFalse((self.repo_dir / "docs").exists())
+
+
+class ScriptDiscoveryTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        files = {"tool.py": "print(1)\n", "helper.py": ""}
+        self.upstream = create_upstream(self.tmp_dir, "tool", files)
+        self.dest_dir = create_project(self.upstream, self.tmp_dir / "tool")
+
+    def get_scripts(self) -> Dict[str, str]:
+        return WappConfig.from_config(self.dest_dir / ".wapp").scripts
+
+    def test_new_scripts_are_not_exposed(self):
+        push_upstream(self.upstream, {"other.py": "print(2)\n"})
+        with self.assertLogs("wapp.commands.update", "INFO") as logs:
+            update(parse_args("update", str(self.dest_dir)))
+        self.assertEqual(
+            self.get_scripts(), {"helper.py": "helper.py", "tool.py": "tool.py"}
+        )
+        self.assertIn("--rediscover", "\n".join(logs.output))
+
+        with self.assertLogs("wapp.commands.update", "INFO") as logs:
+            update(parse_args("update", "--rediscover", str(self.dest_dir)))
+        self.assertIn("other.py", self.get_scripts())
+        self.assertIn("Exposing new script other.py", "\n".join(logs.output))
+
+    def test_removed_scripts_are_dropped(self):
+        work_dir = self.tmp_dir / "tool-work"
+        git(work_dir, "rm", "-q", "helper.py")
+        push_upstream(self.upstream, {"tool.py": "print(2)\n"})
+
+        with self.assertLogs("wapp.commands.update", "INFO") as logs:
+            update(parse_args("update", str(self.dest_dir)))
+        self.assertEqual(self.get_scripts(), {"tool.py": "tool.py"})
+        self.assertIn("No longer exposing script helper.py", "\n".join(logs.output))
+
+
+class ProfileTest(TempDirTestCase):
+    def test_bulk_pulls_are_traced(self):
+        root = self.tmp_dir / "tools"
+        for name in ("one", "two"):
+            upstream = create_upstream(self.tmp_dir, name, {f"{name}.py": ""})
+            create_project(upstream, root / name)
+        push_upstream(upstream, {"two.py": "print(2)\n"})
+
+        trace_path = self.tmp_dir / "trace.json"
+        with mock.patch.object(profiling, "_tracer", None):
+            profiling.enable_tracing()
+            update(parse_args("update", "--all", str(root)))
+            profiling.write_trace(trace_path, [])
+        spans = json.loads(trace_path.read_text())["spans"]
+
+        names = [span["name"] for span in spans]
+        pulls = {
+            span["attributes"]["package"]: span
+            for span in spans
+            if span["name"] == "update_pull"
+        }
+        self.assertEqual(sorted(pulls), ["one", "two"])
+        self.assertTrue(pulls["one"]["attributes"]["fast_path"])
+        self.assertFalse(pulls["two"]["attributes"]["fast_path"])
+        for span in pulls.values():
+            self.assertEqual(span["parent"], names.index("update_all"))
+
+
+class EditableUpdateTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upstream = create_upstream(self.tmp_dir, "tool", {"tool.py": "print(1)\n"})
+        self.dest_dir = create_project(
+            self.upstream, self.tmp_dir / "tool", "--editable", "--scripts", "*.py"
+        )
+
+    def update(self) -> mock.Mock:
+        with mock.patch.object(
+            WrappedProject, "install", return_value="installed"
+        ) as install:
+            update(parse_args("update", "--pipx", str(self.dest_dir)))
+        self.assertFalse((self.dest_dir / "dist").exists())
+        return install
+
+    def test_code_change_updates_in_place(self):
+        push_upstream(self.upstream, {"tool.py": "print(2)\n"})
+        self.update().assert_not_called()
+
+    def test_new_script_reinstalls(self):
+        push_upstream(self.upstream, {"other.py": "print(2)\n"})
+        self.update().assert_called_once_with(self.dest_dir, True)
+
+    def test_requirements_change_reinstalls(self):
+        push_upstream(self.upstream, {"requirements.txt": "six\n"})
+        self.update().assert_called_once_with(self.dest_dir, True)
+
+
+if __name__ == "__main__":
+    unittest.main()
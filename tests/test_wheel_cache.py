@@ -0,0 +1,57 @@
+import sys
+import unittest
+from unittest import mock
+
+import git
+
+from tests.helpers import TempDirTestCase, commit, write_files, write_wheel
+from wapp.cache.wheel import get_wheel_cache_key, store_wheel
+from wapp.utils import build_wheel
+
+
+class WheelCacheKeyTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest_dir = self.tmp_dir / "tool"
+        repo_dir = self.dest_dir / "src" / "wrapped_tool" / "tool"
+        repo_dir.mkdir(parents=True)
+        git.Repo.init(repo_dir)
+        commit(repo_dir, {"tool.py": "print(1)\n"})
+        write_files(self.dest_dir, {"pyproject.toml": "", ".wapp": ""})
+        self.repo = git.Repo(repo_dir)
+
+    def test_key_ignores_interpreter_without_bytecode(self):
+        key = get_wheel_cache_key(self.dest_dir, self.repo)
+        with mock.patch.object(sys.implementation, "cache_tag", "cpython-399"):
+            self.assertEqual(get_wheel_cache_key(self.dest_dir, self.repo), key)
+
+    def test_key_covers_interpreter_with_bytecode(self):
+        key = get_wheel_cache_key(self.dest_dir, self.repo, bytecode=True)
+        self.assertEqual(
+            get_wheel_cache_key(self.dest_dir, self.repo, bytecode=True), key
+        )
+        with mock.patch.object(sys.implementation, "cache_tag", "cpython-399"):
+            self.assertNotEqual(
+                get_wheel_cache_key(self.dest_dir, self.repo, bytecode=True), key
+            )
+
+    def test_key_covers_project_files(self):
+        key = get_wheel_cache_key(self.dest_dir, self.repo)
+        write_files(self.dest_dir, {"requirements.txt": "requests\n"})
+        self.assertNotEqual(get_wheel_cache_key(self.dest_dir, self.repo), key)
+
+
+class CachedBuildTest(TempDirTestCase):
+    def test_cache_hit_replaces_other_wheel_of_same_name(self):
+        dest_dir = self.tmp_dir / "tool"
+        cached = store_wheel("key", write_wheel(self.tmp_dir / "built", "tool"))
+        stale = write_wheel(dest_dir / "dist", "tool", requires=["six"])
+        self.assertEqual(stale.name, cached.name)
+
+        wheel = build_wheel(dest_dir, "key")
+        self.assertEqual(wheel, stale)
+        self.assertEqual(wheel.read_bytes(), cached.read_bytes())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import base64
+import configparser
+import csv
+import email.parser
+import hashlib
+import io
+import shutil
+import unittest
+import zipfile
+from typing import Dict
+
+from tests.helpers import TempDirTestCase, write_files
+from wapp.commands import wrap_project
+from wapp.files.wapp_config import WappConfig
+from wapp.utils import build_wheel
+
+FILES = {
+    "tool.py": "import lib.helper\n",
+    "lib/__init__.py": "",
+    "lib/helper.py": "VALUE = 1\n",
+    "lib/data.json": "{}\n",
+    "lib/tests/test_helper.py": "",
+    "docs/index.md": "# tool\n",
+    "bin/run": "#!/usr/bin/env python\nprint(1)\n",
+    "requirements.txt": "requests>=2\n",
+}
+
+
+def read_wheel(wheel_path) -> Dict[str, bytes]:
+    with zipfile.ZipFile(wheel_path) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+class WheelWriterTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest_dir = self.tmp_dir / "tool"
+        repo_dir = self.dest_dir / "src" / "wrapped_tool" / "tool"
+        write_files(repo_dir, FILES)
+        wapp_config = WappConfig({"build": {"exclude": ["docs", "tests"]}})
+        wrap_project(
+            self.dest_dir,
+            repo_dir,
+            ["six"],
+            "tool",
+            "1.2.3",
+            {"tool.py": "tool", "bin/run": "run"},
+            wapp_config,
+        )
+
+    def build(self, backend: str) -> Dict[str, bytes]:
+        project_dir = self.tmp_dir / backend
+        shutil.copytree(self.dest_dir, project_dir)
+        return read_wheel(build_wheel(project_dir, backend=backend))
+
+    def assertRecordMatches(self, files: Dict[str, bytes]):
+        dist_info = next(name for name in files if name.endswith(".dist-info/RECORD"))
+        rows = list(csv.reader(io.StringIO(files[dist_info].decode("utf-8"))))
+        self.assertEqual(sorted(row[0] for row in rows), sorted(files))
+        for name, digest, size in rows:
+            if name == dist_info:
+                continue
+            data = files[name]
+            expected = base64.urlsafe_b64encode(hashlib.sha256(data).digest())
+            self.assertEqual(digest, "sha256=" + expected.rstrip(b"=").decode())
+            self.assertEqual(int(size), len(data))
+
+    def test_native_matches_setuptools(self):
+        setuptools_files = self.build("setuptools")
+        native_files = self.build("native")
+        self.assertEqual(sorted(native_files), sorted(setuptools_files))
+        self.assertNotIn("wrapped_tool/tool/docs/index.md", native_files)
+        self.assertNotIn("wrapped_tool/tool/lib/tests/test_helper.py", native_files)
+        self.assertRecordMatches(setuptools_files)
+        self.assertRecordMatches(native_files)
+
+        dist_info = "tool-1.2.3.dist-info/"
+        for name, data in native_files.items():
+            if not name.startswith(dist_info):
+                self.assertEqual(data, setuptools_files[name], name)
+
+        parser = email.parser.BytesParser()
+        native_metadata = parser.parsebytes(native_files[dist_info + "METADATA"])
+        setuptools_metadata = parser.parsebytes(
+            setuptools_files[dist_info + "METADATA"]
+        )
+        for field in ("Name", "Version"):
+            self.assertEqual(native_metadata[field], setuptools_metadata[field])
+        self.assertEqual(
+            sorted(native_metadata.get_all("Requires-Dist")),
+            sorted(setuptools_metadata.get_all("Requires-Dist")),
+        )
+
+        entry_points = []
+        for files in (native_files, setuptools_files):
+            parser = configparser.ConfigParser()
+            parser.read_string(files[dist_info + "entry_points.txt"].decode("utf-8"))
+            entry_points.append(dict(parser["console_scripts"]))
+        self.assertEqual(entry_points[0], entry_points[1])
+
+        self.assertEqual(
+            native_files[dist_info + "top_level.txt"].split(),
+            setuptools_files[dist_info + "top_level.txt"].split(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests.helpers import (
+    TempDirTestCase,
+    find_other_python,
+    write_files,
+    write_index,
+    write_wheel,
+)
+from wapp.cache.wheelhouse import (
+    get_pip_args,
+    get_wheelhouse_dir,
+    is_wheelhouse_complete,
+    list_wheelhouse,
+    prune_wheelhouse,
+)
+
+
+class WheelhouseTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        dist_dir = self.tmp_dir / "dist"
+        self.wheels = [
+            write_wheel(dist_dir, "alpha", requires=["beta>=1"]),
+            write_wheel(dist_dir, "beta"),
+            write_wheel(dist_dir, "modern", requires_python=">=3.99"),
+        ]
+        self.index_dir = self.tmp_dir / "simple"
+        write_index(self.index_dir, self.wheels)
+        environ = {
+            "PIP_CONFIG_FILE": os.devnull,
+            "PIP_INDEX_URL": self.index_dir.as_uri(),
+            "PIP_NO_CACHE_DIR": "1",
+        }
+        patcher = mock.patch.dict(os.environ, environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.requirements_path = self.tmp_dir / "requirements.txt"
+        write_files(self.tmp_dir, {"requirements.txt": "alpha\n"})
+
+    def test_fills_and_installs_without_index(self):
+        self.assertFalse(is_wheelhouse_complete(self.requirements_path))
+        pip_args = get_pip_args(self.requirements_path)
+        self.assertEqual(
+            pip_args, ["--no-index", "--find-links", str(get_wheelhouse_dir())]
+        )
+        names = sorted(path.name.split("-")[0] for path in list_wheelhouse())
+        self.assertEqual(names, ["alpha", "beta"])
+
+    def test_reuses_wheelhouse_without_index(self):
+        get_pip_args(self.requirements_path)
+        os.environ["PIP_INDEX_URL"] = (self.tmp_dir / "missing").as_uri()
+        pip_args = get_pip_args(self.requirements_path)
+        self.assertEqual(pip_args[0], "--no-index")
+
+    def test_incomplete_without_fill(self):
+        pip_args = get_pip_args(self.requirements_path, fill=False)
+        self.assertEqual(pip_args, ["--find-links", str(get_wheelhouse_dir())])
+        self.assertEqual(list_wheelhouse(), [])
+
+    def test_use_marks_wheels_recently_used(self):
+        get_pip_args(self.requirements_path)
+        used_size = sum(wheel.stat().st_size for wheel in list_wheelhouse())
+        stale = get_wheelhouse_dir() / "unused-1.0-py3-none-any.whl"
+        stale.write_bytes(b"stale")
+        for wheel in list_wheelhouse():
+            os.utime(wheel, (1, 1))
+
+        self.assertTrue(is_wheelhouse_complete(self.requirements_path))
+        self.assertEqual(prune_wheelhouse(used_size), [stale])
+        self.assertEqual(len(list_wheelhouse()), 2)
+
+    def test_resolves_for_target_interpreter(self):
+        write_files(self.tmp_dir, {"requirements.txt": "modern\n"})
+        get_pip_args(self.requirements_path)
+        # The wheel requires a Python version which does not exist
+        self.assertEqual(list_wheelhouse(), [])
+
+        write_wheel(get_wheelhouse_dir(), "modern", requires_python="<3.99")
+        self.assertTrue(is_wheelhouse_complete(self.requirements_path))
+
+    @unittest.skipUnless(find_other_python(), "no other Python version installed")
+    def test_resolves_with_other_interpreter(self):
+        other_python = find_other_python()
+        write_wheel(
+            get_wheelhouse_dir(),
+            "pinned",
+            requires_python=f"=={sys.version_info.major}.{sys.version_info.minor}.*",
+        )
+        write_files(self.tmp_dir, {"requirements.txt": "pinned\n"})
+        self.assertTrue(is_wheelhouse_complete(self.requirements_path))
+        self.assertFalse(
+            is_wheelhouse_complete(self.requirements_path, python=other_python)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import unittest
+from typing import Dict, Sequence
+
+from tests.helpers import TempDirTestCase, write_files
+from wapp.commands import WrapChanges, wrap_project
+from wapp.config import write_if_changed
+from wapp.files.wapp_config import WappConfig
+
+
+class WriteIfChangedTest(TempDirTestCase):
+    def test_unchanged_content_is_not_written(self):
+        path = self.tmp_dir / "file.txt"
+        self.assertTrue(write_if_changed(path, "one\n"))
+        os.utime(path, ns=(1, 1))
+
+        self.assertFalse(write_if_changed(path, "one\n"))
+        self.assertEqual(path.stat().st_mtime_ns, 1)
+
+        self.assertTrue(write_if_changed(path, "two\n"))
+        self.assertEqual(path.read_text(), "two\n")
+        self.assertEqual(os.listdir(self.tmp_dir), ["file.txt"])
+
+
+class WrapProjectTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest_dir = self.tmp_dir / "tool"
+        self.repo_dir = self.dest_dir / "src" / "wrapped_tool" / "tool"
+        write_files(self.repo_dir, {"tool.py": "print(1)\n"})
+
+    def wrap(self, version: str = "1.0", requires: Sequence[str] = ()) -> WrapChanges:
+        return wrap_project(
+            self.dest_dir,
+            self.repo_dir,
+            list(requires),
+            "tool",
+            version,
+            {"tool.py": "tool"},
+            WappConfig(),
+        )
+
+    def get_mtimes(self) -> Dict[str, int]:
+        return {
+            str(path.relative_to(self.dest_dir)): path.stat().st_mtime_ns
+            for path in self.dest_dir.rglob("*")
+            if path.is_file()
+        }
+
+    def test_rewrap_is_a_no_op(self):
+        changes = self.wrap()
+        self.assertTrue(changes)
+        self.assertEqual(
+            sorted(path.name for path in changes.written),
+            [
+                ".wapp",
+                "__init__.py",
+                "_wapp_launcher.py",
+                "pyproject.toml",
+                "requirements.txt",
+            ],
+        )
+
+        mtimes = self.get_mtimes()
+        changes = self.wrap()
+        self.assertFalse(changes)
+        self.assertEqual(self.get_mtimes(), mtimes)
+
+    def test_only_changed_files_are_written(self):
+        self.wrap()
+        changes = self.wrap(version="2.0")
+        self.assertEqual(changes.written, [self.dest_dir / "pyproject.toml"])
+        self.assertNotIn("requirements.txt", changes)
+
+        changes = self.wrap(version="2.0", requires=["six"])
+        self.assertIn("requirements.txt", changes)
+        self.assertIn("custom_requirements.txt", changes)
+
+    def test_stale_wrappers_are_removed(self):
+        self.wrap()
+        stale = self.dest_dir / "src" / "wrapped_tool" / "wrapped_tool.py"
+        stale.touch()
+
+        changes = self.wrap()
+        self.assertTrue(changes)
+        self.assertEqual(changes.written, [])
+        self.assertEqual(changes.removed, [stale])
+        self.assertFalse(stale.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import marshal
+import subprocess
+import sys
+import unittest
+
+from tests.helpers import TempDirTestCase, write_files
+from wapp.bytecode import compile_script
+from wapp.files.wrapper import LAUNCHER_MODULE, Wrapper
+
+
+class LauncherTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.package_dir = self.tmp_dir / "wrapped_tool"
+        self.repo_dir = self.package_dir / "tool"
+        write_files(
+            self.repo_dir,
+            {
+                "hello.py": "import sys\nprint('hello', *sys.argv[1:])\n",
+                "bin/run": "#!/usr/bin/env python\nprint(__name__)\n",
+            },
+        )
+
+    def launch(self, launcher: str, *args: str) -> str:
+        wrapper = Wrapper("tool", {"hello.py": "hello.py", "bin/run": "run"}, launcher)
+        launcher_path = self.package_dir / f"{LAUNCHER_MODULE}.py"
+        wrapper.write(launcher_path)
+        result = subprocess.run(
+            [sys.executable, str(launcher_path), *args],
+            check=True,
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+        )
+        return result.stdout
+
+    def test_runpy_launcher(self):
+        self.assertEqual(self.launch("runpy", "hello.py", "a"), "hello a\n")
+        self.assertEqual(self.launch("runpy", "run"), "__main__\n")
+
+    def test_bytecode_launcher_never_writes_caches(self):
+        self.assertEqual(self.launch("bytecode", "hello.py", "a"), "hello a\n")
+        self.assertEqual(self.launch("bytecode", "run"), "__main__\n")
+        self.assertFalse((self.repo_dir / "__pycache__").exists())
+        self.assertFalse((self.repo_dir / "bin" / "__pycache__").exists())
+
+    def test_bytecode_launcher_runs_shipped_cache(self):
+        cache_path = compile_script(self.repo_dir / "hello.py")
+        # Swap the code of the cache, the header still matches the source
+        data = cache_path.read_bytes()
+        code = compile("print('from cache')", "hello.py", "exec")
+        cache_path.write_bytes(data[:16] + marshal.dumps(code))
+        self.assertEqual(self.launch("bytecode", "hello.py"), "from cache\n")
+
+        # Caches of a changed source are ignored but not rewritten
+        write_files(self.repo_dir, {"hello.py": "print('changed')\n"})
+        self.assertEqual(self.launch("bytecode", "hello.py"), "changed\n")
+        self.assertEqual(cache_path.read_bytes()[16:], marshal.dumps(code))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,28 +1,37 @@
 #!/usr/bin/env python
 
 import logging
+import os
 import sys
-
-import coloredlogs
+from pathlib import Path
+from typing import Optional
 
 from wapp.argparser import create_argparser
+from wapp.profiling import enable_tracing, span, write_trace
 
 logger = logging.getLogger(__name__)
 
 
 def setup_logging(log_level=logging.INFO):
     if log_level == logging.INFO:
-        coloredlogs.DEFAULT_LOG_FORMAT = "%(message)s"
+        log_format = "%(message)s"
+    else:
+        log_format = "%(levelname)s:%(name)s: %(message)s"
+
+    # Colors are only rendered on terminals, skip loading coloredlogs otherwise
+    if sys.stderr.isatty() and not os.environ.get("NO_COLOR"):
+        import coloredlogs  # pylint: disable=C0415
+
+        coloredlogs.DEFAULT_LOG_FORMAT = log_format
+        coloredlogs.DEFAULT_FIELD_STYLES = {}
+        coloredlogs.DEFAULT_LEVEL_STYLES = {
+            "warning": {"color": "yellow"},
+            "error": {"color": "red"},
+            "critical": {"color": "red", "bold": True},
+        }
+        coloredlogs.install(level=log_level)
     else:
-        coloredlogs.DEFAULT_LOG_FORMAT = "%(levelname)s:%(name)s: %(message)s"
-
-    coloredlogs.DEFAULT_FIELD_STYLES = {}
-    coloredlogs.DEFAULT_LEVEL_STYLES = {
-        "warning": {"color": "yellow"},
-        "error": {"color": "red"},
-        "critical": {"color": "red", "bold": True},
-    }
-    coloredlogs.install(level=log_level)
+        logging.basicConfig(format=log_format, level=log_level)
     logging.getLogger().setLevel(level=log_level)
     logger.setLevel(level=log_level)
 
@@ -41,16 +50,77 @@ def main():
         )
         setup_logging(log_level)
 
-        from wapp.commands.create import create  # pylint: disable=C0415
-        from wapp.commands.update import update  # pylint: disable=C0415
-
-        command = parsed_args.command  # type: str
-        if command == "create":
-            create(parsed_args)
-        elif command == "update":
-            update(parsed_args)
-        else:
-            raise RuntimeError("Command not implemented")
+        profile_path = getattr(parsed_args, "profile", None)  # type: Optional[Path]
+        cprofile_path = getattr(parsed_args, "cprofile", None)  # type: Optional[Path]
+        if profile_path:
+            enable_tracing()
+        profiler = None
+        if cprofile_path:
+            import cProfile  # pylint: disable=C0415
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        try:
+            command = parsed_args.command  # type: str
+            with span(command):
+                # Commands are imported on demand, each pulls in different
+                # dependencies
+                if command == "create":
+                    from wapp.commands.create import create  # pylint: disable=C0415
+
+                    create(parsed_args)
+                elif command == "update":
+                    from wapp.commands.update import update  # pylint: disable=C0415
+
+                    update(parsed_args)
+                elif command == "cache":
+                    from wapp.commands.cache import cache  # pylint: disable=C0415
+
+                    cache(parsed_args)
+                elif command == "wheelhouse":
+                    from wapp.commands.wheelhouse import (  # pylint: disable=C0415
+                        wheelhouse,
+                    )
+
+                    wheelhouse(parsed_args)
+                elif command == "apply":
+                    from wapp.commands.apply import apply  # pylint: disable=C0415
+
+                    apply(parsed_args)
+                elif command == "list":
+                    from wapp.commands.registry import (  # pylint: disable=C0415
+                        list_projects,
+                    )
+
+                    list_projects(parsed_args)
+                elif command == "status":
+                    from wapp.commands.registry import (  # pylint: disable=C0415
+                        status,
+                    )
+
+                    status(parsed_args)
+                elif command == "requirements":
+                    from wapp.commands.registry import (  # pylint: disable=C0415
+                        requirements,
+                    )
+
+                    requirements(parsed_args)
+                elif command == "reindex":
+                    from wapp.commands.registry import (  # pylint: disable=C0415
+                        reindex,
+                    )
+
+                    reindex(parsed_args)
+                else:
+                    raise RuntimeError("Command not implemented")
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(str(cprofile_path))
+                logger.info("Wrote cProfile statistics to %s", cprofile_path)
+            if profile_path:
+                write_trace(profile_path, args)
 
     except RuntimeError as e:
         logger.error(e)
@@ -14,6 +14,18 @@ def create_argparser() -> argparse.ArgumentParser:
     create_parser.add_argument(
         "--debug", help="Enable debug logging", action="store_true", default=False
     )
+    create_parser.add_argument(
+        "--profile",
+        help="Write a JSON trace with the duration and measurements of each phase",
+        metavar="TRACE_FILE",
+        type=Path,
+    )
+    create_parser.add_argument(
+        "--cprofile",
+        help="Write cProfile statistics of the Python-side work of the main thread",
+        metavar="STATS_FILE",
+        type=Path,
+    )
     create_parser.add_argument(
         "--pipx",
         help="After a successful build, install via pipx",
@@ -33,11 +45,93 @@ def create_argparser() -> argparse.ArgumentParser:
     )
     create_parser.add_argument(
         "--scripts",
-        help="Script files to be exposed, can renamed by <script>:<link_name>. Defaults to all .py files in the root of the git repo",
+        help="Script files or glob patterns to be exposed, can renamed by <script>:<link_name>. Defaults to all Python files in the root of the git repo",
         nargs="*",
         type=str,
         default=[],
     )
+    create_parser.add_argument(
+        "--depth",
+        help="Create a shallow clone truncated to the given number of commits",
+        type=int,
+        default=0,
+    )
+    create_parser.add_argument(
+        "--filter",
+        help='Create a partial clone using the given filter, e.g. "blob:none"',
+        type=str,
+        default="",
+    )
+    create_parser.add_argument(
+        "--sparse",
+        help="Only check out the root files and the listed directories. Defaults to the directories of the scripts given by --scripts",
+        nargs="*",
+        type=str,
+        default=None,
+    )
+    create_parser.add_argument(
+        "--no_cache",
+        help="Clone directly from the remote instead of a local mirror and do not use cached wheels",
+        dest="cache",
+        action="store_false",
+        default=True,
+    )
+    create_parser.add_argument(
+        "--backend",
+        help="Build the wheel through the setuptools build backend or write it directly",
+        choices=["setuptools", "native"],
+        default="setuptools",
+    )
+    create_parser.add_argument(
+        "--launcher",
+        help="Run scripts via runpy, compiling them on every invocation, or from a bytecode cache built with the wheel",
+        choices=["runpy", "bytecode"],
+        default="runpy",
+    )
+    create_parser.add_argument(
+        "--editable",
+        help="Install the live checkout in editable mode instead of building a wheel, updates then only reinstall when the scripts or requirements change",
+        action="store_true",
+        default=False,
+    )
+    create_parser.add_argument(
+        "--installer",
+        help="Install with --pipx into an isolated pipx venv or layered on a venv sharing the dependencies of all layered packages",
+        choices=["pipx", "layered"],
+        default="pipx",
+    )
+    create_parser.add_argument(
+        "--compile",
+        help="Compile all packaged modules into bytecode caches shipped with the wheel",
+        action="store_true",
+        default=False,
+    )
+    create_parser.add_argument(
+        "--exclude",
+        help="Exclude matching files from the wheel, e.g. docs tests, patterns without / match names at any depth",
+        nargs="+",
+        type=str,
+        default=[],
+    )
+    create_parser.add_argument(
+        "--include",
+        help="Re-include matching files excluded by --exclude",
+        nargs="+",
+        type=str,
+        default=[],
+    )
+    create_parser.add_argument(
+        "--scan_imports",
+        help="Scan the imports of the wrapped repo and report (suggest) or add (add) requirements missing from requirements.txt",
+        choices=["off", "suggest", "add"],
+        default="suggest",
+    )
+    create_parser.add_argument(
+        "--install_timeout",
+        help="Seconds before an install is aborted, 0 waits forever",
+        type=float,
+        default=0,
+    )
     create_parser.add_argument(
         "--requires",
         help="Create requirements.txt and include listed dependency",
@@ -52,6 +146,18 @@ def create_argparser() -> argparse.ArgumentParser:
     update_parser.add_argument(
         "--debug", help="Enable debug logging", action="store_true", default=False
     )
+    update_parser.add_argument(
+        "--profile",
+        help="Write a JSON trace with the duration and measurements of each phase",
+        metavar="TRACE_FILE",
+        type=Path,
+    )
+    update_parser.add_argument(
+        "--cprofile",
+        help="Write cProfile statistics of the Python-side work of the main thread",
+        metavar="STATS_FILE",
+        type=Path,
+    )
     update_parser.add_argument(
         "--pipx",
         help="After a successful build, upgrade via pipx",
@@ -59,7 +165,234 @@ def create_argparser() -> argparse.ArgumentParser:
         default=False,
     )
     update_parser.add_argument(
-        "wrapped_dir", help="Directory containing wrapped python package", type=Path
+        "--no_cache",
+        help="Do not use cached wheels",
+        dest="cache",
+        action="store_false",
+        default=True,
+    )
+    update_parser.add_argument(
+        "--rediscover",
+        help="Resolve the exposed scripts again, exposing scripts added upstream to projects created without --scripts",
+        action="store_true",
+        default=False,
+    )
+    update_parser.add_argument(
+        "wrapped_dir",
+        help="Directory containing wrapped python package",
+        nargs="?",
+        type=Path,
+    )
+    update_parser.add_argument(
+        "--all",
+        help="Update every wrapped python package found below the given root directories",
+        dest="roots",
+        metavar="ROOT",
+        nargs="+",
+        type=Path,
+        default=[],
+    )
+    update_parser.add_argument(
+        "--jobs",
+        help="Number of repositories pulled concurrently per host with --all",
+        type=int,
+        default=8,
+    )
+    update_parser.add_argument(
+        "--git_jobs",
+        help="Number of repositories pulled concurrently across all hosts with --all",
+        type=int,
+        default=32,
+    )
+    update_parser.add_argument(
+        "--install_jobs",
+        help="Number of packages installed concurrently with --all",
+        type=int,
+        default=2,
+    )
+    update_parser.add_argument(
+        "--install_timeout",
+        help="Seconds before an install is aborted, 0 waits forever",
+        type=float,
+        default=0,
+    )
+    update_parser.add_argument(
+        "--git_timeout",
+        help="Seconds before a Git command is aborted, failed fetches are retried with backoff",
+        type=float,
+        default=300.0,
+    )
+    update_parser.add_argument(
+        "--build_jobs",
+        help="Number of wheels built and installed concurrently with --all",
+        type=int,
+        default=2,
+    )
+
+    cache_parser = subparsers.add_parser("cache", help="manage local caches")
+    cache_subparsers = cache_parser.add_subparsers(
+        dest="cache_command", required=True
+    )
+    cache_subparsers.add_parser("stats", help="show size of local caches")
+    prune_parser = cache_subparsers.add_parser(
+        "prune", help="evict least recently used cache entries"
+    )
+    prune_parser.add_argument(
+        "--max_size",
+        help='Maximum size of each cache, e.g. "500M". Defaults to the configured cache sizes, 0 clears the caches',
+        type=str,
+    )
+
+    wheelhouse_parser = subparsers.add_parser(
+        "wheelhouse", help="manage the local wheelhouse of dependencies"
+    )
+    wheelhouse_subparsers = wheelhouse_parser.add_subparsers(
+        dest="wheelhouse_command", required=True
+    )
+    prefetch_parser = wheelhouse_subparsers.add_parser(
+        "prefetch",
+        help="download or build the dependencies of all wrapped python packages found below the given root directories",
+    )
+    prefetch_parser.add_argument(
+        "--debug", help="Enable debug logging", action="store_true", default=False
+    )
+    prefetch_parser.add_argument(
+        "roots",
+        help="Directories containing wrapped python packages",
+        metavar="ROOT",
+        nargs="+",
+        type=Path,
+    )
+    prefetch_parser.add_argument(
+        "--jobs",
+        help="Number of requirement sets fetched concurrently",
+        type=int,
+        default=4,
+    )
+
+    apply_parser = subparsers.add_parser(
+        "apply", help="create all python packages listed in a manifest"
+    )
+    apply_parser.add_argument(
+        "--debug", help="Enable debug logging", action="store_true", default=False
+    )
+    apply_parser.add_argument(
+        "--profile",
+        help="Write a JSON trace with the duration and measurements of each phase",
+        metavar="TRACE_FILE",
+        type=Path,
+    )
+    apply_parser.add_argument(
+        "manifest", help="TOML manifest listing the repos to be wrapped", type=Path
+    )
+    apply_parser.add_argument(
+        "--clone_jobs",
+        help="Number of repos cloned concurrently",
+        type=int,
+        default=4,
+    )
+    apply_parser.add_argument(
+        "--build_jobs",
+        help="Number of packages discovered, wrapped and built concurrently",
+        type=int,
+        default=2,
+    )
+    apply_parser.add_argument(
+        "--install_jobs",
+        help="Number of packages installed concurrently",
+        type=int,
+        default=1,
+    )
+    apply_parser.add_argument(
+        "--install_timeout",
+        help="Seconds before an install is aborted, 0 waits forever",
+        type=float,
+        default=0,
+    )
+    apply_parser.add_argument(
+        "--state",
+        help="Checkpoint file recording completed stages. Defaults to <manifest>.state.json",
+        type=Path,
+    )
+    apply_parser.add_argument(
+        "--report",
+        help="JSON report of the run. Defaults to <manifest>.report.json",
+        type=Path,
+    )
+    apply_parser.add_argument(
+        "--restart",
+        help="Ignore the checkpoints of previous runs",
+        action="store_true",
+        default=False,
+    )
+
+    list_parser = subparsers.add_parser(
+        "list", help="list registered wrapped python packages"
+    )
+    list_parser.add_argument(
+        "--scripts", help="Also list the exposed scripts", action="store_true"
+    )
+    list_parser.add_argument(
+        "--json", help="Print the registry entries as JSON", action="store_true"
+    )
+
+    status_parser = subparsers.add_parser(
+        "status",
+        help="show which wrapped python packages are behind upstream as of the last check",
+    )
+    status_parser.add_argument(
+        "--refresh",
+        help="Query the upstream of every package before reporting",
+        action="store_true",
+    )
+    status_parser.add_argument(
+        "--jobs",
+        help="Number of upstreams queried concurrently per host with --refresh",
+        type=int,
+        default=8,
+    )
+    status_parser.add_argument(
+        "--git_jobs",
+        help="Number of upstreams queried concurrently across all hosts with --refresh",
+        type=int,
+        default=32,
+    )
+    status_parser.add_argument(
+        "--git_timeout",
+        help="Seconds before a Git command is aborted, failed queries are retried with backoff",
+        type=float,
+        default=60.0,
+    )
+    status_parser.add_argument(
+        "--json", help="Print the registry entries as JSON", action="store_true"
+    )
+
+    requirements_parser = subparsers.add_parser(
+        "requirements",
+        help="show the dependencies shared by several registered wrapped python packages",
+    )
+    requirements_parser.add_argument(
+        "--conflicts",
+        help="Only show dependencies pinned incompatibly by different packages",
+        action="store_true",
+    )
+    requirements_parser.add_argument(
+        "--json", help="Print the shared dependencies as JSON", action="store_true"
+    )
+
+    reindex_parser = subparsers.add_parser(
+        "reindex",
+        help="rebuild the registry from the wrapped python packages found below the given root directories",
+    )
+    reindex_parser.add_argument(
+        "--debug", help="Enable debug logging", action="store_true", default=False
+    )
+    reindex_parser.add_argument(
+        "roots",
+        help="Directories containing wrapped python packages",
+        metavar="ROOT",
+        nargs="+",
+        type=Path,
     )
 
     return parser
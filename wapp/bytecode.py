@@ -0,0 +1,195 @@
+import importlib.util
+import logging
+import os
+import py_compile
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from wapp.filters import PathFilter
+from wapp.profiling import set_attribute, traced
+
+logger = logging.getLogger(__name__)
+
+# Below this number of modules compiling inline beats spawning workers
+MIN_PARALLEL_MODULES = 32
+
+
+def _is_current_cache(cache_path: str, source: bytes) -> bool:
+    # Checked-hash header: magic number, flags 0b11 and the source hash
+    try:
+        with open(cache_path, "rb") as f:
+            header = f.read(16)
+    except OSError:
+        return False
+    return (
+        header[:4] == importlib.util.MAGIC_NUMBER
+        and int.from_bytes(header[4:8], "little") == 0b11
+        and header[8:] == importlib.util.source_hash(source)
+    )
+
+
+def compile_script(path: Path) -> Optional[Path]:
+    """
+    Compile a script into its checked-hash bytecode cache, as used by the
+    bytecode launcher. Checked-hash caches stay valid when the wheel is
+    installed, because they do not depend on file modification times. The
+    script is only compiled if the source hash of the existing cache differs.
+
+    Args:
+        path (Path): The path to the script.
+
+    Returns:
+        Optional[Path]: The path to the bytecode cache, or None if the script
+        failed to compile.
+    """
+    cache_path = importlib.util.cache_from_source(str(path))
+    try:
+        if _is_current_cache(cache_path, path.read_bytes()):
+            return Path(cache_path)
+    except OSError:
+        pass
+    try:
+        py_compile.compile(
+            str(path),
+            cfile=cache_path,
+            doraise=True,
+            invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH,
+        )
+    except py_compile.PyCompileError as e:
+        logger.warning("Failed to compile %s: %s", path, e.msg)
+        return None
+    return Path(cache_path)
+
+
+class CompileReport:
+    """
+    Outcome of compiling a wrapped tree ahead of time.
+
+    Attributes:
+        compiled (int): The number of compiled modules.
+        failed (List[Tuple[str, str]]): Modules failing to compile and the reason.
+        elapsed (float): Wall-clock seconds spent compiling.
+        compile_time (float): Seconds spent compiling summed over all modules,
+            the compilation work saved on a cold start.
+    """
+
+    def __init__(self) -> None:
+        self.compiled = 0
+        self.failed = []  # type: List[Tuple[str, str]]
+        self.elapsed = 0.0
+        self.compile_time = 0.0
+
+
+def _compile_module(path: str) -> Tuple[str, float, Optional[str]]:
+    start = time.perf_counter()
+    try:
+        py_compile.compile(
+            path,
+            cfile=importlib.util.cache_from_source(path),
+            doraise=True,
+            invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH,
+        )
+    except py_compile.PyCompileError as e:
+        return path, time.perf_counter() - start, f"{e.exc_type_name}: {e.exc_value}"
+    except OSError as e:
+        return path, time.perf_counter() - start, str(e)
+    return path, time.perf_counter() - start, None
+
+
+def _is_stale_cache(path: Path, modules: Set[str]) -> bool:
+    # Caches of other interpreters, of modules excluded from the wheel and
+    # of removed sources are packaged as dead weight
+    tag = sys.implementation.cache_tag
+    name = path.name[: -len(".pyc")]
+    if "." not in name and name.endswith(tag):
+        # Scripts without suffix, as compiled for the bytecode launcher
+        return not (path.parent.parent / name[: -len(tag)]).is_file()
+    if name.split(".")[1:2] != [tag]:
+        return True
+    return importlib.util.source_from_cache(str(path)) not in modules
+
+
+def remove_stale_caches(repo_dir: Path, modules: Set[str]) -> int:
+    """
+    Remove bytecode caches not produced for the packaged modules by this
+    interpreter, e.g. caches of a checkout that was run in place.
+
+    Args:
+        repo_dir (Path): The directory containing the wrapped repo.
+        modules (Set[str]): The paths of all packaged modules.
+
+    Returns:
+        int: The number of removed caches.
+    """
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(repo_dir):
+        dirnames[:] = [d for d in dirnames if d != ".git"]
+        if os.path.basename(dirpath) != "__pycache__":
+            continue
+        for filename in filenames:
+            path = Path(dirpath, filename)
+            if path.suffix == ".pyc" and _is_stale_cache(path, modules):
+                path.unlink()
+                removed += 1
+    return removed
+
+
+@traced("compile_tree")
+def compile_tree(
+    repo_dir: Path, path_filter: PathFilter, workers: Optional[int] = None
+) -> CompileReport:
+    """
+    Compile all packaged Python modules of a wrapped repo into checked-hash
+    bytecode caches using a process pool. Modules failing to compile are
+    reported but do not abort the build. Stale caches are removed first, so
+    only caches usable by this interpreter are packaged.
+
+    Args:
+        repo_dir (Path): The directory containing the wrapped repo.
+        path_filter (PathFilter): Decides which files are packaged.
+        workers (Optional[int]): The number of worker processes, defaults to
+            the number of CPUs.
+
+    Returns:
+        CompileReport: The outcome of the compilation.
+    """
+    modules = [
+        os.path.join(repo_dir, path)
+        for path in path_filter.iter_packaged(repo_dir)
+        if path.endswith(".py")
+    ]
+
+    report = CompileReport()
+    start = time.perf_counter()
+    removed = remove_stale_caches(repo_dir, set(modules))
+    if removed:
+        logger.info("Removed %d stale bytecode caches", removed)
+    if len(modules) < MIN_PARALLEL_MODULES or workers == 1:
+        results = list(map(_compile_module, modules))
+    else:
+        from concurrent.futures import ProcessPoolExecutor  # pylint: disable=C0415
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_compile_module, modules, chunksize=16))
+
+    for path, compile_time, error in results:
+        report.compile_time += compile_time
+        if error:
+            report.failed.append((os.path.relpath(path, repo_dir), error))
+        else:
+            report.compiled += 1
+    report.elapsed = time.perf_counter() - start
+    set_attribute("modules", report.compiled)
+    set_attribute("failed", len(report.failed))
+
+    logger.info(
+        "Compiled %d modules in %.2fs, saving up to %.2fs of compilation on a cold start",
+        report.compiled,
+        report.elapsed,
+        report.compile_time,
+    )
+    for path, error in report.failed:
+        logger.warning("  Failed to compile %s: %s", path, error)
+    return report
@@ -0,0 +1,156 @@
+import logging
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Callable, ContextManager, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_dir() -> Path:
+    """
+    Get the root directory of all wapp caches.
+
+    Defaults to $XDG_CACHE_HOME/wapp and can be overridden by $WAPP_CACHE_DIR.
+
+    Returns:
+        Path: The cache directory.
+    """
+    cache_dir = os.environ.get("WAPP_CACHE_DIR")
+    if cache_dir:
+        return Path(cache_dir)
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+    if xdg_cache_home:
+        return Path(xdg_cache_home) / "wapp"
+    return Path.home() / ".cache" / "wapp"
+
+
+def parse_size(size: str) -> int:
+    """
+    Parse a human readable size like "512M" or "5G" into bytes.
+
+    Args:
+        size (str): The size, optionally suffixed by K, M, G or T.
+
+    Returns:
+        int: The size in bytes.
+    """
+    result = re.match(
+        r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", size, re.IGNORECASE
+    )
+    if not result:
+        raise ValueError(f'Invalid size "{size}"')
+    exponent = " KMGT".index(result.group(2).upper() or " ")
+    return int(float(result.group(1)) * 1024**exponent)
+
+
+def format_size(size: int) -> str:
+    """
+    Format a size in bytes as human readable string.
+
+    Args:
+        size (int): The size in bytes.
+
+    Returns:
+        str: The formatted size, e.g. "1.5 MiB".
+    """
+    value = float(size)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TiB"
+
+
+def get_size(path: Path) -> int:
+    """
+    Get the disk usage of a file or a directory tree.
+
+    Args:
+        path (Path): The file or directory.
+
+    Returns:
+        int: The total size of all files in bytes.
+    """
+    if path.is_file():
+        return path.stat().st_size
+
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+def touch_entry(path: Path):
+    """
+    Mark a cache entry as recently used.
+
+    Args:
+        path (Path): The file or directory of the cache entry.
+    """
+    os.utime(path)
+
+
+def remove_entry(path: Path):
+    """
+    Remove a cache entry.
+
+    Args:
+        path (Path): The file or directory of the cache entry.
+    """
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def prune_lru(
+    entries: List[Path],
+    max_size: int,
+    keep: Optional[List[Path]] = None,
+    lock: Optional[Callable[[Path], ContextManager]] = None,
+) -> List[Path]:
+    """
+    Remove the least recently used cache entries until the total size of
+    the remaining entries does not exceed max_size.
+
+    Args:
+        entries (List[Path]): The files or directories of the cache entries.
+        max_size (int): The maximum total size in bytes.
+        keep (Optional[List[Path]]): Entries which must not be removed.
+        lock (Optional[Callable[[Path], ContextManager]]): Returns a
+            non-blocking lock of an entry, held while removing it. Entries
+            whose lock is held by another process are skipped.
+
+    Returns:
+        List[Path]: The removed cache entries.
+    """
+    keep = keep or []
+    sizes = {entry: get_size(entry) for entry in entries}
+    total_size = sum(sizes.values())
+
+    removed = []
+    for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+        if total_size <= max_size:
+            break
+        if entry in keep:
+            continue
+        if lock is None:
+            logger.debug("Evicting %s from cache", entry)
+            remove_entry(entry)
+        else:
+            try:
+                with lock(entry):
+                    logger.debug("Evicting %s from cache", entry)
+                    remove_entry(entry)
+            except RuntimeError:
+                logger.debug("Not evicting %s, it is in use", entry)
+                continue
+        total_size -= sizes[entry]
+        removed.append(entry)
+    return removed
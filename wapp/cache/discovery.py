@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from wapp.cache import get_cache_dir, parse_size, prune_lru, touch_entry
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_CACHE_SIZE = os.environ.get("WAPP_DISCOVERY_CACHE_SIZE", "64M")
+
+# Bump when the detection of Python files changes
+DISCOVERY_VERSION = 1
+
+
+def get_discovery_cache_dir() -> Path:
+    """
+    Get the directory containing the cached script discovery results.
+
+    Returns:
+        Path: The discovery cache directory.
+    """
+    return get_cache_dir() / "discovery"
+
+
+def _get_entry_path(tree: str) -> Path:
+    return get_discovery_cache_dir() / f"{tree}-v{DISCOVERY_VERSION}.json"
+
+
+def list_discovery_entries() -> List[Path]:
+    """
+    List all entries of the discovery cache.
+
+    Returns:
+        List[Path]: The paths of all cached discovery results.
+    """
+    cache_dir = get_discovery_cache_dir()
+    if not cache_dir.is_dir():
+        return []
+    return [path for path in cache_dir.iterdir() if path.suffix == ".json"]
+
+
+def get_cached_python_files(tree: str) -> Optional[List[str]]:
+    """
+    Look up the Python files discovered in a tree.
+
+    Args:
+        tree (str): The hash of the Git tree.
+
+    Returns:
+        Optional[List[str]]: The paths of the Python files relative to the
+        repo, or None if the tree was not discovered yet.
+    """
+    path = _get_entry_path(tree)
+    try:
+        with open(str(path), "r", encoding="utf-8") as f:
+            python_files = json.load(f)
+    except (OSError, ValueError):
+        return None
+    touch_entry(path)
+    return python_files
+
+
+def store_python_files(tree: str, python_files: List[str]):
+    """
+    Store the Python files discovered in a tree.
+
+    Args:
+        tree (str): The hash of the Git tree.
+        python_files (List[str]): The paths of the Python files relative to
+            the repo.
+    """
+    path = _get_entry_path(tree)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(suffix=".tmp", dir=path.parent)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(python_files, f)
+    os.replace(tmp_name, path)
+    logger.debug("Cached discovery of tree %s", tree)
+
+    prune_discovery(parse_size(DISCOVERY_CACHE_SIZE), keep=[path])
+
+
+def prune_discovery(max_size: int, keep: Optional[List[Path]] = None) -> List[Path]:
+    """
+    Evict the least recently used discovery results until the cache fits
+    into max_size.
+
+    Args:
+        max_size (int): The maximum total size in bytes.
+        keep (Optional[List[Path]]): Entries which must not be removed.
+
+    Returns:
+        List[Path]: The removed cache entries.
+    """
+    return prune_lru(list_discovery_entries(), max_size, keep)
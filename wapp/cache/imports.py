@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from wapp.cache import get_cache_dir, prune_lru, touch_entry
+
+logger = logging.getLogger(__name__)
+
+IMPORTS_CACHE_SIZE = os.environ.get("WAPP_IMPORTS_CACHE_SIZE", "64M")
+
+# Bump when the extraction of imports from a module changes
+IMPORTS_VERSION = 2
+
+
+def get_imports_cache_dir() -> Path:
+    """
+    Get the directory containing the cached imports of scanned modules.
+
+    Returns:
+        Path: The imports cache directory.
+    """
+    return get_cache_dir() / "imports"
+
+
+def _get_entry_path(digest: str) -> Path:
+    return get_imports_cache_dir() / f"{digest}-v{IMPORTS_VERSION}.json"
+
+
+def list_imports_entries() -> List[Path]:
+    """
+    List all entries of the imports cache.
+
+    Returns:
+        List[Path]: The paths of all cached scan results.
+    """
+    cache_dir = get_imports_cache_dir()
+    if not cache_dir.is_dir():
+        return []
+    return [path for path in cache_dir.iterdir() if path.suffix == ".json"]
+
+
+def get_cached_imports(digest: str) -> Optional[Tuple[List, Optional[str]]]:
+    """
+    Look up the imports of a module by the hash of its content.
+
+    Args:
+        digest (str): The SHA-256 of the module source.
+
+    Returns:
+        Optional[Tuple[List, Optional[str]]]: The imported top-level names,
+        each with whether it is only imported optionally, and the error if
+        the module failed to parse, or None if the module was not scanned yet.
+    """
+    path = _get_entry_path(digest)
+    try:
+        with open(str(path), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    touch_entry(path)
+    return entry["imports"], entry["error"]
+
+
+def store_imports(digest: str, imports: List, error: Optional[str]):
+    """
+    Store the imports of a module by the hash of its content.
+
+    Args:
+        digest (str): The SHA-256 of the module source.
+        imports (List): The imported top-level names, each with whether it is
+            only imported optionally.
+        error (Optional[str]): The error if the module failed to parse.
+    """
+    path = _get_entry_path(digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(suffix=".tmp", dir=path.parent)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"imports": imports, "error": error}, f)
+    os.replace(tmp_name, path)
+
+
+def _get_scan_path(key: str) -> Path:
+    return get_imports_cache_dir() / f"scan-{key}-v{IMPORTS_VERSION}.json"
+
+
+def get_cached_scan(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up the imports scanned in a tree.
+
+    Args:
+        key (str): The hash of the Git tree and the path filter settings.
+
+    Returns:
+        Optional[Dict[str, Any]]: The scan result, or None if the tree was not
+        scanned yet.
+    """
+    path = _get_scan_path(key)
+    try:
+        with open(str(path), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    touch_entry(path)
+    return entry
+
+
+def store_scan(key: str, entry: Dict[str, Any]):
+    """
+    Store the imports scanned in a tree.
+
+    Args:
+        key (str): The hash of the Git tree and the path filter settings.
+        entry (Dict[str, Any]): The scan result.
+    """
+    path = _get_scan_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(suffix=".tmp", dir=path.parent)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tmp_name, path)
+
+
+def prune_imports(max_size: int, keep: Optional[List[Path]] = None) -> List[Path]:
+    """
+    Evict the least recently used scan results until the cache fits into
+    max_size.
+
+    Args:
+        max_size (int): The maximum total size in bytes.
+        keep (Optional[List[Path]]): Entries which must not be removed.
+
+    Returns:
+        List[Path]: The removed cache entries.
+    """
+    return prune_lru(list_imports_entries(), max_size, keep)
+
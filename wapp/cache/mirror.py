@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from wapp.cache import get_cache_dir, parse_size, prune_lru, touch_entry
+from wapp.profiling import traced
+from wapp.utils import DirectoryLock
+
+logger = logging.getLogger(__name__)
+
+MIRROR_CACHE_SIZE = os.environ.get("WAPP_MIRROR_CACHE_SIZE", "5G")
+
+
+def get_mirror_dir() -> Path:
+    """
+    Get the directory containing the bare mirrors of cloned repositories.
+
+    Returns:
+        Path: The mirror cache directory.
+    """
+    return get_cache_dir() / "git"
+
+
+def get_mirror_path(url: str) -> Path:
+    """
+    Get the path of the bare mirror of a repository, addressed by its URL.
+
+    Args:
+        url (str): The URL of the repository.
+
+    Returns:
+        Path: The path of the bare mirror.
+    """
+    normalized_url = url.rstrip("/").removesuffix(".git")
+    url_hash = hashlib.sha256(normalized_url.encode("utf-8")).hexdigest()[:24]
+    return get_mirror_dir() / f"{url_hash}.git"
+
+
+def list_mirrors() -> List[Path]:
+    """
+    List all mirrors in the mirror cache.
+
+    Returns:
+        List[Path]: The paths of all bare mirrors.
+    """
+    mirror_dir = get_mirror_dir()
+    if not mirror_dir.is_dir():
+        return []
+    return [path for path in mirror_dir.iterdir() if path.suffix == ".git"]
+
+
+def get_mirror_lock(mirror_path: Path, blocking: bool = True) -> DirectoryLock:
+    """
+    Get the lock of a mirror, held while it is fetched into, cloned from or
+    evicted.
+
+    Args:
+        mirror_path (Path): The path of the bare mirror.
+        blocking (bool): Wait for other processes instead of failing.
+
+    Returns:
+        DirectoryLock: The lock of the mirror.
+    """
+    return DirectoryLock(
+        mirror_path.parent, f"{mirror_path.stem}.lock", blocking=blocking
+    )
+
+
+@traced("update_mirror")
+def update_mirror(url: str) -> Path:
+    """
+    Create or refresh the bare mirror of a repository.
+
+    Existing mirrors only fetch new objects. Afterwards the least recently
+    used mirrors are evicted until the cache fits into MIRROR_CACHE_SIZE.
+
+    Args:
+        url (str): The URL of the repository.
+
+    Returns:
+        Path: The path of the bare mirror.
+    """
+    import git  # pylint: disable=C0415
+
+    mirror_path = get_mirror_path(url)
+    mirror_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with get_mirror_lock(mirror_path):
+        if mirror_path.is_dir():
+            logger.debug("Fetching %s into mirror %s", url, mirror_path)
+            git.Repo(mirror_path).git.fetch("--prune", "origin")
+        else:
+            logger.debug("Mirroring %s into %s", url, mirror_path)
+            tmp_path = Path(
+                tempfile.mkdtemp(prefix=mirror_path.stem, dir=mirror_path.parent)
+            )
+            try:
+                mirror = git.Repo.clone_from(url=url, to_path=tmp_path, mirror=True)
+                # Allow shallow and partial clones from the mirror
+                with mirror.config_writer() as config:
+                    config.set_value("uploadpack", "allowFilter", "true")
+                    config.set_value("uploadpack", "allowAnySHA1InWant", "true")
+                tmp_path.rename(mirror_path)
+            finally:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        touch_entry(mirror_path)
+
+    prune_mirrors(parse_size(MIRROR_CACHE_SIZE), keep=[mirror_path])
+    return mirror_path
+
+
+def prune_mirrors(max_size: int, keep: Optional[List[Path]] = None) -> List[Path]:
+    """
+    Evict the least recently used mirrors until the mirror cache fits into
+    max_size. Mirrors locked by another process, e.g. while a clone reads
+    from them, are skipped.
+
+    Args:
+        max_size (int): The maximum total size in bytes.
+        keep (Optional[List[Path]]): Mirrors which must not be evicted.
+
+    Returns:
+        List[Path]: The evicted mirrors.
+    """
+    return prune_lru(
+        list_mirrors(),
+        max_size,
+        keep,
+        lock=lambda path: get_mirror_lock(path, blocking=False),
+    )
@@ -0,0 +1,147 @@
+import hashlib
+import importlib.util
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+from wapp.cache import get_cache_dir, parse_size, prune_lru, touch_entry
+from wapp.files.wrapper import WRAPPER_VERSION
+
+if TYPE_CHECKING:
+    import git
+
+logger = logging.getLogger(__name__)
+
+WHEEL_CACHE_SIZE = os.environ.get("WAPP_WHEEL_CACHE_SIZE", "2G")
+
+# Generated files which determine the content of a wrapped wheel
+WHEEL_INPUT_FILES = ["pyproject.toml", "requirements.txt", ".wapp"]
+
+
+def get_wheel_cache_dir() -> Path:
+    """
+    Get the directory containing the cached wheels.
+
+    Returns:
+        Path: The wheel cache directory.
+    """
+    return get_cache_dir() / "wheels"
+
+
+def get_wheel_cache_key(
+    dest_dir: Path, repo: "git.Repo", bytecode: bool = False
+) -> str:
+    """
+    Compute the cache key of a wrapped project's wheel.
+
+    The key covers the tree of the wrapped repo, the generated project
+    files and the version of the wrapper template. Wheels shipping bytecode
+    caches are only reused by interpreters sharing their bytecode format.
+
+    Args:
+        dest_dir (Path): The directory containing the wrapped project.
+        repo (git.Repo): The wrapped Git repository object.
+        bytecode (bool): Whether the wheel ships bytecode caches.
+
+    Returns:
+        str: The cache key.
+    """
+    key = hashlib.sha256()
+    key.update(f"wrapper:{WRAPPER_VERSION}\n".encode("utf-8"))
+    key.update(f"tree:{repo.head.commit.tree.hexsha}\n".encode("utf-8"))
+    for filename in WHEEL_INPUT_FILES:
+        path = dest_dir / filename
+        key.update(f"{filename}:".encode("utf-8"))
+        if path.is_file():
+            key.update(hashlib.sha256(path.read_bytes()).digest())
+        key.update(b"\n")
+    if bytecode:
+        magic = importlib.util.MAGIC_NUMBER.hex()
+        key.update(f"bytecode:{sys.implementation.cache_tag}:{magic}\n".encode("utf-8"))
+    return key.hexdigest()
+
+
+def list_cached_wheels() -> List[Path]:
+    """
+    List all entries of the wheel cache.
+
+    Returns:
+        List[Path]: The directories of all cache entries.
+    """
+    wheel_cache_dir = get_wheel_cache_dir()
+    if not wheel_cache_dir.is_dir():
+        return []
+    return [
+        path
+        for path in wheel_cache_dir.iterdir()
+        if path.is_dir() and not path.name.startswith(".")
+    ]
+
+
+def get_cached_wheel(key: str) -> Optional[Path]:
+    """
+    Look up a wheel in the wheel cache.
+
+    Args:
+        key (str): The cache key of the wheel.
+
+    Returns:
+        Optional[Path]: The path of the cached wheel, or None on a cache miss.
+    """
+    entry_dir = get_wheel_cache_dir() / key
+    wheels = list(entry_dir.glob("*.whl")) if entry_dir.is_dir() else []
+    if not wheels:
+        return None
+    touch_entry(entry_dir)
+    return wheels[0]
+
+
+def store_wheel(key: str, wheel_path: Path) -> Path:
+    """
+    Add a wheel to the wheel cache and evict the least recently used wheels
+    until the cache fits into WHEEL_CACHE_SIZE.
+
+    Args:
+        key (str): The cache key of the wheel.
+        wheel_path (Path): The path of the wheel.
+
+    Returns:
+        Path: The path of the cached wheel.
+    """
+    entry_dir = get_wheel_cache_dir() / key
+    entry_dir.parent.mkdir(parents=True, exist_ok=True)
+
+    if not entry_dir.is_dir():
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp", dir=entry_dir.parent))
+        try:
+            shutil.copy2(wheel_path, tmp_dir / wheel_path.name)
+            tmp_dir.rename(entry_dir)
+        except OSError:
+            # Another process stored the same wheel concurrently
+            if not entry_dir.is_dir():
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.debug("Cached %s as %s", wheel_path.name, key)
+
+    prune_wheels(parse_size(WHEEL_CACHE_SIZE), keep=[entry_dir])
+    return entry_dir / wheel_path.name
+
+
+def prune_wheels(max_size: int, keep: Optional[List[Path]] = None) -> List[Path]:
+    """
+    Evict the least recently used wheels until the wheel cache fits into
+    max_size.
+
+    Args:
+        max_size (int): The maximum total size in bytes.
+        keep (Optional[List[Path]]): Cache entries which must not be evicted.
+
+    Returns:
+        List[Path]: The evicted cache entries.
+    """
+    return prune_lru(list_cached_wheels(), max_size, keep)
@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from wapp.cache import get_cache_dir, parse_size, prune_lru, touch_entry
+from wapp.utils import run_process
+
+logger = logging.getLogger(__name__)
+
+WHEELHOUSE_SIZE = os.environ.get("WAPP_WHEELHOUSE_SIZE", "4G")
+
+# Needed to build editable installs without an index
+BUILD_REQUIREMENTS = ["setuptools", "wheel"]
+
+
+def get_wheelhouse_dir() -> Path:
+    """
+    Get the directory containing the wheels of the dependencies of all
+    wrapped packages.
+
+    Returns:
+        Path: The wheelhouse directory.
+    """
+    return get_cache_dir() / "wheelhouse"
+
+
+def list_wheelhouse() -> List[Path]:
+    """
+    List all wheels in the wheelhouse.
+
+    Returns:
+        List[Path]: The paths of all wheels.
+    """
+    wheelhouse_dir = get_wheelhouse_dir()
+    if not wheelhouse_dir.is_dir():
+        return []
+    return [path for path in wheelhouse_dir.iterdir() if path.suffix == ".whl"]
+
+
+def _requirement_args(
+    requirements_path: Path, build_requirements: bool = False
+) -> List[str]:
+    args = ["-r", str(requirements_path.absolute())]
+    if build_requirements:
+        args.extend(BUILD_REQUIREMENTS)
+    return args
+
+
+def _run_pip(
+    args: List[str],
+    python: Optional[str],
+    prefix: str,
+    timeout: Optional[float],
+    log_level: int,
+) -> Tuple[int, str]:
+    command = [sys.executable, "-m", "pip", "--disable-pip-version-check"]
+    # Wheels are resolved for the interpreter of the target environment
+    if python:
+        command += ["--python", python]
+    try:
+        return run_process(command + args, prefix, timeout, log_level)
+    except RuntimeError as e:
+        return 1, str(e)
+
+
+def _touch_installed(report_path: Path):
+    from urllib.parse import unquote, urlparse  # pylint: disable=C0415
+
+    # Installs never modify the wheels, mark the used ones for the LRU
+    try:
+        with open(str(report_path), "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return
+    for item in report.get("install", []):
+        url = urlparse(item.get("download_info", {}).get("url", ""))
+        path = Path(unquote(url.path))
+        if url.scheme == "file" and path.parent == get_wheelhouse_dir():
+            try:
+                touch_entry(path)
+            except OSError:
+                pass
+
+
+def is_wheelhouse_complete(
+    requirements_path: Path,
+    build_requirements: bool = False,
+    python: Optional[str] = None,
+    prefix: str = "",
+    timeout: Optional[float] = None,
+) -> bool:
+    """
+    Checks whether all dependencies of a requirements file can be installed
+    from the wheelhouse without an index. The wheels pip would install are
+    marked as recently used.
+
+    Args:
+        requirements_path (Path): The requirements file.
+        build_requirements (bool): Whether the build requirements of an
+            editable install are needed as well.
+        python (Optional[str]): The interpreter of the target environment,
+            defaults to the interpreter running wapp.
+        prefix (str): Prepended to every logged line of output.
+        timeout (Optional[float]): Seconds before pip is killed.
+
+    Returns:
+        bool: True if pip resolves all dependencies from the wheelhouse.
+    """
+    wheelhouse_dir = get_wheelhouse_dir()
+    if not wheelhouse_dir.is_dir():
+        return False
+    fd, report_name = tempfile.mkstemp(prefix=".report", dir=wheelhouse_dir)
+    os.close(fd)
+    try:
+        retval, _ = _run_pip(
+            ["install", "--dry-run", "--ignore-installed", "--quiet", "--no-index"]
+            + ["--report", report_name, "--find-links", str(wheelhouse_dir)]
+            + _requirement_args(requirements_path, build_requirements),
+            python,
+            prefix,
+            timeout,
+            logging.DEBUG,
+        )
+        if retval:
+            logger.debug("Wheelhouse incomplete for %s", requirements_path)
+        else:
+            _touch_installed(Path(report_name))
+    finally:
+        os.unlink(report_name)
+    return retval == 0
+
+
+def fill_wheelhouse(
+    requirements_path: Path,
+    build_requirements: bool = False,
+    python: Optional[str] = None,
+    prefix: str = "",
+    timeout: Optional[float] = None,
+) -> bool:
+    """
+    Download or build wheels of all dependencies of a requirements file
+    into the wheelhouse. Wheels already present are reused.
+
+    Wheels are collected in a temporary directory and moved into the
+    wheelhouse afterwards, so concurrent fills never expose partial files.
+
+    Args:
+        requirements_path (Path): The requirements file.
+        build_requirements (bool): Whether to include the build requirements
+            of an editable install.
+        python (Optional[str]): The interpreter of the target environment,
+            defaults to the interpreter running wapp.
+        prefix (str): Prepended to every logged line of output.
+        timeout (Optional[float]): Seconds before pip is killed.
+
+    Returns:
+        bool: True if all wheels were stored.
+    """
+    wheelhouse_dir = get_wheelhouse_dir()
+    wheelhouse_dir.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".fill", dir=wheelhouse_dir))
+    try:
+        retval, output = _run_pip(
+            ["wheel", "--progress-bar", "off", "--wheel-dir", str(tmp_dir)]
+            + ["--find-links", str(wheelhouse_dir)]
+            + _requirement_args(requirements_path, build_requirements),
+            python,
+            prefix,
+            timeout,
+            logging.INFO,
+        )
+        if retval:
+            logger.warning(
+                "Failed to fill wheelhouse from %s: %s",
+                requirements_path,
+                output.splitlines()[-1] if output else retval,
+            )
+
+        stored = []
+        for wheel in tmp_dir.glob("*.whl"):
+            target = wheelhouse_dir / wheel.name
+            if not target.exists():
+                os.replace(wheel, target)
+                stored.append(target)
+                logger.debug("Stored %s in wheelhouse", wheel.name)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    prune_wheelhouse(parse_size(WHEELHOUSE_SIZE), keep=stored)
+    return retval == 0
+
+
+def get_pip_args(
+    requirements_path: Path,
+    fill: bool = True,
+    build_requirements: bool = False,
+    python: Optional[str] = None,
+    prefix: str = "",
+    timeout: Optional[float] = None,
+) -> List[str]:
+    """
+    Get the pip arguments installing the dependencies of a wrapped package
+    from the wheelhouse. The index is disabled if the wheelhouse holds every
+    dependency.
+
+    Args:
+        requirements_path (Path): The requirements file of the wrapped package.
+        fill (bool): Whether to fill the wheelhouse with missing dependencies.
+        build_requirements (bool): Whether the build requirements of an
+            editable install are needed as well.
+        python (Optional[str]): The interpreter of the target environment,
+            defaults to the interpreter running wapp.
+        prefix (str): Prepended to every logged line of pip's output.
+        timeout (Optional[float]): Seconds before each pip run is killed.
+
+    Returns:
+        List[str]: The pip arguments.
+    """
+    wheelhouse_args = ["--find-links", str(get_wheelhouse_dir())]
+    if not requirements_path.is_file():
+        return wheelhouse_args
+
+    options = (build_requirements, python, prefix, timeout)
+    complete = is_wheelhouse_complete(requirements_path, *options)
+    if not complete and fill:
+        logger.info("Filling wheelhouse from %s", requirements_path)
+        fill_wheelhouse(requirements_path, *options)
+        complete = is_wheelhouse_complete(requirements_path, *options)
+
+    if complete:
+        logger.debug("Installing dependencies from wheelhouse only")
+        return ["--no-index"] + wheelhouse_args
+    return wheelhouse_args
+
+
+def prune_wheelhouse(max_size: int, keep: Optional[List[Path]] = None) -> List[Path]:
+    """
+    Evict the least recently used wheels until the wheelhouse fits into
+    max_size.
+
+    Args:
+        max_size (int): The maximum total size in bytes.
+        keep (Optional[List[Path]]): Wheels which must not be evicted.
+
+    Returns:
+        List[Path]: The evicted wheels.
+    """
+    return prune_lru(list_wheelhouse(), max_size, keep)
@@ -1,15 +1,177 @@
 import logging
-import re
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
+from wapp.files.import_hook import ImportHook, get_module_index
 from wapp.files.pyproject import Pyproject
 from wapp.files.requirements import Requirements
-from wapp.files.wrapper import Wrapper
+from wapp.files.wapp_config import WappConfig
+from wapp.files.wrapper import LAUNCHER_MODULE, Wrapper
+from wapp.filters import PathFilter
+from wapp.profiling import set_attribute, traced
+
+# The installers and the compiler are imported by the functions using
+# them, commands answering from the registry start without loading them
 
 logger = logging.getLogger(__name__)
 
 
+def get_path_filter(wapp_config: Optional[WappConfig]) -> PathFilter:
+    """
+    Get the filter deciding which files of a wrapped repo are packaged.
+
+    Args:
+        wapp_config (Optional[WappConfig]): The settings of the wrapped project.
+
+    Returns:
+        PathFilter: The path filter, the default filter without settings.
+    """
+    if wapp_config:
+        return PathFilter(wapp_config.exclude, wapp_config.include)
+    return PathFilter()
+
+
+def get_before_build(
+    repo_dir: Path, wapp_config: Optional[WappConfig]
+) -> Optional[Callable[[], Any]]:
+    """
+    Get the step run before building the wheel of a wrapped project.
+
+    Args:
+        repo_dir (Path): The directory containing the wrapped repo.
+        wapp_config (Optional[WappConfig]): The settings of the wrapped project.
+
+    Returns:
+        Optional[Callable[[], Any]]: Compiles the packaged modules if enabled.
+    """
+    if wapp_config and wapp_config.compile:
+        from wapp.bytecode import compile_tree  # pylint: disable=C0415
+
+        return partial(compile_tree, repo_dir, get_path_filter(wapp_config))
+    return None
+
+
+def install_project(
+    dest_dir: Path,
+    path: Path,
+    wapp_config: WappConfig,
+    upgrade: bool = False,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+) -> int:
+    """
+    Install or upgrade a wrapped project with its configured installer.
+
+    Args:
+        dest_dir (Path): The directory containing the wrapped project.
+        path (Path): The built wheel or, for editable installs, dest_dir.
+        wapp_config (WappConfig): The settings of the wrapped project.
+        upgrade (bool): Whether the package is already installed.
+        use_cache (bool): Whether to install dependencies from the wheelhouse.
+        timeout (Optional[float]): Seconds before the installer is killed.
+
+    Returns:
+        int: The exit code of the installer.
+    """
+    from wapp.cache.wheelhouse import get_pip_args  # pylint: disable=C0415
+    from wapp.utils import (  # pylint: disable=C0415
+        get_installer_python,
+        install_via_layers,
+        install_via_pipx,
+    )
+
+    editable = wapp_config.install_mode == "editable"
+    requirements_path = dest_dir / "requirements.txt"
+
+    # Output is prefixed by the package name, installs may run concurrently
+    package_name = Pyproject.from_config(dest_dir / "pyproject.toml").name
+    pip_args = None
+    if use_cache:
+        pip_args = get_pip_args(
+            requirements_path,
+            build_requirements=editable,
+            python=get_installer_python(wapp_config.installer),
+            prefix=package_name,
+            timeout=timeout,
+        )
+    if wapp_config.installer == "layered":
+        logger.info("Installing %s layered on the base environment:", path)
+        retval, _ = install_via_layers(
+            package_name,
+            path.absolute(),
+            requirements_path,
+            list(wapp_config.scripts.values()),
+            editable,
+            pip_args,
+            timeout,
+        )
+    else:
+        force = "--force " if upgrade else ""
+        editable_flag = "--editable " if editable else ""
+        logger.info('Running "pipx install %s%s%s":', force, editable_flag, path)
+        retval, _ = install_via_pipx(
+            path,
+            editable=editable,
+            force=upgrade,
+            pip_args=pip_args,
+            prefix=package_name,
+            timeout=timeout,
+        )
+    logger.info("%s exited with: %d", wapp_config.installer, retval)
+    return retval
+
+
+class WrapChanges:
+    """
+    Files of a wrapped project changed by wrap_project.
+
+    Attributes:
+        written (List[Path]): Files created or rewritten with new content.
+        removed (List[Path]): Stale wrapper modules of older versions.
+    """
+
+    def __init__(self) -> None:
+        self.written = []  # type: List[Path]
+        self.removed = []  # type: List[Path]
+
+    def __bool__(self) -> bool:
+        return bool(self.written or self.removed)
+
+    def add(self, path: Path, changed: bool):
+        if changed:
+            self.written.append(path)
+
+    def __contains__(self, name: str) -> bool:
+        """
+        Whether a file of the given name was written or removed.
+        """
+        return any(path.name == name for path in self.written + self.removed)
+
+
+def get_built_wheel(dest_dir: Path, package_name: str, version: str) -> Optional[Path]:
+    """
+    Find the wheel built for the given version of a wrapped project.
+
+    Args:
+        dest_dir (Path): The directory containing the wrapped project.
+        package_name (str): The name of the wrapped package.
+        version (str): The package version.
+
+    Returns:
+        Optional[Path]: The wheel, None if not built yet.
+    """
+    prefix = f"{package_name}-{version}-"
+    out_dir = dest_dir / "dist"
+    if not out_dir.is_dir():
+        return None
+    for wheel in out_dir.iterdir():
+        if wheel.name.startswith(prefix) and wheel.suffix == ".whl":
+            return wheel
+    return None
+
+
+@traced("wrap_project")
 def wrap_project(
     dest_dir: Path,
     repo_dir: Path,
@@ -17,29 +179,77 @@ def wrap_project(
     package_name: str,
     version: str,
     scripts: Optional[Dict[str, str]],
-):
+    wapp_config: Optional[WappConfig] = None,
+    tree: Optional[str] = None,
+) -> WrapChanges:
+    """
+    Generate the launcher and project files of a wrapped project. Files are
+    only rewritten if their content changed, wrappers generated per script by
+    older versions are removed.
+
+    Args:
+        dest_dir (Path): The directory containing the wrapped project.
+        repo_dir (Path): The directory containing the wrapped repo.
+        requires (Optional[List[str]]): Custom requirements of the project.
+        package_name (str): The name of the wrapped package.
+        version (str): The package version.
+        scripts (Optional[Dict[str, str]]): Exposed scripts mapped to their
+            link names.
+        wapp_config (Optional[WappConfig]): The settings of the project.
+        tree (Optional[str]): The hash of the Git tree matching the Python
+            files of the wrapped repo, caches the import scan.
+
+    Returns:
+        WrapChanges: The written and removed files.
+    """
+    from wapp.bytecode import compile_script  # pylint: disable=C0415
+
+    changes = WrapChanges()
+
     # Create pyproject
     pyproject = Pyproject()
     pyproject.set_name(package_name)
     pyproject.set_version(version)
 
+    launcher = wapp_config.launcher if wapp_config else "runpy"
+
+    set_attribute("scripts", len(scripts))
+    wrappers_dir = dest_dir / "src" / f"wrapped_{package_name}"
+    wrapper = Wrapper(package_name, scripts, launcher)
     logger.info("Exposed scripts:")
     for script_target, link_name in scripts.items():
-        wrapped_script_target = re.sub("[^0-9a-zA-Z.]+", "_", script_target)
+        logger.info("  %s -> %s", link_name, script_target)
+        if launcher == "bytecode":
+            compile_script(repo_dir / script_target)
 
-        logger.info("  %s -> %s", link_name, wrapped_script_target)
+        # Create pyproject.toml
+        pyproject.add_entry_point(link_name, wrapper.get_entry_point(script_target))
 
-        # Create wrappers
-        wrapper = Wrapper(package_name, script_target)
-        wrapper_path = dest_dir / "src" / f"wrapped_{package_name}" / f"wrapped_{wrapped_script_target}"
-        wrapper_path = wrapper_path.with_suffix(".py")
-        wrapper_path.parent.mkdir(parents=True, exist_ok=True)
-        wrapper.write(wrapper_path)
+    # Create the launcher dispatching all scripts
+    wrapper_path = wrappers_dir / f"{LAUNCHER_MODULE}.py"
+    wrapper_path.parent.mkdir(parents=True, exist_ok=True)
+    changes.add(wrapper_path, wrapper.write(wrapper_path))
 
-        # Create pyproject.toml
-        pyproject.add_script(wrapped_script_target, link_name)
+    # Create the package module importing the wrapped repo below the package
+    path_filter = get_path_filter(wapp_config)
+    import_hook = ImportHook(package_name, get_module_index(repo_dir, path_filter))
+    import_hook_path = wrappers_dir / "__init__.py"
+    changes.add(import_hook_path, import_hook.write(import_hook_path))
 
-    pyproject.write(dest_dir / "pyproject.toml")
+    # Remove wrappers generated per script by older versions
+    for wrapper_path in wrappers_dir.glob("wrapped_*.py"):
+        logger.info("  Removing stale wrapper %s", wrapper_path.name)
+        wrapper_path.unlink()
+        changes.removed.append(wrapper_path)
+
+    # Exclude non-runtime content of the wrapped repo
+    package_data, packages = path_filter.setuptools_excludes(
+        repo_dir, dest_dir / "src"
+    )
+    pyproject.set_excludes(package_data, packages)
+
+    pyproject_path = dest_dir / "pyproject.toml"
+    changes.add(pyproject_path, pyproject.write(pyproject_path))
 
     # Create requirements.txt
     requirements = Requirements()
@@ -48,6 +258,17 @@ def wrap_project(
         requirements = requirements.from_config(existing_requirements_path)
     for dependency in requires:
         requirements.add_dependency(dependency)
+    if wapp_config and wapp_config.scan_imports != "off":
+        from wapp.imports import (  # pylint: disable=C0415
+            check_requirements,
+            scan_imports,
+        )
+
+        check_requirements(
+            requirements,
+            scan_imports(repo_dir, path_filter, tree=tree),
+            add=wapp_config.scan_imports == "add",
+        )
     logger.debug("Merging requirements:")
     logger.debug("  Old requirements:")
     [
@@ -57,10 +278,11 @@ def wrap_project(
     [
         logger.debug("    %s", item) for item in requirements.new_conf.values()
     ]  # pylint:disable=W0106
-    merged_conf = requirements.write(dest_dir / "requirements.txt")
+    requirements_path = dest_dir / "requirements.txt"
+    changes.add(requirements_path, requirements.write(requirements_path))
     logger.debug("  Merged requirements:")
     [
-        logger.debug("    %s", item) for item in merged_conf.values()
+        logger.debug("    %s", item) for item in requirements.merge().values()
     ]  # pylint:disable=W0106
 
     # Create custom_requirements.txt
@@ -68,7 +290,20 @@ def wrap_project(
         custom_requirements = Requirements()
         for dependency in requires:
             custom_requirements.add_dependency(dependency)
-        custom_requirements.write(dest_dir / "custom_requirements.txt")
+        custom_requirements_path = dest_dir / "custom_requirements.txt"
+        changes.add(
+            custom_requirements_path,
+            custom_requirements.write(custom_requirements_path),
+        )
 
     wapp_identifier_path = dest_dir / ".wapp"
-    wapp_identifier_path.touch(exist_ok=True)
+    if wapp_config:
+        wapp_config.scripts = dict(scripts)
+        changes.add(wapp_identifier_path, wapp_config.write(wapp_identifier_path))
+    elif not wapp_identifier_path.exists():
+        wapp_identifier_path.touch()
+        changes.written.append(wapp_identifier_path)
+
+    set_attribute("files_written", len(changes.written))
+    set_attribute("files_removed", len(changes.removed))
+    return changes
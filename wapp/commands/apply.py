@@ -0,0 +1,337 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from wapp.argparser import create_argparser
+from wapp.commands.create import Creation
+from wapp.files.manifest import Manifest
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+REPORT_VERSION = 1
+
+# Stages share a pool by the resource they are bound by
+STAGE_POOLS = {
+    "clone": "network",
+    "discover": "build",
+    "wrap": "build",
+    "build": "build",
+    "install": "install",
+}
+
+
+class ApplyResult:
+    """
+    Outcome of creating a single package of a manifest.
+
+    Attributes:
+        package_name (str): The name of the wrapped package.
+        dest_dir (str): The directory containing the wrapped project.
+        status (str): One of CREATED, RESUMED, UNCHANGED or FAILED.
+        stage (str): The stage that failed.
+        error (str): The reason of the failure.
+        durations (Dict[str, float]): Seconds spent in each stage run.
+        skipped (List[str]): Stages completed by a previous run.
+        version (str): The package version.
+        wheel_path (str): The built wheel.
+        install_state (str): The install state of the package.
+    """
+
+    CREATED = "created"
+    RESUMED = "resumed"
+    UNCHANGED = "unchanged"
+    FAILED = "failed"
+
+    def __init__(self, index: int, url: str) -> None:
+        self.index = index
+        self.url = url
+        self.package_name = ""
+        self.dest_dir = ""
+        self.status = ApplyResult.CREATED
+        self.stage = ""
+        self.error = ""
+        self.durations = {}  # type: Dict[str, float]
+        self.skipped = []  # type: List[str]
+        self.version = ""
+        self.wheel_path = ""
+        self.install_state = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "url": self.url,
+            "package_name": self.package_name,
+            "dest_dir": self.dest_dir,
+            "status": self.status,
+            "stage": self.stage,
+            "error": self.error,
+            "durations": {
+                stage: round(seconds, 3) for stage, seconds in self.durations.items()
+            },
+            "skipped": self.skipped,
+            "version": self.version,
+            "wheel_path": self.wheel_path,
+            "install_state": self.install_state,
+        }
+
+
+class Checkpoints:
+    """
+    Completed stages of each package of a manifest, persisted after every
+    stage so an interrupted apply can resume.
+
+    Attributes:
+        path (Path): The checkpoint file.
+    """
+
+    def __init__(self, path: Path, restart: bool = False) -> None:
+        self.path = path
+        self._entries = {}  # type: Dict[str, Dict[str, Any]]
+        if not restart and path.is_file():
+            checkpoints = json.loads(path.read_text(encoding="utf-8"))
+            if checkpoints.get("version") == CHECKPOINT_VERSION:
+                self._entries = checkpoints["entries"]
+
+    def get(
+        self, dest_dir: Path, digest: str, clone_digest: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get the checkpoint of a package. If only options applied after
+        cloning changed, the clone is kept and the later stages rerun.
+
+        Args:
+            dest_dir (Path): The directory of the package.
+            digest (str): The digest of all package options.
+            clone_digest (str): The digest of the options of the clone.
+
+        Returns:
+            Optional[Dict[str, Any]]: The completed stages and the saved
+            state, None if missing or the clone options changed.
+        """
+        entry = self._entries.get(str(dest_dir.absolute()))
+        if not entry or entry["clone_digest"] != clone_digest:
+            return None
+        if entry["digest"] != digest:
+            return dict(entry, stages=entry["stages"][:1])
+        return entry
+
+    def save(
+        self,
+        dest_dir: Path,
+        digest: str,
+        clone_digest: str,
+        stages: List[str],
+        state: Dict[str, Any],
+    ):
+        self._entries[str(dest_dir.absolute())] = {
+            "digest": digest,
+            "clone_digest": clone_digest,
+            "stages": stages,
+            "state": state,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(
+            json.dumps({"version": CHECKPOINT_VERSION, "entries": self._entries}, indent=2),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, self.path)
+
+
+def _get_digest(options: Any) -> str:
+    return hashlib.sha256(json.dumps(options).encode("utf-8")).hexdigest()
+
+
+def _get_creation(manifest: Manifest, index: int) -> Creation:
+    create_args = manifest.get_create_args(index)
+    try:
+        parsed_args = create_argparser().parse_args(create_args)
+    except SystemExit as e:
+        raise RuntimeError(
+            f"Invalid options of package {index + 1} in the manifest"
+        ) from e
+    return Creation(parsed_args, dest_root=manifest.root)
+
+
+def apply(args):
+    manifest_path = args.manifest  # type: Path
+    restart = args.restart  # type: bool
+    state_path = args.state or manifest_path.with_suffix(".state.json")  # type: Path
+    report_path = args.report or manifest_path.with_suffix(".report.json")  # type: Path
+
+    if not manifest_path.is_file():
+        raise RuntimeError(f'Manifest "{manifest_path}" not found')
+    manifest = Manifest.from_config(manifest_path)
+    if not manifest.packages:
+        raise RuntimeError(f'Manifest "{manifest_path}" lists no packages')
+    if args.install_timeout:
+        manifest.defaults.setdefault("install_timeout", args.install_timeout)
+
+    checkpoints = Checkpoints(state_path, restart)
+    results = [
+        ApplyResult(index, package.get("url", ""))
+        for index, package in enumerate(manifest.packages)
+    ]
+    pools = {
+        "network": ThreadPoolExecutor(
+            max_workers=max(args.clone_jobs, 1), thread_name_prefix="clone"
+        ),
+        "build": ThreadPoolExecutor(
+            max_workers=max(args.build_jobs, 1), thread_name_prefix="build"
+        ),
+        "install": ThreadPoolExecutor(
+            max_workers=max(args.install_jobs, 1), thread_name_prefix="install"
+        ),
+    }
+
+    async def _apply(result: ApplyResult):
+        try:
+            creation = _get_creation(manifest, result.index)
+        except RuntimeError as e:
+            result.status = ApplyResult.FAILED
+            result.error = str(e)
+            logger.error("Package %d failed: %s", result.index + 1, e)
+            return
+        result.package_name = creation.package_name
+        result.dest_dir = str(creation.dest_dir)
+        digest = _get_digest(manifest.get_create_args(result.index))
+        clone_digest = _get_digest(creation.get_clone_options())
+
+        completed = []  # type: List[str]
+        checkpoint = checkpoints.get(creation.dest_dir, digest, clone_digest)
+        if checkpoint and checkpoint["stages"]:
+            completed = list(checkpoint["stages"])
+            try:
+                creation.restore(checkpoint["state"])
+            except RuntimeError as e:
+                result.status = ApplyResult.FAILED
+                result.error = str(e)
+                return
+            result.skipped = list(completed)
+
+        loop = asyncio.get_running_loop()
+        for stage in Creation.STAGES:
+            if stage in completed:
+                continue
+            # Only clean up clones this run started in an empty destination
+            fresh = stage == "clone" and not (
+                creation.dest_dir.exists() and any(creation.dest_dir.iterdir())
+            )
+            start = time.perf_counter()
+            try:
+                # Each stage waits for a free worker of its resource only
+                await loop.run_in_executor(
+                    pools[STAGE_POOLS[stage]], creation.run, stage
+                )
+            except Exception as e:  # pylint: disable=W0718
+                result.status = ApplyResult.FAILED
+                result.stage = stage
+                result.error = str(e)
+                logger.error("%s failed in %s: %s", creation.package_name, stage, e)
+                if fresh:
+                    shutil.rmtree(creation.dest_dir, ignore_errors=True)
+                return
+            finally:
+                result.durations[stage] = time.perf_counter() - start
+            completed.append(stage)
+            checkpoints.save(
+                creation.dest_dir, digest, clone_digest, completed, creation.checkpoint()
+            )
+            logger.info(
+                "%s: %s done in %.1fs",
+                creation.package_name,
+                stage,
+                result.durations[stage],
+            )
+
+        if len(result.skipped) == len(Creation.STAGES):
+            result.status = ApplyResult.UNCHANGED
+        elif result.skipped:
+            result.status = ApplyResult.RESUMED
+        result.version = creation.version
+        result.wheel_path = str(creation.wheel_path or "")
+        result.install_state = creation.install_state
+
+    async def _apply_all():
+        await asyncio.gather(*(_apply(result) for result in results))
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(_apply_all())
+    finally:
+        for pool in pools.values():
+            pool.shutdown()
+
+    write_report(report_path, manifest_path, results, time.perf_counter() - start)
+    log_apply_summary(results)
+
+    failed = [result for result in results if result.status == ApplyResult.FAILED]
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} of {len(results)} packages failed, rerun to resume"
+        )
+
+
+def write_report(path: Path, manifest_path: Path, results: List[ApplyResult], duration: float):
+    """
+    Write the machine-readable report of an apply run.
+
+    Args:
+        path (Path): The report file.
+        manifest_path (Path): The applied manifest.
+        results (List[ApplyResult]): The result of each package.
+        duration (float): Seconds spent applying the manifest.
+    """
+    counts = {}  # type: Dict[str, int]
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    report = {
+        "version": REPORT_VERSION,
+        "manifest": str(manifest_path.absolute()),
+        "duration": round(duration, 3),
+        "counts": counts,
+        "packages": [result.to_dict() for result in results],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    logger.info("Wrote report to %s", path)
+
+
+def log_apply_summary(results: List[ApplyResult]):
+    """
+    Log a per-package summary of an apply run.
+
+    Args:
+        results (List[ApplyResult]): The result of each package.
+    """
+    width = max(len(result.package_name or result.url) for result in results)
+    logger.info("Summary:")
+    for result in results:
+        if result.status == ApplyResult.FAILED:
+            detail = f"{result.stage or 'options'}: {result.error}"
+        else:
+            detail = result.version
+        logger.info(
+            "  %-*s %-9s %6.1fs  %s",
+            width,
+            result.package_name or result.url,
+            result.status,
+            sum(result.durations.values()),
+            detail,
+        )
+    for status in (
+        ApplyResult.CREATED,
+        ApplyResult.RESUMED,
+        ApplyResult.UNCHANGED,
+        ApplyResult.FAILED,
+    ):
+        count = len([result for result in results if result.status == status])
+        logger.info("  %s: %d", status, count)
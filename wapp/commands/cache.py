@@ -0,0 +1,52 @@
+import logging
+
+from wapp.cache import format_size, get_cache_dir, get_size, parse_size
+from wapp.cache.discovery import (
+    DISCOVERY_CACHE_SIZE,
+    list_discovery_entries,
+    prune_discovery,
+)
+from wapp.cache.imports import IMPORTS_CACHE_SIZE, list_imports_entries, prune_imports
+from wapp.cache.mirror import MIRROR_CACHE_SIZE, list_mirrors, prune_mirrors
+from wapp.cache.wheel import WHEEL_CACHE_SIZE, list_cached_wheels, prune_wheels
+from wapp.cache.wheelhouse import WHEELHOUSE_SIZE, list_wheelhouse, prune_wheelhouse
+
+logger = logging.getLogger(__name__)
+
+CACHES = {
+    "mirrors": (list_mirrors, prune_mirrors, MIRROR_CACHE_SIZE),
+    "wheels": (list_cached_wheels, prune_wheels, WHEEL_CACHE_SIZE),
+    "discovery": (list_discovery_entries, prune_discovery, DISCOVERY_CACHE_SIZE),
+    "wheelhouse": (list_wheelhouse, prune_wheelhouse, WHEELHOUSE_SIZE),
+    "imports": (list_imports_entries, prune_imports, IMPORTS_CACHE_SIZE),
+}
+
+
+def cache(args):
+    command = args.cache_command  # type: str
+
+    if command == "stats":
+        logger.info("Cache directory: %s", get_cache_dir())
+        for name, (list_entries, _, max_size) in CACHES.items():
+            entries = list_entries()
+            size = sum(get_size(entry) for entry in entries)
+            logger.info(
+                "  %-10s %5d entries %12s (limit %s)",
+                name,
+                len(entries),
+                format_size(size),
+                max_size,
+            )
+    elif command == "prune":
+        try:
+            max_size = parse_size(args.max_size) if args.max_size else None
+        except ValueError as e:
+            raise RuntimeError(str(e)) from e
+
+        for name, (_, prune_entries, default_max_size) in CACHES.items():
+            removed = prune_entries(
+                max_size if max_size is not None else parse_size(default_max_size)
+            )
+            logger.info("Evicted %d %s", len(removed), name)
+    else:
+        raise RuntimeError("Command not implemented")
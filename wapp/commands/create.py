@@ -1,120 +1,372 @@
 import logging
+from contextlib import nullcontext
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
 
-from git import Repo as GitRepo
-from giturlparse import parse as parse_giturl
+import git
+import git.exc
 
-from wapp.commands import wrap_project
+from wapp.cache.mirror import get_mirror_lock, update_mirror
+from wapp.cache.wheel import get_wheel_cache_key
+from wapp.commands import (
+    WrapChanges,
+    get_before_build,
+    get_built_wheel,
+    install_project,
+    wrap_project,
+)
+from wapp.discovery import (
+    discover_python_files,
+    get_python_tree,
+    is_glob,
+    parse_script_args,
+    resolve_scripts,
+)
+from wapp.files.wapp_config import WappConfig
+from wapp.registry import (
+    BUILT,
+    WRAPPED,
+    get_install_state,
+    get_requirement_fields,
+    get_wheel_fields,
+    record_project,
+)
 from wapp.utils import (
     build_wheel,
+    clone_repo,
     get_git_version_string,
-    install_via_pipx,
+    get_repo_name,
+    log_wheel_size_report,
     normalize_package_name,
     validate_package_name,
-    is_python_file
 )
 
 logger = logging.getLogger(__name__)
 
 
-def create(args):
-    script_args = args.scripts  # type: List[str]
-    requires = args.requires  # type: List[str]
-    repo_url = args.repo_url  # type: str
-    install = args.pipx  # type: bool
-
-    # Script validation
-    scripts = {}
-    for script_arg in script_args:
-        splitted_script = script_arg.split(":")
-        if len(splitted_script) == 1:
-            script_target, link_name = splitted_script, splitted_script
-        if len(splitted_script) == 2:
-            script_target, link_name = splitted_script
-            if not script_target or not link_name:
-                raise RuntimeError("Target or link name cannot be empty")
+class Creation:
+    """
+    State of a project being created, shared between the stages of create.
+
+    The stages run in the order of STAGES, each one may run on a different
+    thread. The state needed by later stages can be saved as checkpoint and
+    restored to resume an interrupted creation.
+
+    Attributes:
+        package_name (str): The name of the wrapped package.
+        dest_dir (Path): The directory containing the wrapped project.
+        repo_dir (Path): The directory containing the cloned repo.
+        repo_url (str): The URL of the wrapped repo without @branch suffix.
+        branch (str): The branch or revision to check out.
+        wapp_config (WappConfig): The settings of the wrapped project.
+        repo (Optional[git.Repo]): The cloned Git repository object.
+        version (str): The package version.
+        scripts (Dict[str, str]): Exposed scripts mapped to their link names.
+        changes (Optional[WrapChanges]): The files changed by the wrap stage.
+        wheel_path (Optional[Path]): The built wheel.
+        install_state (str): The install state recorded in the registry.
+    """
+
+    STAGES = ["clone", "discover", "wrap", "build", "install"]
+
+    def __init__(self, args, dest_root: Optional[Path] = None) -> None:
+        """
+        Validates the create options.
+
+        Args:
+            args: The parsed create options.
+            dest_root (Optional[Path]): The directory containing the project
+                if no destination is given, defaults to the working directory.
+        """
+        script_args = args.scripts  # type: List[str]
+        repo_url = args.repo_url  # type: str
+        sparse = args.sparse  # type: Optional[List[str]]
+
+        self.requires = args.requires  # type: List[str]
+        self.pipx = args.pipx  # type: bool
+        self.use_cache = args.cache  # type: bool
+        self.editable = args.editable  # type: bool
+        self.install_timeout = args.install_timeout  # type: float
+
+        # Script validation
+        script_targets = [
+            script_target for script_target, _ in parse_script_args(script_args)
+        ]
+
+        # Repo URL validation
+        repo_name = get_repo_name(repo_url)
+        if not repo_name:
+            raise RuntimeError(f'Git repo "{repo_url}" invalid, specify another repo')
+
+        # Package name validation
+        package_name = args.package_name  # type: str
+        if package_name:
+            if not validate_package_name(package_name):
+                raise RuntimeError(
+                    f'Specified invalid repo name  "{package_name}", only alphanumeric values and underscores are allowed'
+                )
         else:
-            raise RuntimeError("Too many : in the specification of scripts")
-        scripts[script_target] = link_name
-
-    # Repo URL validation
-    parsed_repo_url = parse_giturl(repo_url, check_domain=False)
-    if not parsed_repo_url.valid:
-        raise RuntimeError(f'Git repo "{repo_url}" invalid, specify another repo')
-
-    # Package name validation
-    package_name = args.package_name  # type: str
-    if package_name:
-        if not validate_package_name(package_name):
+            package_name = normalize_package_name(repo_name)
+        self.package_name = package_name
+
+        self.dest_dir = (
+            args.dest_dir if args.dest_dir else (dest_root or Path().cwd()) / package_name
+        )  # type: Path
+        self.repo_dir = self.dest_dir / "src" / f"wrapped_{package_name}" / package_name
+
+        name_components = repo_name.rsplit("@")
+        self.branch = ""
+        if len(name_components) == 2:
+            self.branch = name_components[1]
+        self.repo_url = repo_url.removesuffix(f"@{self.branch}")
+
+        # Sparse checkout defaults to the directories of the exposed scripts
+        if sparse is not None and not sparse:
+            sparse_dirs = set()
+            for script_target in script_targets:
+                parts = Path(script_target).parent.parts
+                static_parts = []
+                for part in parts:
+                    if is_glob(part):
+                        break
+                    static_parts.append(part)
+                if not static_parts and len(parts) > len(static_parts):
+                    logger.warning(
+                        'Script pattern "%s" may match any directory, checking out all files',
+                        script_target,
+                    )
+                    sparse = None
+                    break
+                if static_parts:
+                    sparse_dirs.add("/".join(static_parts))
+            else:
+                sparse = sorted(sparse_dirs)
+
+        wapp_config = WappConfig()
+        wapp_config.url = self.repo_url
+        wapp_config.branch = self.branch
+        wapp_config.depth = args.depth
+        wapp_config.filter = args.filter
+        wapp_config.sparse = sparse or []
+        wapp_config.script_args = list(script_args)
+        wapp_config.backend = args.backend
+        wapp_config.launcher = args.launcher
+        wapp_config.compile = args.compile
+        wapp_config.install_mode = "editable" if self.editable else "wheel"
+        wapp_config.installer = args.installer
+        wapp_config.exclude = args.exclude
+        wapp_config.include = args.include
+        wapp_config.scan_imports = args.scan_imports
+        self.wapp_config = wapp_config
+        self.sparse = sparse
+
+        self.repo = None  # type: Optional[git.Repo]
+        self.version = ""
+        self.scripts = {}  # type: Dict[str, str]
+        self.changes = None  # type: Optional[WrapChanges]
+        self.wheel_path = None  # type: Optional[Path]
+        self.install_state = WRAPPED if self.editable else BUILT
+
+    def clone(self):
+        """
+        Clones the repo into the empty destination.
+        """
+        if not self.dest_dir.exists():
+            self.dest_dir.mkdir(parents=True, exist_ok=True)
+            logger.info("Created %s", self.dest_dir)
+
+        if self.dest_dir.exists() and list(self.dest_dir.iterdir()):
             raise RuntimeError(
-                f'Specified invalid repo name  "{package_name}", only alphanumeric values and underscores are allowed'
+                f'Destination "{self.dest_dir}" not empty, change directory or #specify another destination'
             )
-    else:
-        package_name = normalize_package_name(parsed_repo_url.name)
 
-    # Destination validation
-    dest_dir = (
-        args.dest_dir if args.dest_dir else Path().cwd() / package_name
-    )  # type: Path
+        self.repo_dir.mkdir(exist_ok=True, parents=True)
+
+        reference = None
+        if self.use_cache:
+            logger.info("Updating mirror of %s", self.repo_url)
+            reference = update_mirror(self.repo_url)
+
+        logger.info("Cloning %s into %s", self.repo_url, self.repo_dir)
+        if self.branch:
+            logger.info("Switching branch to %s", self.branch)
+        # Hold the mirror lock while cloning so it is not evicted meanwhile
+        with get_mirror_lock(reference) if reference else nullcontext():
+            if reference and not reference.is_dir():
+                logger.debug("Mirror %s was evicted, cloning without it", reference)
+                reference = None
+            self.repo = clone_repo(
+                self.repo_url,
+                self.repo_dir,
+                self.branch,
+                self.wapp_config.depth,
+                self.wapp_config.filter,
+                self.sparse,
+                reference,
+            )
+        self.version = get_git_version_string(self.repo)
 
-    if not dest_dir.exists():
-        dest_dir.mkdir(parents=True, exist_ok=True)
-        logger.info("Created %s", dest_dir)
+    def discover(self):
+        """
+        Resolves the exposed scripts, all top-level Python files if no
+        scripts are specified.
+        """
+        logger.info("Enumerating exposed scripts:")
+        python_files = discover_python_files(self.repo, self.use_cache)
+        self.scripts = resolve_scripts(self.wapp_config.script_args, python_files)
 
-    if dest_dir.exists() and list(dest_dir.iterdir()):
-        raise RuntimeError(
-            f'Destination "{dest_dir}" not empty, change directory or #specify another destination'
+    def wrap(self):
+        """
+        Generates the wrappers and project files.
+        """
+        tree = None
+        if self.use_cache and self.wapp_config.scan_imports != "off":
+            tree = get_python_tree(self.repo)
+        self.changes = wrap_project(
+            self.dest_dir,
+            self.repo_dir,
+            self.requires,
+            self.package_name,
+            self.version,
+            self.scripts,
+            self.wapp_config,
+            tree=tree,
         )
 
-    repo_dir = dest_dir / "src" / f"wrapped_{package_name}" / package_name
-    repo_dir.mkdir(exist_ok=True, parents=True)
-
-    # Clone repo
-    name_components = parsed_repo_url.name.rsplit("@")
-    branch = ""
-    if len(name_components) == 2:
-        branch = name_components[1]
-
-    repo_url = repo_url.removesuffix(f"@{branch}")
-
-    logger.info("Cloning %s into %s", repo_url, repo_dir)
-    repo = GitRepo.clone_from(url=repo_url, to_path=repo_dir)
-    if branch:
-        logger.info("Switching branch to %s", branch)
-        repo.git.checkout(branch)
-    version = get_git_version_string(repo)
-
-    # Enumerate python scripts to be exposed as executable
-    # If scripts is not define, auto-discover them
-    logger.info("Enumerating exposed scripts:")
-    path_list = [
-        path.name
-        for path in repo_dir.iterdir()
-        if is_python_file(path)
-    ]
-    if not scripts:
-        scripts.update({path: path for path in path_list})
-    else:
-        path_list_complete = [
-            str(path.relative_to(repo_dir))
-            for path in repo_dir.glob("**/*")
-            if is_python_file(path)
-        ]
-        for script_target in scripts.keys():
-            if script_target not in path_list_complete:
-                raise RuntimeError(f'Target script "{script_target}" not found')
-
-    wrap_project(dest_dir, repo_dir, requires, package_name, version, scripts)
-    wheel_path = build_wheel(dest_dir)
-
-    logger.info("Successfully created wrapped package %s", package_name)
-    logger.info("Package revision: %s", version)
-
-    if install:
-        logger.info('Running "pipx install %s":', wheel_path)
-        retval, output = install_via_pipx(wheel_path.absolute())
-        [logger.info("  %s", line) for line in output.splitlines()]
-        logger.info("pipx exited with: %d", retval)
-    else:
-        logger.info('Run "pipx install %s" to install package', wheel_path)
+    def build(self):
+        """
+        Builds the wheel, editable installs run the live checkout instead.
+        """
+        if self.editable:
+            logger.info("Successfully created wrapped package %s", self.package_name)
+            logger.info("Package revision: %s", self.version)
+            return
+
+        # A resumed creation may find the wheel of unchanged project files
+        if self.changes is not None and not self.changes:
+            self.wheel_path = get_built_wheel(
+                self.dest_dir, self.package_name, self.version
+            )
+        if self.wheel_path:
+            logger.info("Project files unchanged, reusing %s", self.wheel_path.name)
+        else:
+            cache_key = None
+            if self.use_cache:
+                cache_key = get_wheel_cache_key(
+                    self.dest_dir, self.repo, self.wapp_config.ships_bytecode()
+                )
+            self.wheel_path = build_wheel(
+                self.dest_dir,
+                cache_key,
+                self.wapp_config.backend,
+                get_before_build(self.repo_dir, self.wapp_config),
+            )
+            log_wheel_size_report(self.wheel_path)
+
+        logger.info("Successfully created wrapped package %s", self.package_name)
+        logger.info("Package revision: %s", self.version)
+
+    def install(self):
+        """
+        Installs the package if requested and records it in the registry.
+        """
+        path = self.dest_dir if self.editable else self.wheel_path
+        if self.pipx:
+            self.install_state = get_install_state(
+                install_project(
+                    self.dest_dir,
+                    path,
+                    self.wapp_config,
+                    use_cache=self.use_cache,
+                    timeout=self.install_timeout,
+                )
+            )
+        elif self.editable:
+            logger.info(
+                'Run "pipx install --editable %s" to install package',
+                self.dest_dir.absolute(),
+            )
+        else:
+            logger.info('Run "pipx install %s" to install package', path)
+
+        fields = {}
+        if self.wheel_path:
+            fields = get_wheel_fields(self.wheel_path)
+        record_project(
+            self.dest_dir,
+            package_name=self.package_name,
+            url=self.repo_url,
+            branch=self.branch,
+            commit_sha=self.repo.head.commit.hexsha,
+            version=self.version,
+            scripts=self.scripts,
+            installer=self.wapp_config.installer,
+            install_state=self.install_state,
+            **get_requirement_fields(self.dest_dir),
+            **fields,
+        )
+
+    def get_clone_options(self) -> Dict[str, Any]:
+        """
+        Get the options deciding the outcome of the clone stage.
+
+        Returns:
+            Dict[str, Any]: JSON serializable options.
+        """
+        return {
+            "url": self.repo_url,
+            "branch": self.branch,
+            "depth": self.wapp_config.depth,
+            "filter": self.wapp_config.filter,
+            "sparse": self.sparse,
+            "dest_dir": str(self.dest_dir.absolute()),
+            "package_name": self.package_name,
+        }
+
+    def run(self, stage: str):
+        """
+        Runs a single stage.
+
+        Args:
+            stage (str): One of STAGES.
+        """
+        if stage not in Creation.STAGES:
+            raise ValueError(f"Unknown stage {stage}")
+        getattr(self, stage)()
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        Get the state needed by the remaining stages.
+
+        Returns:
+            Dict[str, Any]: JSON serializable state.
+        """
+        return {
+            "version": self.version,
+            "scripts": self.scripts,
+            "wheel_path": str(self.wheel_path) if self.wheel_path else "",
+            "install_state": self.install_state,
+        }
+
+    def restore(self, checkpoint: Dict[str, Any]):
+        """
+        Restores the state saved by checkpoint after the clone stage.
+
+        Args:
+            checkpoint (Dict[str, Any]): The saved state.
+        """
+        try:
+            self.repo = git.Repo(self.repo_dir)
+        except (git.exc.NoSuchPathError, git.exc.InvalidGitRepositoryError) as e:
+            raise RuntimeError(f'Checkpointed clone "{self.repo_dir}" is missing') from e
+        self.version = checkpoint["version"]
+        self.scripts = dict(checkpoint["scripts"])
+        if checkpoint["wheel_path"]:
+            self.wheel_path = Path(checkpoint["wheel_path"])
+        self.install_state = checkpoint["install_state"]
+
+
+def create(args):
+    creation = Creation(args)
+    for stage in Creation.STAGES:
+        creation.run(stage)
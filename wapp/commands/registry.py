@@ -0,0 +1,218 @@
+import logging
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+from wapp.registry import (
+    Registry,
+    RegistryEntry,
+    get_requirement_fields,
+    get_wheel_fields,
+)
+
+# asyncio and the Git engine are only loaded by status --refresh
+if TYPE_CHECKING:
+    from wapp.gitasync import GitEngine
+
+logger = logging.getLogger(__name__)
+
+
+def _format_age(timestamp: float) -> str:
+    if not timestamp:
+        return "never"
+    age = time.time() - timestamp
+    for unit, seconds in (("d", 86400), ("h", 3600), ("m", 60)):
+        if age >= seconds:
+            return f"{int(age // seconds)}{unit} ago"
+    return "just now"
+
+
+def _print_json(entries: List[RegistryEntry]):
+    import json  # pylint: disable=C0415
+
+    print(json.dumps([entry.to_dict() for entry in entries], indent=2))
+
+
+def list_projects(args):
+    with Registry() as registry:
+        entries = registry.entries()
+
+    if args.json:
+        _print_json(entries)
+        return
+    if not entries:
+        logger.info('No wrapped projects registered, run "wapp reindex ROOT"')
+        return
+
+    width = max(len(entry.package_name) for entry in entries)
+    for entry in entries:
+        logger.info(
+            "%-*s %-14s %-40s %s",
+            width,
+            entry.package_name,
+            entry.install_state,
+            entry.version,
+            entry.dest_dir,
+        )
+        if args.scripts:
+            for link_name in sorted(entry.scripts.values()):
+                logger.info("  %s", link_name)
+
+
+async def _refresh_all(
+    entries: List[RegistryEntry], engine: "GitEngine"
+) -> List[Optional[str]]:
+    import asyncio  # pylint: disable=C0415
+
+    async def _refresh(entry: RegistryEntry) -> Optional[str]:
+        repo_dir = (
+            Path(entry.dest_dir)
+            / "src"
+            / f"wrapped_{entry.package_name}"
+            / entry.package_name
+        )
+        try:
+            return await engine.get_remote_head(repo_dir, entry.url)
+        except (RuntimeError, OSError) as e:
+            logger.warning("Failed to query upstream of %s: %s", entry.package_name, e)
+            return None
+
+    return await asyncio.gather(*(_refresh(entry) for entry in entries))
+
+
+def status(args):
+    with Registry() as registry:
+        entries = registry.entries()
+        if args.refresh and entries:
+            import asyncio  # pylint: disable=C0415
+
+            from wapp.gitasync import GitEngine  # pylint: disable=C0415
+
+            engine = GitEngine(
+                jobs_per_host=args.jobs,
+                max_jobs=args.git_jobs,
+                timeout=args.git_timeout,
+            )
+            remote_heads = asyncio.run(_refresh_all(entries, engine))
+            for entry, remote_head in zip(entries, remote_heads):
+                if remote_head:
+                    registry.record(
+                        Path(entry.dest_dir),
+                        remote_head=remote_head,
+                        checked_at=time.time(),
+                    )
+            entries = registry.entries()
+
+    if args.json:
+        _print_json(entries)
+        return
+    if not entries:
+        logger.info('No wrapped projects registered, run "wapp reindex ROOT"')
+        return
+
+    width = max(len(entry.package_name) for entry in entries)
+    for entry in entries:
+        logger.info(
+            "%-*s %-8s %-7s %-7s checked %s",
+            width,
+            entry.package_name,
+            entry.status,
+            entry.commit_sha[:7] or "-",
+            entry.remote_head[:7] or "-",
+            _format_age(entry.checked_at),
+        )
+    behind = [entry for entry in entries if entry.status == "behind"]
+    logger.info("%d of %d packages behind upstream", len(behind), len(entries))
+
+
+def reindex(args):
+    # Reading the projects from disk needs Git, listing them does not
+    import git  # pylint: disable=C0415
+    import git.exc  # pylint: disable=C0415
+
+    from wapp.commands.update import (  # pylint: disable=C0415
+        WrappedProject,
+        find_wrapped_dirs,
+    )
+
+    roots = args.roots  # type: List[Path]
+
+    indexed = 0
+    with Registry() as registry:
+        for dest_dir in find_wrapped_dirs(roots):
+            try:
+                project = WrappedProject(dest_dir)
+                repo = git.Repo(project.repo_dir)
+                fields = {
+                    "package_name": project.package_name,
+                    "url": project.wapp_config.url or repo.remotes.origin.url,
+                    "branch": project.wapp_config.branch,
+                    "commit_sha": repo.head.commit.hexsha,
+                    "version": project.version,
+                    "scripts": project.scripts,
+                    "installer": project.wapp_config.installer,
+                }
+                fields.update(get_requirement_fields(dest_dir))
+                wheels = sorted(
+                    (dest_dir / "dist").glob("*.whl"),
+                    key=lambda wheel: wheel.stat().st_mtime,
+                )
+                if wheels:
+                    fields.update(get_wheel_fields(wheels[-1]))
+            except (RuntimeError, git.exc.GitError, OSError, ValueError) as e:
+                logger.warning("Skipping %s: %s", dest_dir, e)
+                continue
+            registry.record(dest_dir, **fields)
+            indexed += 1
+
+        removed = 0
+        for entry in registry.entries():
+            if not (Path(entry.dest_dir) / ".wapp").is_file():
+                registry.remove(entry.dest_dir)
+                removed += 1
+
+    logger.info("Indexed %d wrapped projects, removed %d stale entries", indexed, removed)
+
+
+def requirements(args):
+    from wapp.files.requirements import RequirementsIndex  # pylint: disable=C0415
+
+    with Registry() as registry:
+        entries = registry.entries()
+
+    # Packages wrapped more than once are told apart by their directory
+    names = [entry.package_name for entry in entries]
+    index = RequirementsIndex()
+    for entry in entries:
+        label = entry.package_name
+        if names.count(label) > 1:
+            label = entry.dest_dir
+        index.add(label, entry.requirements)
+    shared = index.get_shared()
+    conflicts = index.get_conflicts()
+    shown = conflicts if args.conflicts else shared
+
+    if args.json:
+        import json  # pylint: disable=C0415
+
+        result = [
+            {
+                "name": name,
+                "conflict": name in conflicts,
+                "requirements": requirements,
+            }
+            for name, requirements in shown.items()
+        ]
+        print(json.dumps(result, indent=2))
+        return
+
+    for name, requirements in shown.items():
+        logger.info("%s%s", name, " (conflict)" if name in conflicts else "")
+        for requirement, package_names in requirements.items():
+            logger.info("  %-40s %s", requirement, ", ".join(package_names))
+    logger.info(
+        "%d dependencies shared by several of %d packages, %d conflicting",
+        len(shared),
+        len(entries),
+        len(conflicts),
+    )
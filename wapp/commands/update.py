@@ -1,69 +1,600 @@
+import asyncio
 import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional
 
 import git
 import git.exc
 
-from wapp.commands import wrap_project
+from wapp.cache.wheel import get_wheel_cache_key
+from wapp.commands import (
+    get_before_build,
+    get_built_wheel,
+    install_project,
+    wrap_project,
+)
+from wapp.discovery import discover_python_files, get_python_tree, resolve_scripts
 from wapp.files.pyproject import Pyproject
 from wapp.files.requirements import Requirements
-from wapp.utils import build_wheel, get_git_version_string, update_via_pipx
+from wapp.files.wapp_config import WappConfig
+from wapp.gitasync import GitEngine
+from wapp.profiling import set_attribute, span, traced
+from wapp.registry import (
+    BUILT,
+    WRAPPED,
+    get_install_state,
+    get_requirement_fields,
+    get_wheel_fields,
+    record_project,
+)
+from wapp.utils import (
+    DirectoryLock,
+    build_wheel,
+    get_git_version_string,
+    log_wheel_size_report,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class UpdateResult:
+    """
+    Outcome of updating a single wrapped project.
+
+    Attributes:
+        dest_dir (Path): The directory containing the wrapped project.
+        package_name (str): The name of the wrapped package.
+        status (str): One of UPDATED, UNCHANGED or FAILED.
+        old_version (str): The package version before the update.
+        version (str): The package version after the update.
+        error (str): The reason of a failed update.
+        pull_time (float): Seconds spent updating the repo.
+        build_time (float): Seconds spent building and installing the package.
+    """
+
+    UPDATED = "updated"
+    UNCHANGED = "unchanged"
+    FAILED = "failed"
+
+    def __init__(self, dest_dir: Path) -> None:
+        self.dest_dir = dest_dir
+        self.package_name = dest_dir.name
+        self.status = UpdateResult.UNCHANGED
+        self.old_version = ""
+        self.version = ""
+        self.error = ""
+        self.pull_time = 0.0
+        self.build_time = 0.0
+
+
+class WrappedProject:
+    """
+    State of a wrapped project shared between the pull and the build phase
+    of an update.
+
+    Attributes:
+        dest_dir (Path): The directory containing the wrapped project.
+        repo_dir (Path): The directory containing the cloned repo.
+        pyproject (Pyproject): The current pyproject.toml of the project.
+        wapp_config (WappConfig): The settings stored in the .wapp marker.
+        scripts (Dict[str, str]): Exposed scripts mapped to their link names.
+        requires (List[str]): Custom requirements of the project.
+        repo (Optional[git.Repo]): The wrapped Git repository object.
+        version (str): The package version after pulling the repo.
+        fast_path (bool): Whether upstream did not move and pulling was
+            skipped.
+        lock (Optional[DirectoryLock]): The lock held between pull and build.
+        rediscover (bool): Whether to resolve the exposed scripts again
+            although create was given no script patterns.
+        install_timeout (Optional[float]): Seconds before the installer is
+            killed.
+        install_slots (Optional[threading.BoundedSemaphore]): Limits the
+            installs running concurrently.
+    """
+
+    def __init__(self, dest_dir: Path) -> None:
+        requires = []
+        custom_requirements_path = dest_dir / "custom_requirements.txt"
+        if custom_requirements_path.exists():
+            custom_requirements = Requirements.from_config(custom_requirements_path)
+            requires = [str(item) for item in custom_requirements.conf.values()]
+
+        wapp_identifier_path = dest_dir / ".wapp"
+        if not wapp_identifier_path.exists():
+            raise RuntimeError("Seems to be not a wapp-wrapped project, are you sure?")
+
+        pyproject_path = dest_dir / "pyproject.toml"
+        if not pyproject_path.exists():
+            raise RuntimeError(
+                "Seems to be not a wapp-wrapped project, missing pyproject.toml"
+            )
+
+        self.dest_dir = dest_dir
+        self.pyproject = Pyproject.from_config(pyproject_path)
+        self.wapp_config = WappConfig.from_config(wapp_identifier_path)
+        self.requires = requires
+        self.repo_dir = (
+            dest_dir / "src" / f"wrapped_{self.pyproject.name}" / self.pyproject.name
+        )
+
+        # Markers of older projects do not record the exposed scripts
+        self.scripts = dict(self.wapp_config.scripts)
+        if not self.scripts:
+            for link_name, script_target in self.pyproject.scripts.items():
+                if not (self.repo_dir / script_target).exists():
+                    script_target = script_target.removesuffix(".py")
+                self.scripts[script_target] = link_name
+        self.version = self.pyproject.version
+        self.repo = None  # type: Optional[git.Repo]
+        self.fast_path = False
+        self.lock = None  # type: Optional[DirectoryLock]
+        self.rediscover = False
+        self.install_timeout = None  # type: Optional[float]
+        self.install_slots = None  # type: Optional[threading.BoundedSemaphore]
+
+    @property
+    def package_name(self) -> str:
+        return self.pyproject.name
+
+    @property
+    def changed(self) -> bool:
+        return self.pyproject.version != self.version
+
+    @traced("update_pull")
+    def pull(self, engine: Optional[GitEngine] = None):
+        """
+        Pulls the latest changes of the wrapped repo.
+
+        Args:
+            engine (Optional[GitEngine]): Runs the Git commands, defaults to
+                a new engine.
+        """
+        set_attribute("package", self.package_name)
+        asyncio.run(self.pull_async(engine or GitEngine()))
+        set_attribute("fast_path", self.fast_path)
+
+    async def pull_async(self, engine: GitEngine):
+        """
+        Pulls the latest changes of the wrapped repo on the event loop of
+        the engine, skipping the fetch when upstream did not move. Blocking
+        repo and registry access runs in worker threads.
+
+        Args:
+            engine (GitEngine): Runs the Git commands.
+        """
+        logger.debug("Old package version %s", self.pyproject.version)
+        logger.info("Updating Repo %s", self.repo_dir)
+        head = await asyncio.to_thread(self.open_repo)
+
+        remote_head = await engine.get_remote_head(self.repo_dir, self.wapp_config.url)
+        if remote_head and remote_head == head:
+            logger.debug("Upstream still at %s", remote_head)
+            self.fast_path = True
+        else:
+            await engine.pull(
+                self.repo_dir, self.wapp_config.url, self.wapp_config.depth
+            )
+            remote_head = None
+
+        await asyncio.to_thread(self.record_pull, remote_head)
+
+    def open_repo(self) -> str:
+        """
+        Opens the wrapped repo.
+
+        Raises:
+            RuntimeError: If the wrapped repo is not a Git repository.
+
+        Returns:
+            str: The checked out commit.
+        """
+        try:
+            repo = git.Repo(self.repo_dir)
+        except (git.exc.NoSuchPathError, git.exc.InvalidGitRepositoryError) as e:
+            raise RuntimeError(
+                f'Seems to be not a wapp-wrapped projection, reason: "{self.repo_dir}" not a git repo'
+            ) from e
+        self.repo = repo
+        if not self.wapp_config.url:
+            self.wapp_config.url = repo.remotes.origin.url
+        return repo.head.commit.hexsha
+
+    def record_pull(self, remote_head: Optional[str] = None):
+        """
+        Determines the new version and records the pull in the registry.
+
+        Args:
+            remote_head (Optional[str]): The upstream head, the checked out
+                commit if not known.
+        """
+        commit_sha = self.repo.head.commit.hexsha
+        self.version = get_git_version_string(self.repo)
+
+        registry_fields = {}
+        if not self.changed:
+            registry_fields["version"] = self.version
+        record_project(
+            self.dest_dir,
+            package_name=self.package_name,
+            url=self.wapp_config.url,
+            branch=self.wapp_config.branch,
+            commit_sha=commit_sha,
+            remote_head=remote_head or commit_sha,
+            checked_at=time.time(),
+            scripts=self.scripts,
+            installer=self.wapp_config.installer,
+            **registry_fields,
+        )
+
+    @traced("update_rebuild")
+    def rebuild(self, install: bool, use_cache: bool = True):
+        """
+        Regenerates the wrapped project, builds its wheel and optionally
+        upgrades it via pipx.
+
+        Args:
+            install (bool): Whether to upgrade the package via pipx.
+            use_cache (bool): Whether to look up and store the wheel in the
+                wheel cache.
+        """
+        set_attribute("package", self.package_name)
+        logger.info(
+            "Updated package from %s to %s", self.pyproject.version, self.version
+        )
+
+        old_scripts = dict(self.scripts)
+
+        python_files = discover_python_files(self.repo, use_cache)
+        script_args = self.wapp_config.script_args
+        if script_args or self.rediscover:
+            # Patterns given to create are resolved again
+            self.scripts = resolve_scripts(script_args or [], python_files)
+        else:
+            self.scripts = self.keep_scripts(python_files)
+        for script_target in sorted(self.scripts.keys() - old_scripts.keys()):
+            logger.info("Exposing new script %s", script_target)
+        for script_target in sorted(old_scripts.keys() - self.scripts.keys()):
+            logger.info("No longer exposing script %s", script_target)
+
+        tree = None
+        if use_cache and self.wapp_config.scan_imports != "off":
+            tree = get_python_tree(self.repo)
+        changes = wrap_project(
+            self.dest_dir,
+            self.repo_dir,
+            self.requires,
+            self.package_name,
+            self.version,
+            self.scripts,
+            self.wapp_config,
+            tree=tree,
+        )
+
+        if self.wapp_config.install_mode == "editable":
+            # Entry points and dependencies are fixed at install time, the
+            # code is run from the checkout
+            reinstall = self.scripts != old_scripts or "requirements.txt" in changes
+            install_state = self.reinstall_editable(install, reinstall, use_cache)
+            self.record(install_state)
+            return
+
+        wheel_path = None
+        if not changes:
+            wheel_path = get_built_wheel(self.dest_dir, self.package_name, self.version)
+        if wheel_path:
+            logger.info("Project files unchanged, reusing %s", wheel_path.name)
+        else:
+            cache_key = None
+            if use_cache:
+                cache_key = get_wheel_cache_key(
+                    self.dest_dir, self.repo, self.wapp_config.ships_bytecode()
+                )
+            wheel_path = build_wheel(
+                self.dest_dir,
+                cache_key,
+                self.wapp_config.backend,
+                get_before_build(self.repo_dir, self.wapp_config),
+            )
+            log_wheel_size_report(wheel_path)
+
+        logger.info("Successfully updated wrapped package %s", self.package_name)
+
+        install_state = BUILT
+        if install:
+            install_state = self.install(wheel_path, use_cache)
+        else:
+            logger.info('Run "pipx install --force %s" to update package', wheel_path)
+        self.record(install_state, **get_wheel_fields(wheel_path))
+
+    def keep_scripts(self, python_files: List[str]) -> Dict[str, str]:
+        """
+        Keeps the recorded scripts of a project created without script
+        patterns. Scripts added upstream are only reported, they are exposed
+        by an update with --rediscover.
+
+        Args:
+            python_files (List[str]): The paths of all Python files of the repo.
+
+        Raises:
+            RuntimeError: If a script is missing and the project predates
+                recording its discovery settings.
+
+        Returns:
+            Dict[str, str]: Exposed scripts mapped to their link names.
+        """
+        known_files = set(python_files)
+        scripts = {}
+        for script_target, link_name in self.scripts.items():
+            if script_target in known_files:
+                scripts[script_target] = link_name
+            elif self.wapp_config.script_args is None:
+                raise RuntimeError(f'Target script "{script_target}" not found')
+            else:
+                logger.warning('Script "%s" was removed upstream', script_target)
+
+        if self.wapp_config.script_args is not None:
+            added = resolve_scripts([], python_files).keys() - self.scripts.keys()
+            if added:
+                logger.info(
+                    'New scripts not exposed, run "wapp update --rediscover" to expose them: %s',
+                    ", ".join(sorted(added)),
+                )
+        return scripts
+
+    def reinstall_editable(
+        self, install: bool, reinstall: bool, use_cache: bool = True
+    ) -> Optional[str]:
+        """
+        Reinstalls an editable project via pipx if its entry points or
+        dependencies changed.
+
+        Args:
+            install (bool): Whether to reinstall the package via pipx.
+            reinstall (bool): Whether the scripts or requirements changed.
+            use_cache (bool): Whether to install dependencies from the
+                wheelhouse.
+
+        Returns:
+            Optional[str]: The new install state, None if unchanged.
+        """
+        if not reinstall:
+            logger.info(
+                "Successfully updated wrapped package %s in place", self.package_name
+            )
+            return None
+
+        logger.info("Scripts or requirements of %s changed", self.package_name)
+        if install:
+            return self.install(self.dest_dir, use_cache)
+        logger.info(
+            'Run "pipx install --force --editable %s" to update package',
+            self.dest_dir.absolute(),
+        )
+        return WRAPPED
+
+    def install(self, path: Path, use_cache: bool = True) -> str:
+        """
+        Upgrades the installed package, waiting for a free install slot.
+
+        Args:
+            path (Path): The built wheel or, for editable installs, dest_dir.
+            use_cache (bool): Whether to install dependencies from the
+                wheelhouse.
+
+        Returns:
+            str: The new install state.
+        """
+        with self.install_slots or nullcontext():
+            return get_install_state(
+                install_project(
+                    self.dest_dir,
+                    path,
+                    self.wapp_config,
+                    upgrade=True,
+                    use_cache=use_cache,
+                    timeout=self.install_timeout,
+                )
+            )
+
+    def record(self, install_state: Optional[str], **fields):
+        """
+        Records the rebuilt project in the registry.
+
+        Args:
+            install_state (Optional[str]): The new install state, None to
+                keep the recorded one.
+            **fields: Further registry fields, e.g. of the built wheel.
+        """
+        if install_state:
+            fields["install_state"] = install_state
+        record_project(
+            self.dest_dir,
+            version=self.version,
+            commit_sha=self.repo.head.commit.hexsha,
+            scripts=self.scripts,
+            **get_requirement_fields(self.dest_dir),
+            **fields,
+        )
+
+
 def update(args):
+    if args.roots:
+        update_all(args)
+        return
+
+    if not args.wrapped_dir:
+        raise RuntimeError("Specify a wrapped directory or use --all")
+
     dest_dir = args.wrapped_dir  # type: Path
     install = args.pipx  # type: bool
+    use_cache = args.cache  # type: bool
+
+    with DirectoryLock(dest_dir):
+        project = WrappedProject(dest_dir)
+        project.install_timeout = args.install_timeout
+        project.rediscover = args.rediscover
+        project.pull(GitEngine(timeout=args.git_timeout))
+
+        if project.changed or project.rediscover:
+            project.rebuild(install, use_cache)
+        else:
+            logger.info("Already latest revision %s", project.version)
+
 
-    requires = []
-    custom_requirements_path = dest_dir / "custom_requirements.txt"
-    if custom_requirements_path.exists():
-        custom_requirements = Requirements.from_config(custom_requirements_path)
-        requires = custom_requirements.conf.values()
+def find_wrapped_dirs(roots: List[Path]) -> Iterator[Path]:
+    """
+    Find all wapp-wrapped projects below the given root directories.
 
-    wapp_identifier_path = dest_dir / ".wapp"
-    if not wapp_identifier_path.exists():
-        raise RuntimeError("Seems to be not a wapp-wrapped project, are you sure?")
+    Wrapped projects are identified by their .wapp marker, the search does
+    not descend into wrapped projects or hidden directories.
+
+    Args:
+        roots (List[Path]): The directories to search.
+
+    Yields:
+        Path: The directory of each wrapped project.
+    """
+    seen = set()
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            if ".wapp" in filenames:
+                dirnames.clear()
+                wrapped_dir = Path(dirpath)
+                if wrapped_dir.resolve() not in seen:
+                    seen.add(wrapped_dir.resolve())
+                    yield wrapped_dir
+                continue
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+
+
+def update_all(args):
+    roots = args.roots  # type: List[Path]
+    install = args.pipx  # type: bool
+    use_cache = args.cache  # type: bool
+    jobs = max(args.jobs, 1)  # type: int
+    build_jobs = max(args.build_jobs, 1)  # type: int
+    install_slots = threading.BoundedSemaphore(max(args.install_jobs, 1))
 
-    pyproject_path = dest_dir / "pyproject.toml"
-    if not pyproject_path.exists():
+    wrapped_dirs = list(find_wrapped_dirs(roots))
+    if not wrapped_dirs:
         raise RuntimeError(
-            "Seems to be not a wapp-wrapped project, missing pyproject.toml"
+            f'No wrapped projects found in {", ".join(str(r) for r in roots)}'
         )
+    logger.info("Found %d wrapped projects", len(wrapped_dirs))
 
-    pyproject = Pyproject.from_config(pyproject_path)
-    package_name = pyproject.name
-    scripts = pyproject.scripts
-    version = pyproject.version
+    results = []  # type: List[UpdateResult]
+    pulled = []  # type: List[UpdateResult]
 
-    logger.debug("Old package version %s", version)
-    logger.info("Updating Repo")
-    repo_dir = dest_dir / "src" / f"wrapped_{pyproject.name}" / pyproject.name
-    try:
-        repo = git.Repo(repo_dir)
-        version = get_git_version_string(repo)
+    def _on_progress(repo_dir: Path, line: str):
+        logger.debug("  %s: %s", repo_dir.name, line)
 
-        repo.remotes.origin.pull()
-    except git.exc.NoSuchPathError as e:
-        raise RuntimeError(
-            f'Seems to be not a wapp-wrapped projection, reason: "{repo_dir}" not a git repo'
-        ) from e
+    engine = GitEngine(
+        jobs_per_host=jobs,
+        max_jobs=args.git_jobs,
+        timeout=args.git_timeout,
+        on_progress=_on_progress,
+    )
 
-    if pyproject.version != version:
-        logger.info("Updated package from %s to %s", pyproject.version, version)
+    def _rebuild(project: WrappedProject, result: UpdateResult):
+        start = time.perf_counter()
+        try:
+            project.rebuild(install, use_cache)
+            result.status = UpdateResult.UPDATED
+        except Exception as e:  # pylint: disable=W0718
+            result.status = UpdateResult.FAILED
+            result.error = str(e)
+        finally:
+            project.lock.release()
+            result.build_time = time.perf_counter() - start
 
-        wrap_project(dest_dir, repo_dir, requires, package_name, version, scripts)
-        wheel_path = build_wheel(dest_dir)
+    async def _update(
+        dest_dir: Path, result: UpdateResult, build_pool: ThreadPoolExecutor
+    ):
+        start = time.perf_counter()
+        lock = DirectoryLock(dest_dir)
+        try:
+            lock.acquire()
+            project = await asyncio.to_thread(WrappedProject, dest_dir)
+            project.install_timeout = args.install_timeout
+            project.install_slots = install_slots
+            project.rediscover = args.rediscover
+            result.package_name = project.package_name
+            result.old_version = project.pyproject.version
+            with span("update_pull", package=project.package_name):
+                await project.pull_async(engine)
+                set_attribute("fast_path", project.fast_path)
+            result.version = project.version
+        except Exception as e:  # pylint: disable=W0718
+            lock.release()
+            result.status = UpdateResult.FAILED
+            result.error = str(e)
+            return
+        finally:
+            result.pull_time = time.perf_counter() - start
+            pulled.append(result)
+            logger.info(
+                "[%d/%d] Pulled %s", len(pulled), len(wrapped_dirs), result.package_name
+            )
 
-        logger.info("Successfully updated wrapped package %s", package_name)
+        if not project.changed and not project.rediscover:
+            lock.release()
+            return
+        project.lock = lock
+        # Builds start as soon as their pull finished
+        await asyncio.get_running_loop().run_in_executor(
+            build_pool, _rebuild, project, result
+        )
 
-        if install:
-            logger.info('Running "pipx upgrade %s":', wheel_path)
-            retval, output = update_via_pipx(wheel_path.absolute())
-            [logger.info("  %s", line) for line in output.splitlines()]
-            logger.info("pipx exited with: %d", retval)
+    async def _update_all():
+        with ThreadPoolExecutor(max_workers=build_jobs) as build_pool:
+            await asyncio.gather(
+                *(_update(result.dest_dir, result, build_pool) for result in results)
+            )
+
+    results.extend(UpdateResult(dest_dir) for dest_dir in wrapped_dirs)
+    with span("update_all", projects=len(wrapped_dirs)):
+        asyncio.run(_update_all())
+
+    log_update_summary(results)
+
+    failed = [result for result in results if result.status == UpdateResult.FAILED]
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(results)} packages failed to update")
+
+
+def log_update_summary(results: List[UpdateResult]):
+    """
+    Log a per-package summary of a bulk update.
+
+    Args:
+        results (List[UpdateResult]): The results of each updated project.
+    """
+    width = max(len(str(result.dest_dir)) for result in results)
+    logger.info("Summary:")
+    logger.info(
+        "  %-*s %-9s %7s %7s  %s", width, "project", "status", "pull", "build", ""
+    )
+    for result in sorted(results, key=lambda r: r.dest_dir):
+        if result.status == UpdateResult.UPDATED:
+            detail = f"{result.old_version} -> {result.version}"
+        elif result.status == UpdateResult.FAILED:
+            detail = result.error
         else:
-            logger.info('Run "pipx upgrade %s" to update package', wheel_path)
-    else:
-        logger.info("Already latest revision %s", version)
+            detail = result.version
+        logger.info(
+            "  %-*s %-9s %6.1fs %6.1fs  %s",
+            width,
+            str(result.dest_dir),
+            result.status,
+            result.pull_time,
+            result.build_time,
+            detail,
+        )
+    for status in (UpdateResult.UPDATED, UpdateResult.UNCHANGED, UpdateResult.FAILED):
+        count = len([result for result in results if result.status == status])
+        logger.info("  %s: %d", status, count)
@@ -0,0 +1,75 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+from wapp.cache.wheelhouse import fill_wheelhouse, get_wheelhouse_dir, list_wheelhouse
+from wapp.commands.update import find_wrapped_dirs
+from wapp.files.wapp_config import WappConfig
+from wapp.utils import get_installer_python
+
+logger = logging.getLogger(__name__)
+
+
+def prefetch(args):
+    roots = args.roots  # type: List[Path]
+    jobs = max(args.jobs, 1)  # type: int
+
+    # Wrapped packages with identical requirements and target interpreter
+    # are fetched once
+    requirements = {}  # type: Dict[str, Path]
+    build_requirements = {}  # type: Dict[str, bool]
+    pythons = {}  # type: Dict[str, str]
+    for dest_dir in find_wrapped_dirs(roots):
+        requirements_path = dest_dir / "requirements.txt"
+        if not requirements_path.is_file():
+            continue
+        wapp_config = WappConfig.from_config(dest_dir / ".wapp")
+        python = get_installer_python(wapp_config.installer)
+        key = hashlib.sha256(requirements_path.read_bytes()).hexdigest()
+        key += f":{python}"
+        requirements.setdefault(key, requirements_path)
+        pythons[key] = python
+        if wapp_config.install_mode == "editable":
+            build_requirements[key] = True
+
+    if not requirements:
+        raise RuntimeError(
+            f'No wrapped projects found in {", ".join(str(r) for r in roots)}'
+        )
+    logger.info(
+        "Prefetching %d distinct requirement sets into %s",
+        len(requirements),
+        get_wheelhouse_dir(),
+    )
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            key: pool.submit(
+                fill_wheelhouse,
+                path,
+                build_requirements.get(key, False),
+                pythons[key],
+                path.parent.name,
+            )
+            for key, path in requirements.items()
+        }
+    failed = [
+        requirements[key] for key, future in futures.items() if not future.result()
+    ]
+
+    logger.info("Wheelhouse holds %d wheels", len(list_wheelhouse()))
+    if failed:
+        raise RuntimeError(
+            f"Failed to prefetch {', '.join(str(path) for path in failed)}"
+        )
+
+
+def wheelhouse(args):
+    command = args.wheelhouse_command  # type: str
+
+    if command == "prefetch":
+        prefetch(args)
+    else:
+        raise RuntimeError("Command not implemented")
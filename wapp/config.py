@@ -1,8 +1,81 @@
+import logging
+import os
 from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Any, Dict
+
+logger = logging.getLogger()
+
+
+def load_toml(filename: Path) -> Dict[str, Any]:
+    """
+    Load a TOML file.
+
+    Reading uses the stdlib parser, which is much faster to import than
+    tomlkit. tomlkit is only loaded to render files.
+
+    Args:
+        filename (Path): The file to load.
+
+    Returns:
+        Dict[str, Any]: The parsed document.
+    """
+    import tomllib  # pylint: disable=C0415
+
+    with open(str(filename), "rb") as f:
+        conf = tomllib.load(f)
+
+    logger.debug("Loaded %s", filename)
+    return conf
+
+
+def write_if_changed(filename: Path, content: str) -> bool:
+    """
+    Atomically replace a file unless it already has the given content, so
+    unchanged files keep their modification time.
+
+    Args:
+        filename (Path): The file to write.
+        content (str): The new content.
+
+    Returns:
+        bool: True if the file was written.
+    """
+    data = content.encode("utf-8")
+    try:
+        if filename.stat().st_size == len(data) and filename.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+
+    tmp_path = filename.with_name(f".{filename.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return True
 
 
 class Config(ABC):
     @abstractmethod
-    def write(self, filename: Path):
+    def render(self) -> str:
         pass
+
+    def write(self, filename: Path) -> bool:
+        """
+        Writes the rendered file unless its content did not change.
+
+        Args:
+            filename (Path): The path of the file.
+
+        Returns:
+            bool: True if the file was written.
+        """
+        changed = write_if_changed(filename, self.render())
+        if changed:
+            logger.debug("Created %s", filename)
+        else:
+            logger.debug("Unchanged %s", filename)
+        return changed
@@ -0,0 +1,283 @@
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+from wapp.cache.discovery import get_cached_python_files, store_python_files
+from wapp.profiling import set_attribute, traced
+
+if TYPE_CHECKING:
+    import git
+
+logger = logging.getLogger(__name__)
+
+# Only the first line of a file is inspected for a shebang
+SHEBANG_SIZE = 256
+
+# Modes of regular files and symlinks in a Git tree, submodules are skipped
+FILE_MODES = ("100644", "100755", "120000")
+
+
+def _read_shebang(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read(SHEBANG_SIZE).split(b"\n", 1)[0]
+    except OSError:
+        return None
+
+
+def is_python_shebang(line: bytes) -> bool:
+    """
+    Checks whether the first line of a file is a Python shebang.
+
+    Args:
+        line (bytes): The first line of the file.
+
+    Returns:
+        bool: True if the line starts a Python script.
+    """
+    return line.startswith(b"#!") and b"python" in line
+
+
+def list_tracked_files(repo: "git.Repo") -> List[str]:
+    """
+    List the files tracked in the checked out commit of a repo.
+
+    Args:
+        repo (git.Repo): The Git repository object.
+
+    Returns:
+        List[str]: The paths of all tracked files relative to the repo.
+    """
+    output = repo.git.ls_tree("-r", "-z", "--full-tree", "HEAD")
+    paths = []
+    for entry in output.split("\0"):
+        if not entry:
+            continue
+        meta, path = entry.split("\t", 1)
+        if meta.split(" ", 1)[0] in FILE_MODES:
+            paths.append(path)
+    return paths
+
+
+def list_skipped_files(repo: "git.Repo") -> Set[str]:
+    """
+    List the tracked files left out of a sparse checkout.
+
+    Args:
+        repo (git.Repo): The Git repository object.
+
+    Returns:
+        Set[str]: The paths of all files outside the sparse checkout relative
+        to the repo, empty if the checkout is not sparse.
+    """
+    output = repo.git.ls_files("-z", "-t")
+    # Files outside the sparse checkout carry the skip-worktree bit
+    return {entry[2:] for entry in output.split("\0") if entry.startswith("S ")}
+
+
+@traced("discovery")
+def discover_python_files(
+    repo: "git.Repo", use_cache: bool = True, workers: int = 8
+) -> List[str]:
+    """
+    Discover the Python files of a repo from its tracked files, without
+    walking the working tree. Files ending in .py are Python files, the
+    first line of all other files is read in parallel to detect a Python
+    shebang. Files outside a sparse checkout are skipped, they are not
+    packaged. Results are cached by the tree of the checked out commit,
+    unless the checkout is sparse.
+
+    Args:
+        repo (git.Repo): The Git repository object.
+        use_cache (bool): Whether to look up and store the result in the
+            discovery cache.
+        workers (int): The number of threads reading shebangs.
+
+    Returns:
+        List[str]: The paths of all Python files relative to the repo.
+    """
+    tree = repo.head.commit.tree.hexsha
+    skipped = list_skipped_files(repo)
+    # The cache holds the Python files of complete trees
+    use_cache = use_cache and not skipped
+    if use_cache:
+        python_files = get_cached_python_files(tree)
+        if python_files is not None:
+            logger.debug("Using cached discovery of tree %s", tree)
+            set_attribute("cache_hit", True)
+            set_attribute("python_files", len(python_files))
+            return python_files
+
+    python_files = []
+    candidates = []
+    for path in list_tracked_files(repo):
+        if path in skipped:
+            continue
+        if path.endswith(".py"):
+            python_files.append(path)
+        else:
+            candidates.append(path)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        shebangs = list(
+            pool.map(
+                _read_shebang,
+                [os.path.join(repo.working_tree_dir, path) for path in candidates],
+                chunksize=64,
+            )
+        )
+
+    # Files missing from the working tree cannot be inspected
+    complete = True
+    for path, shebang in zip(candidates, shebangs):
+        if shebang is None:
+            complete = False
+        elif is_python_shebang(shebang):
+            python_files.append(path)
+    python_files.sort()
+    set_attribute("tracked_files", len(python_files) + len(candidates))
+    set_attribute("files_read", len(candidates))
+    set_attribute("python_files", len(python_files))
+
+    logger.debug(
+        "Discovered %d Python files among %d tracked files",
+        len(python_files),
+        len(python_files) + len(candidates),
+    )
+    if use_cache and complete:
+        store_python_files(tree, python_files)
+    return python_files
+
+
+def get_python_tree(repo: "git.Repo") -> Optional[str]:
+    """
+    Get the tree of the checked out commit if the Python files of the
+    working tree match it, so results derived from them can be cached by
+    the tree.
+
+    Args:
+        repo (git.Repo): The Git repository object.
+
+    Returns:
+        Optional[str]: The hash of the Git tree, None if Python files are
+        modified, untracked, ignored or left out of a sparse checkout.
+    """
+    output = repo.git.status("--porcelain", "-z", "--ignored", "--untracked-files=all")
+    # Entries are "XY path", renames are followed by their source path
+    if any(entry.endswith(".py") for entry in output.split("\0")):
+        return None
+    if list_skipped_files(repo):
+        return None
+    return repo.head.commit.tree.hexsha
+
+
+def parse_script_args(script_args: List[str]) -> List[Tuple[str, str]]:
+    """
+    Parse script specifications of the form "target[:link_name]".
+
+    Args:
+        script_args (List[str]): The script specifications.
+
+    Returns:
+        List[Tuple[str, str]]: The target and link name of each script, the
+        link name is empty if not specified.
+    """
+    parsed = []
+    for script_arg in script_args:
+        splitted_script = script_arg.split(":")
+        if len(splitted_script) == 1:
+            script_target, link_name = script_arg, ""
+        elif len(splitted_script) == 2:
+            script_target, link_name = splitted_script
+            if not script_target or not link_name:
+                raise RuntimeError("Target or link name cannot be empty")
+        else:
+            raise RuntimeError("Too many : in the specification of scripts")
+        parsed.append((script_target, link_name))
+    return parsed
+
+
+def is_glob(pattern: str) -> bool:
+    return any(char in pattern for char in "*?[")
+
+
+def _glob_to_regex(pattern: str) -> "re.Pattern":
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(pattern[i])
+                i += 1
+            else:
+                regex += pattern[i : end + 1].replace("[!", "[^", 1)
+                i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(regex + "$")
+
+
+def resolve_scripts(
+    script_args: List[str], python_files: List[str]
+) -> Dict[str, str]:
+    """
+    Resolve script specifications against the Python files of a repo.
+
+    Without specifications all top-level Python files are exposed. Targets
+    may be glob patterns, where "*" does not match "/" and "**/" matches any
+    number of directories. Scripts matched by a pattern are linked by their
+    file name unless the pattern matches a single script and specifies a
+    link name.
+
+    Args:
+        script_args (List[str]): The script specifications.
+        python_files (List[str]): The paths of all Python files of the repo.
+
+    Returns:
+        Dict[str, str]: Exposed scripts mapped to their link names.
+    """
+    if not script_args:
+        return {path: path for path in python_files if "/" not in path}
+
+    known_files = set(python_files)
+    scripts = {}
+    for script_target, link_name in parse_script_args(script_args):
+        if not is_glob(script_target):
+            if script_target not in known_files:
+                raise RuntimeError(f'Target script "{script_target}" not found')
+            scripts[script_target] = link_name or script_target
+            continue
+
+        regex = _glob_to_regex(script_target)
+        matches = [path for path in python_files if regex.match(path)]
+        if not matches:
+            raise RuntimeError(f'No scripts match "{script_target}"')
+        if link_name and len(matches) > 1:
+            raise RuntimeError(
+                f'Link name "{link_name}" given for {len(matches)} scripts matching "{script_target}"'
+            )
+        for path in matches:
+            scripts.setdefault(path, link_name or Path(path).name)
+
+    link_names = list(scripts.values())
+    duplicates = sorted({name for name in link_names if link_names.count(name) > 1})
+    if duplicates:
+        raise RuntimeError(f"Duplicate link names: {', '.join(duplicates)}")
+    return scripts
@@ -0,0 +1,163 @@
+import keyword
+import logging
+from pathlib import Path
+from typing import Dict
+
+from wapp.config import Config
+from wapp.filters import PathFilter
+
+logger = logging.getLogger()
+
+# Modules generated by wapp next to the wrapped repo, never indexed
+RESERVED_PREFIX = "_wapp_"
+
+IMPORT_HOOK_SRC = """import builtins
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+# Modules of the wrapped repo by their name below this package, mapped to
+# their path relative to the wrapped repo, namespace packages end with "/"
+MODULES = {modules}
+
+_ROOT = os.path.join(os.path.dirname(__file__), "{wrapped_repo}")
+_PREFIX = __name__ + "."
+_TOP_LEVEL = frozenset(name for name in MODULES if "." not in name)
+_next_import = builtins.__import__
+
+
+def _import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Absolute imports of the wrapped repo's own modules, like "from lib
+    # import utils", resolve below this package, as the wrapped repo comes
+    # first on sys.path when its scripts run. Only modules of this package,
+    # loaded by _Loader, are redirected and no bare names enter sys.modules.
+    # importlib.import_module() bypasses __import__, dynamic imports of the
+    # wrapped repo's modules need their name below this package
+    if (
+        level
+        or name.partition(".")[0] not in _TOP_LEVEL
+        or not globals
+        or not isinstance(globals.get("__loader__"), _Loader)
+    ):
+        return _next_import(name, globals, locals, fromlist, level)
+    module = _next_import(_PREFIX + name, globals, locals, fromlist)
+    if fromlist:
+        return module
+    return sys.modules[_PREFIX + name.partition(".")[0]]
+
+
+class _Loader(importlib.machinery.SourceFileLoader):
+    pass
+
+
+def _get_spec(fullname, path):
+    if path.endswith("/"):
+        spec = importlib.machinery.ModuleSpec(fullname, None, is_package=True)
+        spec.submodule_search_locations.append(os.path.join(_ROOT, path[:-1]))
+        return spec
+    location = os.path.join(_ROOT, path)
+    return importlib.util.spec_from_file_location(
+        fullname, location, loader=_Loader(fullname, location)
+    )
+
+
+class _Finder:
+    def find_spec(self, fullname, path=None, target=None):
+        if not fullname.startswith(_PREFIX):
+            return None
+        module_path = MODULES.get(fullname[len(_PREFIX):])
+        if module_path is None:
+            return None
+        return _get_spec(fullname, module_path)
+
+
+# Hooked into the shared builtins instead of a copy per module, so modules
+# see later changes to builtins and look up builtin names at full speed.
+# Other importers pass straight through to the previous __import__
+builtins.__import__ = _import
+sys.meta_path.insert(0, _Finder())
+"""
+
+
+def is_module_name(name: str) -> bool:
+    return name.isidentifier() and not keyword.iskeyword(name)
+
+
+def get_module_index(repo_dir: Path, path_filter: PathFilter) -> Dict[str, str]:
+    """
+    Index the packaged modules of a wrapped repo by their dotted name.
+
+    Regular packages take precedence over modules of the same name, which
+    take precedence over namespace packages, as with the default import
+    system. Files whose path is no valid module name are skipped.
+
+    Args:
+        repo_dir (Path): The directory containing the wrapped repo.
+        path_filter (PathFilter): Decides which files are packaged.
+
+    Returns:
+        Dict[str, str]: Module names mapped to their path relative to the
+        wrapped repo, directories of namespace packages end with "/".
+    """
+    packages = {}  # type: Dict[str, str]
+    modules = {}  # type: Dict[str, str]
+    for path in path_filter.iter_packaged(repo_dir):
+        if not path.endswith(".py"):
+            continue
+        parts = path[: -len(".py")].split("/")
+        if not all(is_module_name(part) for part in parts):
+            continue
+        if parts[-1] == "__init__":
+            if len(parts) > 1:
+                packages[".".join(parts[:-1])] = path
+        elif not parts[0].startswith(RESERVED_PREFIX):
+            modules[".".join(parts)] = path
+
+    index = dict(packages)
+    for name, path in modules.items():
+        index.setdefault(name, path)
+    for name in list(index):
+        parts = name.split(".")
+        for i in range(1, len(parts)):
+            index.setdefault(".".join(parts[:i]), "/".join(parts[:i]) + "/")
+    return dict(sorted(index.items()))
+
+
+class ImportHook(Config):
+    """
+    The package module of a wrapped package, installing a meta path finder
+    which imports the modules of the wrapped repo below the package, e.g.
+    wrapped_foo.lib.utils from lib/utils.py, by a lookup in a module index
+    built at wrap time instead of searching sys.path. Absolute imports
+    within the wrapped repo resolve to the same modules, for importers
+    below the package only.
+
+    Attributes:
+        package_name (str): The name of the package being wrapped.
+        modules (Dict[str, str]): The module index of the wrapped repo.
+    """
+
+    def __init__(self, package_name: str, modules: Dict[str, str]) -> None:
+        """
+        Initializes a new ImportHook instance.
+
+        Args:
+            package_name (str): The name of the package being wrapped.
+            modules (Dict[str, str]): The module index of the wrapped repo.
+        """
+        self.package_name = package_name
+        self.modules = dict(modules)
+
+    def render(self) -> str:
+        """
+        Renders the package module.
+
+        Returns:
+            str: The source of the package module.
+        """
+        import pprint  # pylint: disable=C0415
+
+        return IMPORT_HOOK_SRC.format(
+            modules=pprint.pformat(self.modules), wrapped_repo=self.package_name
+        )
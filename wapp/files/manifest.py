@@ -0,0 +1,108 @@
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from wapp.config import Config, load_toml
+
+logger = logging.getLogger()
+
+# Manifest keys taking a value, a list of values or acting as flag
+VALUE_OPTIONS = [
+    "package_name",
+    "dest_dir",
+    "depth",
+    "filter",
+    "backend",
+    "launcher",
+    "installer",
+    "install_timeout",
+    "scan_imports",
+]
+LIST_OPTIONS = ["scripts", "requires", "exclude", "include", "sparse"]
+FLAG_OPTIONS = ["pipx", "editable", "compile"]
+
+
+class Manifest(Config):
+    """
+    List of repositories to wrap in bulk, e.g.
+
+        [defaults]
+        root = "/opt/tools"
+        pipx = true
+
+        [[package]]
+        url = "https://github.com/dirkjanm/krbrelayx"
+        requires = ["impacket", "ldap3", "dnspython"]
+
+    Each package takes the options of create, the defaults apply to all
+    packages. Destinations are relative to the root, which is relative to
+    the manifest.
+
+    Attributes:
+        root (Path): The directory containing the wrapped projects, the root
+            of the defaults joined with the directory of the manifest.
+        defaults (Dict[str, Any]): Options shared by all packages, with the
+            root as written in the manifest.
+        packages (List[Dict[str, Any]]): The options of each package.
+    """
+
+    def __init__(
+        self, conf: Optional[Dict] = None, base_dir: Optional[Path] = None
+    ) -> None:
+        conf = conf or {}
+        self.defaults = dict(conf.get("defaults", {}))  # type: Dict[str, Any]
+        root = self.defaults.get("root", ".")
+        self.root = (base_dir or Path()) / root  # type: Path
+        self.packages = [
+            dict(package) for package in conf.get("package", [])
+        ]  # type: List[Dict[str, Any]]
+
+    @staticmethod
+    def from_config(filename: Path) -> "Manifest":
+        return Manifest(load_toml(filename), filename.parent)
+
+    def get_create_args(self, index: int) -> List[str]:
+        """
+        Translate the options of a package into create arguments.
+
+        Args:
+            index (int): The index of the package.
+
+        Returns:
+            List[str]: The command line of create.
+        """
+        options = {key: value for key, value in self.defaults.items() if key != "root"}
+        options.update(self.packages[index])
+        url = options.pop("url", "")
+        if not url:
+            raise RuntimeError(f"Package {index + 1} of the manifest has no url")
+
+        args = []
+        if "dest_dir" in options:
+            options["dest_dir"] = str(self.root / options["dest_dir"])
+        if not options.pop("cache", True):
+            args.append("--no_cache")
+        for key, value in options.items():
+            if key in VALUE_OPTIONS:
+                args += [f"--{key}", str(value)]
+            elif key in LIST_OPTIONS:
+                if isinstance(value, str):
+                    value = [value]
+                args += [f"--{key}"] + [str(item) for item in value]
+            elif key in FLAG_OPTIONS:
+                if value:
+                    args.append(f"--{key}")
+            else:
+                raise RuntimeError(
+                    f'Unknown option "{key}" of package {index + 1} in the manifest'
+                )
+        return ["create"] + args + ["--", url]
+
+    def render(self) -> str:
+        # The root stays relative to the manifest it is written to
+        conf = {"defaults": dict(self.defaults)}
+        conf["package"] = self.packages
+
+        from tomlkit import dumps as dumps_toml  # pylint: disable=C0415
+
+        return dumps_toml(conf)
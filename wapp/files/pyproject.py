@@ -1,11 +1,9 @@
+import copy
 import logging
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-from tomlkit import dump as dump_toml
-from tomlkit import load as load_toml
-
-from wapp.config import Config
+from wapp.config import Config, load_toml
 
 logger = logging.getLogger()
 
@@ -28,38 +26,47 @@ class Pyproject(Config):
                 "include-package-data": True,
                 "package-data": {"*": ["*", "*/**"]},
                 "dynamic": {"dependencies": {"file": ["requirements.txt"]}},
-                "py-modules": ["__NAME__"],
                 "packages": {"find": {"where": ["src"]}},
             }
         },
     }
 
     def __init__(self, conf: Optional[Dict] = None) -> None:
-        self.scripts = {}
+        self.scripts = {}  # type: Dict[str, str]
+        self.entry_points = {}  # type: Dict[str, str]
         self.name = ""
         self.version = ""
+        self.exclude_package_data = []  # type: List[str]
+        self.exclude_packages = []  # type: List[str]
         if conf:
             self.conf = dict(conf)
             self.name = conf["project"]["name"]
-            for target, link in conf["project"]["scripts"].items():
-                link = link.removeprefix("wrapped_")
-                link = "".join([link.split(":")[0], ".py"])
-                self.scripts[link] = target
+            self.entry_points = dict(conf["project"]["scripts"])
+            for link_name, entry_point in self.entry_points.items():
+                module, _, attribute = entry_point.partition(":")
+                # Only wrappers generated per script name the script target
+                if attribute != "main":
+                    continue
+                module = module.removeprefix(f"wrapped_{self.name}.")
+                module = module.removeprefix("wrapped_")
+                self.scripts[link_name] = "".join([module, ".py"])
             self.version = conf["project"]["version"]
+            setuptools_conf = conf["tool"]["setuptools"]
+            self.exclude_package_data = list(
+                setuptools_conf.get("exclude-package-data", {}).get("*", [])
+            )
+            self.exclude_packages = list(
+                setuptools_conf["packages"]["find"].get("exclude", [])
+            )
         else:
-            self.conf = Pyproject.PYPROJECT_SRC.copy()
+            self.conf = copy.deepcopy(Pyproject.PYPROJECT_SRC)
 
     @staticmethod
     def from_config(filename: Path) -> "Pyproject":
-        conf = {}
-        with open(str(filename), "r", encoding="utf-8") as f:
-            conf = load_toml(f).unwrap()
+        return Pyproject(load_toml(filename))
 
-        logger.debug("Loaded %s", filename)
-        return Pyproject(conf)
-
-    def add_script(self, script_target: str, link_name: str):
-        self.scripts[link_name] = script_target
+    def add_entry_point(self, link_name: str, entry_point: str):
+        self.entry_points[link_name] = entry_point
 
     def set_name(self, name: str):
         self.name = name
@@ -67,7 +74,11 @@ class Pyproject(Config):
     def set_version(self, version: str):
         self.version = version
 
-    def write(self, filename: Path):
+    def set_excludes(self, package_data: List[str], packages: List[str]):
+        self.exclude_package_data = package_data
+        self.exclude_packages = packages
+
+    def render(self) -> str:
         name = self.name
         if not name:
             logger.warning('No package name set, defaulting to name "package"')
@@ -80,18 +91,18 @@ class Pyproject(Config):
 
         self.conf["project"]["name"] = self.name
         self.conf["project"]["version"] = self.version
-        self.conf["tool"]["setuptools"]["py-modules"] = []
-        for link_name, script_target in self.scripts.items():
-            script_target = script_target.removesuffix(".py")
+        self.conf["project"]["scripts"] = dict(self.entry_points)
 
-            self.conf["tool"]["setuptools"]["py-modules"].append(
-                f"wrapped_{script_target}"
-            )
-            self.conf["project"]["scripts"][
-                link_name
-            ] = f"wrapped_{self.name}.wrapped_{script_target}:main"
+        # The launcher is part of the wrapped package, no top-level modules
+        setuptools_conf = self.conf["tool"]["setuptools"]
+        setuptools_conf.pop("py-modules", None)
+        setuptools_conf.pop("exclude-package-data", None)
+        setuptools_conf["packages"]["find"].pop("exclude", None)
+        if self.exclude_package_data:
+            setuptools_conf["exclude-package-data"] = {"*": self.exclude_package_data}
+        if self.exclude_packages:
+            setuptools_conf["packages"]["find"]["exclude"] = self.exclude_packages
 
-        with open(str(filename), "w", encoding="utf-8") as f:
-            dump_toml(self.conf, f)
+        from tomlkit import dumps as dumps_toml  # pylint: disable=C0415
 
-        logger.debug("Created %s", filename)
+        return dumps_toml(self.conf)
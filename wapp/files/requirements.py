@@ -2,57 +2,387 @@ import logging
 import re
 from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Optional
-
-from giturlparse import parse as parse_giturl
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Set
 
 from wapp.config import Config
 
+if TYPE_CHECKING:
+    from packaging.requirements import Requirement
+    from packaging.specifiers import SpecifierSet
+
 logger = logging.getLogger()
 
+# Options including further files, mapped to whether they hold constraints
+INCLUDE_OPTIONS = {
+    "-r": False,
+    "--requirement": False,
+    "-c": True,
+    "--constraint": True,
+}
+
+
+def canonicalize(name: str) -> str:
+    """
+    Normalize a distribution name as in PEP 503, e.g. "Foo_Bar" to "foo-bar".
+
+    Args:
+        name (str): The distribution name.
+
+    Returns:
+        str: The canonical name.
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def parse_requirement(line: str) -> "Requirement":
+    """
+    Parse a PEP 508 requirement.
+
+    Args:
+        line (str): The requirement, e.g. 'foo[bar]>=1.0; os_name == "posix"'.
+
+    Raises:
+        RuntimeError: If the requirement is invalid.
+
+    Returns:
+        Requirement: The parsed requirement.
+    """
+    from packaging.requirements import (  # pylint: disable=C0415
+        InvalidRequirement,
+        Requirement,
+    )
+
+    try:
+        return Requirement(line)
+    except InvalidRequirement as e:
+        reason = str(e).splitlines()[0]
+        raise RuntimeError(f'Invalid requirement "{line}": {reason}') from e
+
+
+def get_key(requirement: "Requirement") -> str:
+    """
+    Get the key of a requirement, its canonical name and environment marker.
+    Requirements of the same name may differ by their marker.
+
+    Args:
+        requirement (Requirement): The requirement.
+
+    Returns:
+        str: The key, e.g. 'foo-bar; python_version < "3.8"'.
+    """
+    key = canonicalize(requirement.name)
+    if requirement.marker:
+        key += f"; {requirement.marker}"
+    return key
+
+
+def _iter_lines(filename: Path) -> Iterator[str]:
+    with open(str(filename), "r", encoding="utf-8") as f:
+        content = f.read()
+    # Backslashes continue a line, comments start at a # after whitespace
+    for line in re.sub(r"\\\n", "", content).splitlines():
+        line = re.sub(r"(^|\s)#.*$", "", line).strip()
+        if line:
+            yield line
+
 
 class Requirements(Config):
+    """
+    Requirements of a wrapped project, in the requirements file format of pip.
 
-    @staticmethod
-    def _extract_package_name(string: str):
-        result = re.match(r"^([a-zA-Z0-9_]*).*$", string)
-        if result:
-            return result.group(1)
-
-    def __init__(self, conf: Optional[Dict] = None) -> None:
-        self.new_conf = OrderedDict()
-        if conf:
-            self.conf = conf.copy()
-        else:
-            self.conf = OrderedDict()
+    Requirements are parsed as PEP 508 and keyed by their canonical name and
+    marker. Included files (-r) are resolved recursively, constraints (-c)
+    narrow down the versions of requirements of the same name. Other pip
+    options are dropped, setuptools only takes plain requirements.
+
+    Attributes:
+        conf (OrderedDict): Requirements loaded from a file, by key.
+        new_conf (OrderedDict): Added requirements, by key. They replace all
+            loaded requirements of the same name.
+        constraints (Dict[str, SpecifierSet]): Version constraints by
+            canonical name.
+    """
+
+    def __init__(self, conf: Optional[Dict[str, "Requirement"]] = None) -> None:
+        self.new_conf = OrderedDict()  # type: OrderedDict
+        self.conf = OrderedDict(conf or {})  # type: OrderedDict
+        self.constraints = {}  # type: Dict[str, SpecifierSet]
 
     @staticmethod
     def from_config(filename: Path) -> "Requirements":
-        old_conf = OrderedDict()
-        with open(str(filename), "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                package_name = Requirements._extract_package_name(line)
-                old_conf[package_name] = line
+        requirements = Requirements()
+        requirements._load(filename, set())
         logger.debug("Loaded %s", filename)
-        return Requirements(conf=old_conf)
+        return requirements
+
+    def _load(self, filename: Path, seen: Set[Path], constraint: bool = False):
+        path = filename.resolve()
+        if path in seen:
+            logger.warning("Skipping recursive include of %s", filename)
+            return
+        seen.add(path)
+
+        for line in _iter_lines(filename):
+            if line.startswith("-"):
+                self._load_option(filename, line, seen)
+                continue
+
+            # Per-requirement options like --hash follow the requirement
+            line = re.split(r"\s+--?[a-zA-Z]", line, maxsplit=1)[0]
+            try:
+                requirement = parse_requirement(line)
+            except RuntimeError as e:
+                logger.warning("Ignoring %s in %s", e, filename)
+                continue
+            if constraint:
+                self.add_constraint(requirement)
+            else:
+                self._add(self.conf, requirement)
+
+    def _load_option(self, filename: Path, line: str, seen: Set[Path]):
+        if line.startswith("--"):
+            option, _, value = line.partition("=" if "=" in line else " ")
+        else:
+            # Short options may be followed by their value without space
+            option, value = line[:2], line[2:]
+        value = value.strip()
+        if option in INCLUDE_OPTIONS and value:
+            if "://" in value:
+                logger.warning("Ignoring remote include %s in %s", value, filename)
+            else:
+                self._load(filename.parent / value, seen, INCLUDE_OPTIONS[option])
+        elif option in ("-e", "--editable") and "#egg=" in value:
+            # Editable VCS checkouts are installed as regular direct references
+            name = re.split(r"[&\[]", value.split("#egg=", 1)[1])[0]
+            self._add(self.conf, parse_requirement(f"{name} @ {value}"))
+        else:
+            logger.warning('Ignoring option "%s" in %s', line, filename)
+
+    @staticmethod
+    def _add(conf: OrderedDict, requirement: "Requirement"):
+        key = get_key(requirement)
+        existing = conf.get(key)
+        if existing is None:
+            conf[key] = requirement
+            return
+        # Repeated requirements must all be satisfied
+        logger.debug("Combining requirements %s and %s", existing, requirement)
+        existing.specifier &= requirement.specifier
+        existing.extras |= requirement.extras
+        existing.url = existing.url or requirement.url
+
+    def add_constraint(self, requirement: "Requirement"):
+        """
+        Constrain the versions of requirements of the same name, without
+        requiring the package.
+
+        Args:
+            requirement (Requirement): The constraint.
+        """
+        if requirement.url:
+            logger.warning("Ignoring direct reference constraint %s", requirement)
+            return
+        name = canonicalize(requirement.name)
+        if name in self.constraints:
+            self.constraints[name] &= requirement.specifier
+        else:
+            self.constraints[name] = requirement.specifier
 
     def add_dependency(self, dependency: str):
+        from giturlparse import parse as parse_giturl  # pylint: disable=C0415
+
+        # Bare Git URLs are named after their repo, unlike direct references
         parsed = parse_giturl(dependency, check_domain=False)
-        if parsed.valid:
+        if parsed.valid and " @ " not in dependency:
             dependency = f"{parsed.name} @ {dependency}"
 
-        package_name = Requirements._extract_package_name(dependency)
-        self.new_conf[package_name] = dependency
+        requirement = parse_requirement(dependency)
+        self.new_conf[get_key(requirement)] = requirement
+
+    def get_conflicts(self, other: "Requirements") -> List[str]:
+        """
+        Find dependencies which cannot be satisfied by one version for both
+        requirements in this environment, see RequirementsIndex.get_conflicts.
+
+        Args:
+            other (Requirements): The requirements to compare with.
+
+        Returns:
+            List[str]: The canonical names of the conflicting dependencies.
+        """
+        requirements = _get_applying(self.merge().values())
+        conflicts = []
+        for name, others in _get_applying(other.merge().values()).items():
+            if name in requirements and _is_conflicting(requirements[name] + others):
+                conflicts.append(name)
+        return conflicts
+
+    def get_package_names(self) -> List[str]:
+        """
+        Get the names of all required packages.
 
-    def write(self, filename: Path) -> OrderedDict:
-        # Merge old requirements with new requirements
-        merged_conf = self.conf.copy()
+        Returns:
+            List[str]: The package names.
+        """
+        names = [requirement.name for requirement in self.merge().values()]
+        return list(dict.fromkeys(names))
+
+    def merge(self) -> OrderedDict:
+        """
+        Merge the added requirements into the loaded requirements and apply
+        the constraints.
+
+        Returns:
+            OrderedDict: The resulting requirements by key.
+        """
+        replaced = {canonicalize(r.name) for r in self.new_conf.values()}
+        merged_conf = OrderedDict(
+            (key, requirement)
+            for key, requirement in self.conf.items()
+            if canonicalize(requirement.name) not in replaced
+        )
         merged_conf.update(self.new_conf)
 
-        with open(str(filename), "w", encoding="utf-8") as f:
-            for item in merged_conf.values():
-                f.write(item)
-                f.write("\n")
-        logger.debug("Created %s", filename)
+        for key, requirement in merged_conf.items():
+            constraint = self.constraints.get(canonicalize(requirement.name))
+            if constraint is not None and not requirement.url:
+                requirement = parse_requirement(str(requirement))
+                requirement.specifier &= constraint
+                merged_conf[key] = requirement
         return merged_conf
+
+    def render(self) -> str:
+        return "".join(f"{requirement}\n" for requirement in self.merge().values())
+
+
+class RequirementsIndex:
+    """
+    Requirements of several wrapped packages by canonical name, finding the
+    dependencies they share and the ones they pin incompatibly.
+
+    Attributes:
+        requirements (Dict[str, Dict[str, Set[str]]]): Canonical names mapped
+            to each requirement of that name and the packages requiring it.
+    """
+
+    def __init__(self) -> None:
+        self.requirements = {}  # type: Dict[str, Dict[str, Set[str]]]
+
+    def add(self, package_name: str, requirements: Iterable[str]):
+        """
+        Add the requirements of a package.
+
+        Args:
+            package_name (str): The name of the wrapped package.
+            requirements (Iterable[str]): Its PEP 508 requirements.
+        """
+        for line in requirements:
+            try:
+                requirement = parse_requirement(line)
+            except RuntimeError as e:
+                logger.warning("Ignoring %s of %s", e, package_name)
+                continue
+            packages = self.requirements.setdefault(
+                canonicalize(requirement.name), {}
+            ).setdefault(str(requirement), set())
+            packages.add(package_name)
+
+    def get_shared(self) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Get the dependencies required by several packages.
+
+        Returns:
+            Dict[str, Dict[str, List[str]]]: Canonical names mapped to each
+            requirement of that name and the packages requiring it.
+        """
+        shared = {}
+        for name, requirements in sorted(self.requirements.items()):
+            if len(set().union(*requirements.values())) > 1:
+                shared[name] = {
+                    line: sorted(packages) for line, packages in requirements.items()
+                }
+        return shared
+
+    def get_conflicts(self) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Get the shared dependencies which cannot be satisfied by one version
+        in this environment. Requirements conflict if they reference different
+        URLs, or if no version satisfies the specifiers of all of them, e.g.
+        "foo>=2" and "foo<2" but not "foo>=1.0" and "foo>=1.0,<2".
+        Requirements whose marker does not apply to this environment are
+        ignored.
+
+        Returns:
+            Dict[str, Dict[str, List[str]]]: Canonical names mapped to each
+            requirement of that name and the packages requiring it.
+        """
+        conflicts = {}
+        for name, requirements in self.get_shared().items():
+            applying = _get_applying(map(parse_requirement, requirements))
+            if _is_conflicting(applying.get(name, [])):
+                conflicts[name] = requirements
+        return conflicts
+
+
+def _get_applying(
+    requirements: Iterable["Requirement"],
+) -> Dict[str, List["Requirement"]]:
+    # Requirements whose marker applies to this environment by canonical name
+    applying = {}  # type: Dict[str, List[Requirement]]
+    for requirement in requirements:
+        if not requirement.marker or requirement.marker.evaluate():
+            name = canonicalize(requirement.name)
+            applying.setdefault(name, []).append(requirement)
+    return applying
+
+
+def _get_candidates(specifier_sets: List["SpecifierSet"]) -> Set[str]:
+    # Versions satisfying all specifiers form ranges bounded by the versions
+    # the specifiers mention, one at, just above or just below a bound is
+    # found in any non-empty range
+    from packaging.version import InvalidVersion, Version  # pylint: disable=C0415
+
+    candidates = {"0", str(2**63)}
+    for specifier_set in specifier_sets:
+        for specifier in specifier_set:
+            wildcard = specifier.version.endswith(".*")
+            version = specifier.version[:-2] if wildcard else specifier.version
+            candidates.add(version)
+            try:
+                parsed = Version(version)
+            except InvalidVersion:
+                continue
+            epoch = f"{parsed.epoch}!" if parsed.epoch else ""
+            release = list(parsed.release)
+            bounds = [release]
+            if wildcard or specifier.operator == "~=":
+                # The prefix following the matched one, e.g. 1.5 for ==1.4.*
+                prefix = release if wildcard else release[:-1]
+                bounds.append(prefix[:-1] + [prefix[-1] + 1])
+            for bound in bounds:
+                candidates.add(epoch + ".".join(map(str, bound)))
+                candidates.add(epoch + ".".join(map(str, bound + [0, 0, 0, 1])))
+                nonzero = [i for i, part in enumerate(bound) if part]
+                if nonzero:
+                    below = bound[: nonzero[-1]] + [bound[nonzero[-1]] - 1, 2**31]
+                    candidates.add(epoch + ".".join(map(str, below)))
+    return candidates
+
+
+def _intersects(specifier_sets: List["SpecifierSet"]) -> bool:
+    return any(
+        all(
+            specifier_set.contains(candidate, prereleases=True)
+            for specifier_set in specifier_sets
+        )
+        for candidate in _get_candidates(specifier_sets)
+    )
+
+
+def _is_conflicting(requirements: List["Requirement"]) -> bool:
+    urls = {requirement.url for requirement in requirements if requirement.url}
+    if len(urls) > 1:
+        return True
+    return not _intersects(
+        [requirement.specifier for requirement in requirements if not requirement.url]
+    )
@@ -0,0 +1,108 @@
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from wapp.config import Config, load_toml
+
+logger = logging.getLogger()
+
+
+class WappConfig(Config):
+    """
+    Settings of a wrapped project, stored in its .wapp marker file.
+
+    Projects created by older versions of wapp have an empty marker, all
+    settings fall back to their defaults in that case.
+
+    Attributes:
+        url (str): The URL the wrapped repo was cloned from.
+        branch (str): The branch or revision checked out after cloning.
+        depth (int): The history depth of a shallow clone, 0 for full history.
+        filter (str): The partial clone filter, e.g. "blob:none".
+        sparse (List[str]): Directories checked out in a sparse clone.
+        scripts (Dict[str, str]): Exposed scripts mapped to their link names.
+        script_args (Optional[List[str]]): The script specifications resolved
+            into scripts on every build, None if not recorded.
+        scan_imports (str): Whether imports missing from the requirements are
+            reported ("suggest"), added to them ("add") or not scanned ("off").
+        backend (str): The wheel build backend, "setuptools" or "native".
+        exclude (List[str]): Patterns of files excluded from the wheel.
+        include (List[str]): Patterns re-including excluded files.
+        launcher (str): How wrappers execute scripts, "runpy" or "bytecode".
+        compile (bool): Ship bytecode caches of all packaged modules.
+        install_mode (str): Install a built "wheel" or the live checkout in
+            "editable" mode.
+        installer (str): Install via "pipx" or "layered" on a shared base
+            environment.
+    """
+
+    def __init__(self, conf: Optional[Dict] = None) -> None:
+        conf = conf or {}
+        clone = conf.get("clone", {})
+        self.url = clone.get("url", "")  # type: str
+        self.branch = clone.get("branch", "")  # type: str
+        self.depth = clone.get("depth", 0)  # type: int
+        self.filter = clone.get("filter", "")  # type: str
+        self.sparse = list(clone.get("sparse", []))  # type: List[str]
+        self.scripts = dict(conf.get("scripts", {}))  # type: Dict[str, str]
+        discovery = conf.get("discovery", {})
+        self.script_args = None  # type: Optional[List[str]]
+        if "scripts" in discovery:
+            self.script_args = list(discovery["scripts"])
+        self.scan_imports = discovery.get("imports", "suggest")  # type: str
+        build = conf.get("build", {})
+        self.backend = build.get("backend", "setuptools")  # type: str
+        self.exclude = list(build.get("exclude", []))  # type: List[str]
+        self.include = list(build.get("include", []))  # type: List[str]
+        self.launcher = build.get("launcher", "runpy")  # type: str
+        self.compile = build.get("compile", False)  # type: bool
+        install = conf.get("install", {})
+        self.install_mode = install.get("mode", "wheel")  # type: str
+        self.installer = install.get("installer", "pipx")  # type: str
+
+    def ships_bytecode(self) -> bool:
+        """
+        Checks whether wheels of the project contain bytecode caches, which
+        are specific to the interpreter building them.
+
+        Returns:
+            bool: True if modules are compiled or the bytecode launcher is used.
+        """
+        return self.compile or self.launcher == "bytecode"
+
+    @staticmethod
+    def from_config(filename: Path) -> "WappConfig":
+        return WappConfig(load_toml(filename))
+
+    def render(self) -> str:
+        clone = {"url": self.url, "branch": self.branch}
+        if self.depth:
+            clone["depth"] = self.depth
+        if self.filter:
+            clone["filter"] = self.filter
+        if self.sparse:
+            clone["sparse"] = self.sparse
+        build = {"backend": self.backend, "launcher": self.launcher}
+        if self.compile:
+            build["compile"] = True
+        if self.exclude:
+            build["exclude"] = self.exclude
+        if self.include:
+            build["include"] = self.include
+        conf = {
+            "clone": clone,
+            "scripts": self.scripts,
+            "build": build,
+            "install": {"mode": self.install_mode, "installer": self.installer},
+        }
+        discovery = {}
+        if self.script_args is not None:
+            discovery["scripts"] = self.script_args
+        if self.scan_imports != "suggest":
+            discovery["imports"] = self.scan_imports
+        if discovery:
+            conf["discovery"] = discovery
+
+        from tomlkit import dumps as dumps_toml  # pylint: disable=C0415
+
+        return dumps_toml(conf)
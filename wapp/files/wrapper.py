@@ -1,65 +1,206 @@
 import logging
-from pathlib import Path
+import posixpath
+import re
+from typing import Dict, Set
 
 from wapp.config import Config
 
 logger = logging.getLogger()
 
-WRAPPER_SRC = """import runpy
-import os
+# Bump whenever the launcher or import hook template changes, invalidates
+# cached wheels
+WRAPPER_VERSION = 7
+
+# Module inside the wrapped package dispatching all console scripts, must not
+# match the "wrapped_*.py" wrappers generated per script by older versions
+LAUNCHER_MODULE = "_wapp_launcher"
+
+LAUNCHER_SRC = """import os
 import sys
 
-def main():  
-    wapp_files_path = os.path.join(os.path.dirname(__file__), "{wrapped_repo}")
-    script_path = os.path.join(wapp_files_path, "{script_target}")
+# Console script entry points mapped to the script they run and the directory
+# prepended to sys.path, both relative to the wrapped repo
+SCRIPTS = {scripts}
 
-    sys.path.insert(0, wapp_files_path)
+# Link names mapped to entry points, for running as python -m
+LINKS = {links}
 
-    script_dir = os.path.dirname("{script_target}")
+_ROOT = os.path.join(os.path.dirname(__file__), "{wrapped_repo}")
+{runner}
+def _launch(name):
+    script_target, script_dir = SCRIPTS[name]
+    script_path = os.path.join(_ROOT, script_target)
+
+    sys.path.insert(0, _ROOT)
     if script_dir:
-        additional_dir = os.path.join(wapp_files_path, script_dir)
-        sys.path.insert(0, additional_dir)
-    
-    runpy.run_path(script_path, run_name="__main__")
+        sys.path.insert(0, os.path.join(_ROOT, script_dir))
+
+    _run(script_path)
+
+def __getattr__(name):
+    if name not in SCRIPTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    return lambda: _launch(name)
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in LINKS:
+        sys.exit("usage: %s SCRIPT [ARGS...], scripts: %s" % (
+            sys.argv[0], ", ".join(sorted(LINKS))
+        ))
+    name = LINKS[sys.argv.pop(1)]
+    _launch(name)
 
 if __name__ == "__main__":
     main()
 """
 
+RUNPY_RUNNER = """
+def _run(script_path):
+    import runpy
+
+    runpy.run_path(script_path, run_name="__main__")
+"""
+
+# Runs the script from the checked-hash bytecode cache shipped with the wheel
+# instead of recompiling it on every invocation like runpy.run_path. Caches
+# are never written at runtime, installs may be read-only
+BYTECODE_RUNNER = """
+def _load_code(script_path):
+    import importlib.util
+    import marshal
+
+    with open(script_path, "rb") as f:
+        source = f.read()
+    try:
+        with open(importlib.util.cache_from_source(script_path), "rb") as f:
+            data = f.read()
+        if (
+            data[:4] == importlib.util.MAGIC_NUMBER
+            and int.from_bytes(data[4:8], "little") & 0b1
+            and data[8:16] == importlib.util.source_hash(source)
+        ):
+            return marshal.loads(data[16:])
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+    return compile(source, script_path, "exec", dont_inherit=True)
+
+def _run(script_path):
+    import types
+
+    code = _load_code(script_path)
+    main_module = types.ModuleType("__main__")
+    main_module.__dict__.update(
+        __file__=script_path,
+        __cached__=None,
+        __loader__=None,
+        __package__=None,
+        __spec__=None,
+    )
+    saved_main = sys.modules.get("__main__")
+    saved_argv0 = sys.argv[0] if sys.argv else None
+    sys.modules["__main__"] = main_module
+    if sys.argv:
+        sys.argv[0] = script_path
+    try:
+        exec(code, main_module.__dict__)
+    finally:
+        if saved_argv0 is not None:
+            sys.argv[0] = saved_argv0
+        sys.modules["__main__"] = saved_main
+"""
+
+LAUNCHER_RUNNERS = {"runpy": RUNPY_RUNNER, "bytecode": BYTECODE_RUNNER}
+
+
+def get_entry_name(script_target: str, taken: Set[str]) -> str:
+    """
+    Get the launcher attribute of the console script running a script.
+
+    Args:
+        script_target (str): The path to the script within the wrapped repo.
+        taken (Set[str]): Attributes already assigned to other scripts.
+
+    Returns:
+        str: A unique identifier derived from the script path.
+    """
+    base_name = "wrapped_" + re.sub("[^0-9a-zA-Z]+", "_", script_target)
+    name = base_name
+    index = 2
+    while name in taken:
+        name = f"{base_name}_{index}"
+        index += 1
+    return name
+
 
 class Wrapper(Config):
     """
-    A wrapper class that creates a Python file containing the necessary
-    code to execute the wrapped script. This class is responsible for writing
-    the wrapper file to disk.
+    A single launcher module dispatching every console script of a wrapped
+    package. The script paths are looked up in a table generated at wrap
+    time, each console script entry point names its row in the table.
 
     Attributes:
         package_name (str): The name of the  package being wrapped.
-        script_target (str): The path to the target script to be executed.
+        scripts (Dict[str, str]): Exposed scripts mapped to their link names.
+        launcher (str): How the scripts are executed, "runpy" compiles them
+            on every invocation, "bytecode" runs them from a bytecode cache.
+        entry_names (Dict[str, str]): Exposed scripts mapped to their
+            attribute of the launcher module.
     """
 
-    def __init__(self, package_name: str, script_target: str) -> None:
+    def __init__(
+        self, package_name: str, scripts: Dict[str, str], launcher: str = "runpy"
+    ) -> None:
         """
         Initializes a new Wrapper instance.
 
         Args:
             package_name (str): The name of the package being wrapped.
-            script_target (str): The path to the target script to be executed.
+            scripts (Dict[str, str]): Exposed scripts mapped to their link names.
+            launcher (str): How the scripts are executed, "runpy" or "bytecode".
         """
+        if launcher not in LAUNCHER_RUNNERS:
+            raise RuntimeError(f'Unknown launcher "{launcher}"')
         self.package_name = package_name
-        self.script_target = script_target
+        self.scripts = dict(scripts)
+        self.launcher = launcher
+        self.entry_names = {}  # type: Dict[str, str]
+        for script_target in sorted(self.scripts):
+            self.entry_names[script_target] = get_entry_name(
+                script_target, set(self.entry_names.values())
+            )
 
-    def write(self, filename: Path):
+    def get_entry_point(self, script_target: str) -> str:
         """
-        Writes the wrapper file to disk.
+        Get the console script entry point of an exposed script.
 
         Args:
-            filename (Path): The path where the wrapper file will be written.
+            script_target (str): The path to the script within the wrapped repo.
+
+        Returns:
+            str: The entry point, e.g. "wrapped_foo._wapp_launcher:wrapped_foo_py".
         """
-        with open(str(filename), "w", encoding="utf-8") as f:
-            f.write(
-                WRAPPER_SRC.format(
-                    script_target=self.script_target, wrapped_repo=self.package_name
-                )
-            )
-            logger.debug("Created %s", filename)
+        entry_name = self.entry_names[script_target]
+        return f"wrapped_{self.package_name}.{LAUNCHER_MODULE}:{entry_name}"
+
+    def render(self) -> str:
+        """
+        Renders the launcher module.
+
+        Returns:
+            str: The source of the launcher module.
+        """
+        import pprint  # pylint: disable=C0415
+
+        table = {}
+        links = {}
+        for script_target, entry_name in sorted(
+            self.entry_names.items(), key=lambda item: item[1]
+        ):
+            table[entry_name] = (script_target, posixpath.dirname(script_target))
+            links[self.scripts[script_target]] = entry_name
+        return LAUNCHER_SRC.format(
+            scripts=pprint.pformat(table),
+            links=pprint.pformat(links),
+            wrapped_repo=self.package_name,
+            runner=LAUNCHER_RUNNERS[self.launcher],
+        )
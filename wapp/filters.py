@@ -0,0 +1,212 @@
+import fnmatch
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Version control metadata is never packaged
+VCS_PATTERNS = [".git", ".gitmodules", ".hg", ".svn", ".bzr"]
+
+
+def _escape(name: str) -> str:
+    return re.sub(r"([*?\[])", r"[\1]", name)
+
+
+class PathFilter:
+    """
+    Decides which files of a wrapped repo are packaged.
+
+    Patterns are matched against paths relative to the wrapped repo, a
+    pattern without "/" matches a file or directory name at any depth, a
+    pattern containing "/" matches the path from the repo root. Excluded
+    directories exclude everything below them.
+
+    Attributes:
+        exclude (List[str]): Patterns of excluded files and directories.
+        include (List[str]): Patterns re-including excluded files and
+            directories, except version control metadata.
+
+    Only version control metadata is excluded by default, directories such
+    as docs or tests may be imported at runtime.
+    """
+
+    def __init__(
+        self, exclude: Optional[List[str]] = None, include: Optional[List[str]] = None
+    ) -> None:
+        """
+        Initializes a new PathFilter instance.
+
+        Args:
+            exclude (Optional[List[str]]): Exclude patterns.
+            include (Optional[List[str]]): Include patterns.
+        """
+        self.exclude = list(exclude or [])
+        self.include = list(include or [])
+
+    @staticmethod
+    def _matches(path: str, patterns: List[str]) -> bool:
+        parts = path.split("/")
+        for pattern in patterns:
+            pattern = pattern.strip("/")
+            if "/" in pattern:
+                # Anchored pattern, matches the path or one of its parents
+                for i in range(1, len(parts) + 1):
+                    if fnmatch.fnmatchcase("/".join(parts[:i]), pattern):
+                        return True
+            elif any(fnmatch.fnmatchcase(part, pattern) for part in parts):
+                return True
+        return False
+
+    def is_excluded(self, path: str) -> bool:
+        """
+        Checks whether a path relative to the wrapped repo is excluded.
+
+        Args:
+            path (str): The path relative to the wrapped repo, "/" separated.
+
+        Returns:
+            bool: True if the path is excluded.
+        """
+        if PathFilter._matches(path, VCS_PATTERNS):
+            return True
+        if not PathFilter._matches(path, self.exclude):
+            return False
+        return not PathFilter._matches(path, self.include)
+
+    def _may_include_below(self, path: str) -> bool:
+        parts = path.split("/")
+        for pattern in self.include:
+            pattern_parts = pattern.strip("/").split("/")
+            if len(pattern_parts) == 1:
+                return True
+            if len(pattern_parts) > len(parts) and all(
+                fnmatch.fnmatchcase(part, pattern_part)
+                for part, pattern_part in zip(parts, pattern_parts)
+            ):
+                return True
+        return False
+
+    def _walk_excluded(self, repo_dir: Path) -> Iterator[Tuple[str, bool]]:
+        for dirpath, dirnames, filenames in os.walk(repo_dir):
+            rel_dir = Path(dirpath).relative_to(repo_dir).as_posix()
+            prefix = "" if rel_dir == "." else f"{rel_dir}/"
+
+            # Hidden files are never packaged by either backend
+            kept_dirnames = []
+            for dirname in sorted(dirnames):
+                path = f"{prefix}{dirname}"
+                if dirname.startswith("."):
+                    continue
+                if not self.is_excluded(path):
+                    kept_dirnames.append(dirname)
+                elif self._may_include_below(path):
+                    yield f"{path}/", False
+                    kept_dirnames.append(dirname)
+                else:
+                    yield f"{path}/", True
+            dirnames[:] = kept_dirnames
+
+            for filename in sorted(filenames):
+                path = f"{prefix}{filename}"
+                if not filename.startswith(".") and self.is_excluded(path):
+                    yield path, True
+
+    def iter_excluded(self, repo_dir: Path) -> Iterator[str]:
+        """
+        Iterate over the excluded paths of a wrapped repo. Excluded
+        directories are yielded once, suffixed by "/", without descending
+        into them unless include patterns may re-include their content.
+
+        Args:
+            repo_dir (Path): The directory containing the wrapped repo.
+
+        Yields:
+            str: Each excluded path relative to repo_dir.
+        """
+        for path, completely in self._walk_excluded(repo_dir):
+            if completely:
+                yield path
+
+    def iter_packaged(self, repo_dir: Path) -> Iterator[str]:
+        """
+        Iterate over the packaged files of a wrapped repo.
+
+        Args:
+            repo_dir (Path): The directory containing the wrapped repo.
+
+        Yields:
+            str: Each packaged file relative to repo_dir, "/" separated.
+        """
+        excluded = set(self.iter_excluded(repo_dir))
+        for dirpath, dirnames, filenames in os.walk(repo_dir):
+            rel_dir = Path(dirpath).relative_to(repo_dir).as_posix()
+            prefix = "" if rel_dir == "." else f"{rel_dir}/"
+            dirnames[:] = sorted(
+                d
+                for d in dirnames
+                if not d.startswith(".") and f"{prefix}{d}/" not in excluded
+            )
+            for filename in sorted(filenames):
+                path = f"{prefix}{filename}"
+                if not filename.startswith(".") and path not in excluded:
+                    yield path
+
+    def setuptools_excludes(
+        self, repo_dir: Path, src_dir: Path
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Translate the excluded paths of a wrapped repo into setuptools
+        exclude-package-data patterns and excluded packages.
+
+        setuptools matches exclude-package-data patterns relative to each
+        package containing a file, so every excluded path is emitted relative
+        to each of the directories between src_dir and the path. Excluded
+        directories are additionally excluded from package discovery, so
+        their Python modules are treated as package data.
+
+        Args:
+            repo_dir (Path): The directory containing the wrapped repo.
+            src_dir (Path): The src directory of the wrapped project.
+
+        Returns:
+            Tuple[List[str], List[str]]: The exclude-package-data patterns and
+            the excluded packages.
+        """
+        repo_parts = repo_dir.relative_to(src_dir).parts
+        patterns = []
+        packages = []
+        for excluded, completely in self._walk_excluded(repo_dir):
+            parts = list(repo_parts) + excluded.rstrip("/").split("/")
+            if excluded.endswith("/"):
+                package = ".".join(parts)
+                packages.append(package)
+                if not completely:
+                    continue
+                packages.append(f"{package}.*")
+            for i in range(1, len(parts)):
+                pattern = "/".join(_escape(part) for part in parts[i:])
+                patterns.append(f"{pattern}/*" if excluded.endswith("/") else pattern)
+        return patterns, packages
+
+
+def is_package_data_excluded(path: str, patterns: List[str]) -> bool:
+    """
+    Checks whether a file is excluded by setuptools exclude-package-data
+    patterns, as generated by PathFilter.setuptools_excludes.
+
+    Args:
+        path (str): The path of the file relative to the src directory.
+        patterns (List[str]): The exclude-package-data patterns.
+
+    Returns:
+        bool: True if the file is excluded.
+    """
+    parts = path.split("/")
+    for i in range(1, len(parts)):
+        relative_path = "/".join(parts[i:])
+        if any(fnmatch.fnmatchcase(relative_path, pattern) for pattern in patterns):
+            return True
+    return False
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import signal
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Git writes progress meters to stderr, updating lines in place with \r
+PROGRESS_SEPARATOR = re.compile(rb"[\r\n]")
+
+# Errors of network commands which may pass on retry. Others, like missing
+# refs, failed authentication or rejected merges, fail again the same way
+TRANSIENT_ERRORS = re.compile(
+    r"could not resolve host|temporary failure in name resolution"
+    r"|connection (timed out|reset|refused)|operation timed out|failed to connect"
+    r"|early eof|remote end hung up|rpc failed|returned error: 5\d\d"
+    r"|ssl_error_syscall|gnutls_handshake",
+    re.IGNORECASE,
+)
+
+
+class GitCommandError(RuntimeError):
+    """
+    A Git command failed or timed out.
+
+    Attributes:
+        git_args (List[str]): The Git arguments.
+        returncode (Optional[int]): The exit code, None on timeout.
+        stderr (str): The error output of the last attempt.
+    """
+
+    def __init__(self, args: List[str], returncode: Optional[int], stderr: str) -> None:
+        self.git_args = args
+        self.returncode = returncode
+        self.stderr = stderr
+        if returncode is None:
+            reason = "timed out"
+        else:
+            reason = f"exited with {returncode}"
+        detail = stderr.strip().splitlines()[-1] if stderr.strip() else ""
+        super().__init__(
+            f'"git {" ".join(args)}" {reason}' + (f": {detail}" if detail else "")
+        )
+
+    @property
+    def transient(self) -> bool:
+        """
+        Whether the command timed out or failed with a network error, which
+        may pass on retry.
+        """
+        return self.returncode is None or bool(TRANSIENT_ERRORS.search(self.stderr))
+
+
+def get_host(url: str) -> str:
+    """
+    Get the host of a Git URL, concurrent network commands are limited per
+    host.
+
+    Args:
+        url (str): A Git URL, scp-like address or local path.
+
+    Returns:
+        str: The host, "local" for local paths and file:// URLs.
+    """
+    if "://" in url:
+        scheme, rest = url.split("://", 1)
+        if scheme == "file":
+            return "local"
+        return rest.split("/", 1)[0].rsplit("@", 1)[-1].split(":", 1)[0] or "local"
+    # scp-like syntax user@host:path, a colon before any slash
+    before_path = url.split("/", 1)[0]
+    if ":" in before_path:
+        return before_path.split(":", 1)[0].rsplit("@", 1)[-1]
+    return "local"
+
+
+class GitEngine:
+    """
+    Runs Git subprocesses concurrently on an asyncio event loop.
+
+    Network commands are limited per host and in total, killed after a
+    timeout and, on timeouts and network errors, retried with exponential
+    backoff. Progress output of Git is streamed line by line to a callback.
+
+    Attributes:
+        jobs_per_host (int): Network commands running concurrently per host.
+        max_jobs (int): Network commands running concurrently across all
+            hosts.
+        timeout (float): Seconds before a Git command is killed.
+        retries (int): Retries of a network command failing transiently.
+        backoff (float): Seconds waited before the first retry, doubled on
+            every further retry.
+        on_progress (Optional[Callable[[Path, str], None]]): Called with the
+            repo directory and each progress line of Git.
+        executable (str): The Git executable, can be overridden by
+            $GIT_PYTHON_GIT_EXECUTABLE like for GitPython.
+    """
+
+    def __init__(
+        self,
+        jobs_per_host: int = 4,
+        max_jobs: int = 32,
+        timeout: float = 300.0,
+        retries: int = 2,
+        backoff: float = 1.0,
+        on_progress: Optional[Callable[[Path, str], None]] = None,
+    ) -> None:
+        self.jobs_per_host = max(jobs_per_host, 1)
+        self.max_jobs = max(max_jobs, 1)
+        self.timeout = timeout
+        self.retries = max(retries, 0)
+        self.backoff = backoff
+        self.on_progress = on_progress
+        self.executable = os.environ.get("GIT_PYTHON_GIT_EXECUTABLE", "git")
+        self._semaphores = {}  # type: Dict[str, asyncio.Semaphore]
+        self._global_semaphore = None  # type: Optional[asyncio.Semaphore]
+
+    def _semaphore(self, url: str) -> asyncio.Semaphore:
+        host = get_host(url)
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.jobs_per_host)
+        return self._semaphores[host]
+
+    def _global(self) -> asyncio.Semaphore:
+        # Created lazily, the engine may be constructed outside a running loop
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_jobs)
+        return self._global_semaphore
+
+    async def _stream(self, stream: asyncio.StreamReader, repo_dir: Path) -> bytes:
+        chunks = []  # type: List[bytes]
+        pending = b""
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if not self.on_progress:
+                continue
+            lines = PROGRESS_SEPARATOR.split(pending + chunk)
+            pending = lines.pop()
+            for line in lines:
+                if line.strip():
+                    self.on_progress(repo_dir, line.decode("utf-8", "replace"))
+        if self.on_progress and pending.strip():
+            self.on_progress(repo_dir, pending.decode("utf-8", "replace"))
+        return b"".join(chunks)
+
+    async def _run_once(self, args: List[str], repo_dir: Path) -> str:
+        process = await asyncio.create_subprocess_exec(
+            self.executable,
+            *args,
+            cwd=str(repo_dir),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            # Never block on credential prompts of unattended runs
+            env=dict(os.environ, GIT_TERMINAL_PROMPT="0"),
+            # Timeouts kill the whole group, including remote helpers
+            start_new_session=True,
+        )
+        stdout_task = asyncio.ensure_future(process.stdout.read())
+        stderr_task = asyncio.ensure_future(self._stream(process.stderr, repo_dir))
+        try:
+            await asyncio.wait_for(process.wait(), self.timeout)
+        except asyncio.TimeoutError as e:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await process.wait()
+            stdout_task.cancel()
+            stderr_task.cancel()
+            raise GitCommandError(args, None, "") from e
+        stdout = await stdout_task
+        stderr = await stderr_task
+        if process.returncode:
+            raise GitCommandError(
+                args, process.returncode, stderr.decode("utf-8", "replace")
+            )
+        return stdout.decode("utf-8", "replace").strip()
+
+    async def run(
+        self, args: List[str], repo_dir: Path, url: Optional[str] = None
+    ) -> str:
+        """
+        Run a Git command in a repo.
+
+        Args:
+            args (List[str]): The Git arguments.
+            repo_dir (Path): The working directory of the command.
+            url (Optional[str]): The remote URL of network commands, which
+                are limited per host and in total and retried on timeouts
+                and network errors.
+
+        Returns:
+            str: The standard output of the command.
+        """
+        if url is None:
+            return await self._run_once(args, repo_dir)
+
+        attempt = 0
+        while True:
+            # The host slot is taken first, waiting for a busy host must not
+            # hold a slot other hosts could use
+            async with self._semaphore(url), self._global():
+                try:
+                    return await self._run_once(args, repo_dir)
+                except GitCommandError as e:
+                    if attempt >= self.retries or not e.transient:
+                        raise
+                    logger.debug("Retrying %s: %s", repo_dir, e)
+            # Back off outside the semaphore so other repos can proceed
+            delay = self.backoff * 2**attempt
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+            attempt += 1
+
+    async def get_upstream(self, repo_dir: Path) -> Optional[Tuple[str, str]]:
+        """
+        Get the upstream branch of the checked out branch.
+
+        Args:
+            repo_dir (Path): The repo directory.
+
+        Returns:
+            Optional[Tuple[str, str]]: The remote name and the remote ref, None
+            if HEAD is detached or the branch has no upstream.
+        """
+        output = await self.run(
+            [
+                "for-each-ref",
+                "--format=%(HEAD)%00%(upstream:remotename)%00%(upstream:remoteref)",
+                "refs/heads",
+            ],
+            repo_dir,
+        )
+        for line in output.splitlines():
+            head, remote, ref = line.split("\0")
+            if head == "*":
+                return (remote, ref) if remote and ref else None
+        return None
+
+    async def get_remote_head(self, repo_dir: Path, url: str) -> Optional[str]:
+        """
+        Query the commit the upstream branch points to, without fetching.
+
+        Args:
+            repo_dir (Path): The repo directory.
+            url (str): The remote URL, used to limit requests per host.
+
+        Returns:
+            Optional[str]: The commit id of the upstream branch, or None if
+            HEAD is detached, the branch has no upstream or the remote lacks
+            it.
+        """
+        upstream = await self.get_upstream(repo_dir)
+        if upstream is None:
+            return None
+        output = await self.run(["ls-remote", *upstream], repo_dir, url)
+        if not output:
+            return None
+        return output.split()[0]
+
+    async def pull(self, repo_dir: Path, url: str, depth: int = 0):
+        """
+        Fetch the upstream branch and fast-forward to it, keeping shallow
+        clones shallow.
+
+        Args:
+            repo_dir (Path): The repo directory.
+            url (str): The remote URL, used to limit requests per host.
+            depth (int): The history depth of a shallow clone, 0 for full
+                history.
+        """
+        upstream = await self.get_upstream(repo_dir)
+        if upstream is None:
+            raise RuntimeError(f'Checkout "{repo_dir}" has no upstream branch')
+
+        if not depth:
+            shallow = await self.run(["rev-parse", "--is-shallow-repository"], repo_dir)
+            if shallow == "true":
+                depth = 1
+
+        fetch_args = ["fetch", "--progress"]
+        if depth:
+            fetch_args.append(f"--depth={depth}")
+        await self.run(fetch_args + list(upstream), repo_dir, url)
+        if depth:
+            await self.run(["reset", "--keep", "FETCH_HEAD"], repo_dir)
+        else:
+            await self.run(["merge", "--ff-only", "FETCH_HEAD"], repo_dir)
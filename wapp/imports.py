@@ -0,0 +1,423 @@
+import ast
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from wapp.cache import parse_size
+from wapp.cache.imports import (
+    IMPORTS_CACHE_SIZE,
+    get_cached_imports,
+    get_cached_scan,
+    prune_imports,
+    store_imports,
+    store_scan,
+)
+from wapp.files.requirements import Requirements, canonicalize
+from wapp.filters import PathFilter
+from wapp.profiling import set_attribute, traced
+
+logger = logging.getLogger(__name__)
+
+# Below this number of modules parsing inline beats spawning workers
+MIN_PARALLEL_MODULES = 32
+
+# Packaging and test helpers, their imports are not needed at runtime
+SKIPPED_MODULES = ["setup.py", "conftest.py"]
+
+# Distributions providing commonly imported top-level names. Only imports
+# found here are added automatically, other names are merely suggested
+IMPORT_DISTRIBUTIONS = {
+    "Crypto": "pycryptodome",
+    "Cryptodome": "pycryptodomex",
+    "MySQLdb": "mysqlclient",
+    "OpenSSL": "pyOpenSSL",
+    "PIL": "Pillow",
+    "aiohttp": "aiohttp",
+    "asn1crypto": "asn1crypto",
+    "attr": "attrs",
+    "bcrypt": "bcrypt",
+    "bs4": "beautifulsoup4",
+    "certifi": "certifi",
+    "cffi": "cffi",
+    "chardet": "chardet",
+    "click": "click",
+    "colorama": "colorama",
+    "cryptography": "cryptography",
+    "dateutil": "python-dateutil",
+    "dns": "dnspython",
+    "docx": "python-docx",
+    "dsinternals": "dsinternals",
+    "flask": "Flask",
+    "gssapi": "gssapi",
+    "httpx": "httpx",
+    "idna": "idna",
+    "impacket": "impacket",
+    "jinja2": "Jinja2",
+    "jwt": "PyJWT",
+    "ldap": "python-ldap",
+    "ldap3": "ldap3",
+    "lxml": "lxml",
+    "magic": "python-magic",
+    "markdown": "Markdown",
+    "minidump": "minidump",
+    "msldap": "msldap",
+    "nacl": "PyNaCl",
+    "netaddr": "netaddr",
+    "netifaces": "netifaces",
+    "nmap": "python-nmap",
+    "numpy": "numpy",
+    "pandas": "pandas",
+    "paramiko": "paramiko",
+    "pefile": "pefile",
+    "prompt_toolkit": "prompt_toolkit",
+    "psutil": "psutil",
+    "pyasn1": "pyasn1",
+    "pyasn1_modules": "pyasn1-modules",
+    "pypykatz": "pypykatz",
+    "pyperclip": "pyperclip",
+    "requests": "requests",
+    "requests_ntlm": "requests-ntlm",
+    "rich": "rich",
+    "scapy": "scapy",
+    "serial": "pyserial",
+    "six": "six",
+    "smb": "pysmb",
+    "socks": "PySocks",
+    "tabulate": "tabulate",
+    "termcolor": "termcolor",
+    "toml": "toml",
+    "tqdm": "tqdm",
+    "unicrypto": "unicrypto",
+    "urllib3": "urllib3",
+    "usb": "pyusb",
+    "websocket": "websocket-client",
+    "win32api": "pywin32",
+    "win32con": "pywin32",
+    "yaml": "PyYAML",
+    "zmq": "pyzmq",
+}
+
+# Fields of statements, exception handlers and match cases holding statements
+STATEMENT_FIELDS = ["body", "orelse", "finalbody", "handlers", "cases"]
+
+# Exceptions raised by failing imports, guarding optional dependencies
+IMPORT_ERRORS = {"ImportError", "ModuleNotFoundError"}
+
+
+def _is_import_guard(node: ast.Try) -> bool:
+    for handler in node.handlers:
+        if isinstance(handler.type, ast.Tuple):
+            types = handler.type.elts
+        else:
+            types = [handler.type]
+        if any(
+            isinstance(type_, ast.Name) and type_.id in IMPORT_ERRORS
+            for type_ in types
+        ):
+            return True
+    return False
+
+
+def _is_platform_test(node: ast.expr) -> bool:
+    # sys.platform, os.name or platform.system()
+    for child in ast.walk(node):
+        if (
+            isinstance(child, ast.Attribute)
+            and isinstance(child.value, ast.Name)
+            and (child.value.id, child.attr)
+            in {("sys", "platform"), ("os", "name"), ("platform", "system")}
+        ):
+            return True
+    return False
+
+
+def _iter_statements(node: ast.AST):
+    # Imports are statements, expressions never need to be visited
+    for field in STATEMENT_FIELDS:
+        yield from getattr(node, field, ())
+
+
+def parse_imports(source: bytes, filename: str = "<unknown>") -> Dict[str, bool]:
+    """
+    Extract the absolute imports of a module.
+
+    Imports guarded by a handler of ImportError or depending on the platform
+    are optional.
+
+    Args:
+        source (bytes): The module source.
+        filename (str): The name of the module in syntax errors.
+
+    Returns:
+        Dict[str, bool]: The imported top-level names, mapped to whether they
+        are only imported optionally.
+    """
+    imports = {}  # type: Dict[str, bool]
+    if b"import" not in source:
+        return imports
+    stack = [(ast.parse(source, filename), False)]  # type: List[Tuple[ast.AST, bool]]
+    while stack:
+        node, optional = stack.pop()
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = [node.module] if node.module and not node.level else []
+        elif isinstance(node, ast.Try) and _is_import_guard(node):
+            stack.extend((child, True) for child in node.body)
+            for child in node.handlers + node.orelse + node.finalbody:
+                stack.append((child, optional))
+            continue
+        elif isinstance(node, ast.If) and _is_platform_test(node.test):
+            stack.extend((child, True) for child in node.body + node.orelse)
+            continue
+        else:
+            stack.extend((child, optional) for child in _iter_statements(node))
+            continue
+        for name in names:
+            name = name.partition(".")[0]
+            imports[name] = imports.get(name, True) and optional
+    return imports
+
+
+def _parse_module(path: str) -> Tuple[str, List, Optional[str]]:
+    try:
+        with open(path, "rb") as f:
+            imports = parse_imports(f.read(), path)
+    except (SyntaxError, ValueError) as e:
+        return path, [], f"{type(e).__name__}: {e}"
+    except OSError as e:
+        return path, [], str(e)
+    return path, sorted(imports.items()), None
+
+
+class ImportScan:
+    """
+    Imports of the packaged modules of a wrapped repo.
+
+    Attributes:
+        imports (Dict[str, bool]): The imported top-level names, mapped to
+            whether they are only imported optionally.
+        first_party (Set[str]): Names of the modules and packages of the
+            wrapped repo.
+        scanned (int): The number of scanned modules.
+        parsed (int): The number of modules parsed, the others were cached.
+        failed (List[Tuple[str, str]]): Modules failing to parse and the reason.
+        elapsed (float): Wall-clock seconds spent scanning.
+    """
+
+    def __init__(self) -> None:
+        self.imports = {}  # type: Dict[str, bool]
+        self.first_party = set()  # type: Set[str]
+        self.scanned = 0
+        self.parsed = 0
+        self.failed = []  # type: List[Tuple[str, str]]
+        self.elapsed = 0.0
+
+    def add(self, imports: List):
+        for name, optional in imports:
+            self.imports[name] = self.imports.get(name, True) and optional
+
+    def to_entry(self) -> Dict[str, Any]:
+        """
+        Convert the scan result into a cache entry.
+
+        Returns:
+            Dict[str, Any]: The scan result without timings.
+        """
+        return {
+            "imports": sorted(self.imports.items()),
+            "first_party": sorted(self.first_party),
+            "scanned": self.scanned,
+            "failed": self.failed,
+        }
+
+    @classmethod
+    def from_entry(cls, entry: Dict[str, Any]) -> "ImportScan":
+        """
+        Restore a scan result from a cache entry.
+
+        Args:
+            entry (Dict[str, Any]): The scan result without timings.
+
+        Returns:
+            ImportScan: The scan result, no module was parsed.
+        """
+        scan = cls()
+        scan.add(entry["imports"])
+        scan.first_party.update(entry["first_party"])
+        scan.scanned = entry["scanned"]
+        scan.failed = [(path, error) for path, error in entry["failed"]]
+        return scan
+
+    def get_third_party(self) -> Dict[str, bool]:
+        """
+        Get the imports provided neither by the standard library nor by the
+        wrapped repo.
+
+        Returns:
+            Dict[str, bool]: The imported top-level names, mapped to whether
+            they are only imported optionally.
+        """
+        return {
+            name: optional
+            for name, optional in sorted(self.imports.items())
+            if name not in sys.stdlib_module_names
+            and name not in self.first_party
+            and name != "__future__"
+        }
+
+
+def _get_scan_key(tree: str, path_filter: PathFilter) -> str:
+    settings = [tree, path_filter.exclude, path_filter.include, SKIPPED_MODULES]
+    return hashlib.sha256(json.dumps(settings).encode("utf-8")).hexdigest()
+
+
+@traced("scan_imports")
+def scan_imports(
+    repo_dir: Path,
+    path_filter: PathFilter,
+    workers: Optional[int] = None,
+    tree: Optional[str] = None,
+) -> ImportScan:
+    """
+    Scan the imports of all packaged modules of a wrapped repo using a
+    process pool. Results are cached by the hash of each module, so only
+    modules which changed since the last scan are parsed. Given the tree of
+    the checkout, a tree scanned before is not walked at all.
+
+    Args:
+        repo_dir (Path): The directory containing the wrapped repo.
+        path_filter (PathFilter): Decides which files are packaged.
+        workers (Optional[int]): The number of worker processes, defaults to
+            the number of CPUs.
+        tree (Optional[str]): The hash of the Git tree matching the Python
+            files of the working tree, None if they differ from any tree.
+
+    Returns:
+        ImportScan: The imports of the wrapped repo.
+    """
+    key = _get_scan_key(tree, path_filter) if tree else None
+    if key:
+        entry = get_cached_scan(key)
+        if entry is not None:
+            logger.debug("Using cached import scan of tree %s", tree)
+            set_attribute("cache_hit", True)
+            return ImportScan.from_entry(entry)
+
+    scan = ImportScan()
+    start = time.perf_counter()
+    digests = {}  # type: Dict[str, str]
+    for path in path_filter.iter_packaged(repo_dir):
+        if not path.endswith(".py"):
+            continue
+        parts = path[: -len(".py")].split("/")
+        scan.first_party.update(parts)
+        if parts[-1] + ".py" in SKIPPED_MODULES:
+            continue
+        module_path = os.path.join(repo_dir, path)
+        try:
+            with open(module_path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        except OSError as e:
+            scan.failed.append((path, str(e)))
+            continue
+        scan.scanned += 1
+        cached = get_cached_imports(digest)
+        if cached is None:
+            digests[module_path] = digest
+        elif cached[1]:
+            scan.failed.append((path, cached[1]))
+        else:
+            scan.add(cached[0])
+
+    modules = list(digests)
+    if len(modules) < MIN_PARALLEL_MODULES or workers == 1:
+        results = list(map(_parse_module, modules))
+    else:
+        from concurrent.futures import ProcessPoolExecutor  # pylint: disable=C0415
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_parse_module, modules, chunksize=16))
+
+    for module_path, imports, error in results:
+        scan.parsed += 1
+        if error:
+            scan.failed.append((os.path.relpath(module_path, repo_dir), error))
+        else:
+            scan.add(imports)
+        try:
+            store_imports(digests[module_path], imports, error)
+        except OSError as e:
+            logger.debug("Failed to cache imports of %s: %s", module_path, e)
+    if key:
+        try:
+            store_scan(key, scan.to_entry())
+        except OSError as e:
+            logger.debug("Failed to cache import scan of tree %s: %s", tree, e)
+    if results or key:
+        prune_imports(parse_size(IMPORTS_CACHE_SIZE))
+
+    scan.elapsed = time.perf_counter() - start
+    set_attribute("modules", scan.scanned)
+    set_attribute("parsed", scan.parsed)
+    set_attribute("failed", len(scan.failed))
+    logger.debug(
+        "Scanned imports of %d modules in %.2fs, %d parsed",
+        scan.scanned,
+        scan.elapsed,
+        scan.parsed,
+    )
+    for path, error in scan.failed:
+        logger.debug("  Failed to parse %s: %s", path, error)
+    return scan
+
+
+def check_requirements(
+    requirements: Requirements, scan: ImportScan, add: bool = False
+) -> List[str]:
+    """
+    Suggest requirements for the third-party imports of a wrapped repo which
+    are not covered by its requirements yet.
+
+    Args:
+        requirements (Requirements): The requirements of the wrapped project.
+        scan (ImportScan): The imports of the wrapped repo.
+        add (bool): Add the distributions of imports found in the bundled
+            table which are not only imported optionally.
+
+    Returns:
+        List[str]: The added distributions.
+    """
+    required = {canonicalize(name) for name in requirements.get_package_names()}
+    missing = []  # type: List[Tuple[str, Optional[str], bool]]
+    for name, optional in scan.get_third_party().items():
+        distribution = IMPORT_DISTRIBUTIONS.get(name)
+        if canonicalize(name) in required:
+            continue
+        if distribution and canonicalize(distribution) in required:
+            continue
+        missing.append((name, distribution, optional))
+    if not missing:
+        return []
+
+    added = []
+    logger.info("Imports not covered by the requirements:")
+    for name, distribution, optional in missing:
+        if add and distribution and not optional and distribution not in added:
+            requirements.add_dependency(distribution)
+            added.append(distribution)
+            logger.info("  %s (import %s), added", distribution, name)
+        elif distribution:
+            note = ", optional" if optional else ""
+            logger.info("  %s (import %s%s)", distribution, name, note)
+        else:
+            note = ", optional" if optional else ""
+            logger.info("  ? (import %s%s), unknown distribution", name, note)
+    if not add:
+        logger.info('Add them with --requires or "--scan_imports add"')
+    return added
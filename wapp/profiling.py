@@ -0,0 +1,205 @@
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Span:
+    """
+    A timed phase of a wapp run.
+
+    Attributes:
+        name (str): The name of the phase.
+        start (float): Seconds since the start of the trace.
+        duration (float): Seconds spent in the phase.
+        thread (str): The name of the thread running the phase.
+        parent (Optional[int]): The index of the enclosing span.
+        attributes (Dict[str, Any]): Measurements of the phase, e.g. sizes
+            and file counts.
+    """
+
+    def __init__(
+        self, name: str, start: float, thread: str, parent: Optional[int]
+    ) -> None:
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.thread = thread
+        self.parent = parent
+        self.attributes = {}  # type: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6),
+            "thread": self.thread,
+            "parent": self.parent,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Collects the spans of a wapp run. Spans may be opened concurrently from
+    multiple threads and asyncio tasks, nesting is tracked per thread and
+    task.
+
+    Attributes:
+        spans (List[Span]): All spans in the order they were opened.
+    """
+
+    def __init__(self) -> None:
+        self.spans = []  # type: List[Span]
+        self._lock = threading.Lock()
+        # Tasks and asyncio.to_thread inherit a copy of the context, the
+        # stacks are immutable so they never see spans opened by each other
+        self._stack = contextvars.ContextVar(
+            "wapp_span_stack", default=()
+        )  # type: contextvars.ContextVar[Tuple[int, ...]]
+        self._origin = time.perf_counter()
+        self._started = time.time()
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        stack = self._stack.get()
+        start = time.perf_counter()
+        with self._lock:
+            span = Span(
+                name,
+                start - self._origin,
+                threading.current_thread().name,
+                stack[-1] if stack else None,
+            )
+            span.attributes.update(attributes)
+            self.spans.append(span)
+            index = len(self.spans) - 1
+        token = self._stack.set(stack + (index,))
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = str(e) or type(e).__name__
+            raise
+        finally:
+            self._stack.reset(token)
+            span.duration = time.perf_counter() - start
+
+    def current(self) -> Optional[Span]:
+        stack = self._stack.get()
+        return self.spans[stack[-1]] if stack else None
+
+    def to_dict(self, command: List[str]) -> Dict[str, Any]:
+        from datetime import datetime, timezone  # pylint: disable=C0415
+
+        return {
+            "version": TRACE_VERSION,
+            "command": command,
+            "started": datetime.fromtimestamp(self._started, timezone.utc).isoformat(),
+            "duration": round(time.perf_counter() - self._origin, 6),
+            "pid": os.getpid(),
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+_tracer = None  # type: Optional[Tracer]
+
+
+def enable_tracing():
+    """
+    Start collecting spans, spans are discarded while tracing is disabled.
+    """
+    global _tracer  # pylint: disable=W0603
+    _tracer = Tracer()
+
+
+def is_tracing() -> bool:
+    return _tracer is not None
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Time a phase of the current run.
+
+    Args:
+        name (str): The name of the phase.
+        **attributes: Initial measurements of the phase.
+
+    Yields:
+        Optional[Span]: The span, None if tracing is disabled.
+    """
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.span(name, **attributes) as current:
+        yield current
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """
+    Decorator timing every call of a function as span.
+
+    Args:
+        name (str): The name of the span.
+
+    Returns:
+        Callable[[F], F]: The decorator.
+    """
+
+    def decorator(function: F) -> F:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return function(*args, **kwargs)
+            with _tracer.span(name):
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def set_attribute(key: str, value: Any):
+    """
+    Record a measurement on the innermost open span of the current thread or
+    task.
+
+    Args:
+        key (str): The name of the measurement.
+        value (Any): A JSON serializable value.
+    """
+    if _tracer is None:
+        return
+    current = _tracer.current()
+    if current:
+        current.attributes[key] = value
+
+
+def write_trace(path: Path, command: List[str]):
+    """
+    Write the collected spans as JSON trace.
+
+    Args:
+        path (Path): The trace file.
+        command (List[str]): The command line of the traced run.
+    """
+    if _tracer is None:
+        return
+    import json  # pylint: disable=C0415
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(str(path), "w", encoding="utf-8") as f:
+        json.dump(_tracer.to_dict(command), f, indent=2)
+        f.write("\n")
+    logger.info("Wrote profile to %s", path)
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+
+# Install states of a wrapped project
+INSTALLED = "installed"
+INSTALL_FAILED = "install_failed"
+BUILT = "built"
+WRAPPED = "wrapped"
+UNKNOWN = "unknown"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS packages (
+    dest_dir TEXT PRIMARY KEY,
+    package_name TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL DEFAULT '',
+    branch TEXT NOT NULL DEFAULT '',
+    commit_sha TEXT NOT NULL DEFAULT '',
+    version TEXT NOT NULL DEFAULT '',
+    scripts TEXT NOT NULL DEFAULT '{}',
+    requirements TEXT NOT NULL DEFAULT '[]',
+    wheel_path TEXT NOT NULL DEFAULT '',
+    wheel_sha256 TEXT NOT NULL DEFAULT '',
+    install_state TEXT NOT NULL DEFAULT 'unknown',
+    installer TEXT NOT NULL DEFAULT '',
+    remote_head TEXT NOT NULL DEFAULT '',
+    checked_at REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL DEFAULT 0
+)
+"""
+
+# Columns added after the first schema version, by their definition
+ADDED_COLUMNS = {"requirements": "TEXT NOT NULL DEFAULT '[]'"}
+
+COLUMNS = [
+    "dest_dir",
+    "package_name",
+    "url",
+    "branch",
+    "commit_sha",
+    "version",
+    "scripts",
+    "requirements",
+    "wheel_path",
+    "wheel_sha256",
+    "install_state",
+    "installer",
+    "remote_head",
+    "checked_at",
+    "updated_at",
+]
+
+
+class RegistryEntry:
+    """
+    A wrapped project recorded in the registry.
+
+    Attributes:
+        dest_dir (str): The absolute directory of the wrapped project.
+        package_name (str): The name of the wrapped package.
+        url (str): The upstream URL of the wrapped repo.
+        branch (str): The checked out branch, empty for the default branch.
+        commit_sha (str): The checked out commit.
+        version (str): The version of the last built package.
+        scripts (Dict[str, str]): Exposed scripts mapped to their link names.
+        requirements (List[str]): The requirements of the last wrapped version.
+        wheel_path (str): The last built wheel.
+        wheel_sha256 (str): The SHA-256 of the last built wheel.
+        install_state (str): INSTALLED, INSTALL_FAILED, BUILT, WRAPPED for
+            editable projects not installed yet, or UNKNOWN.
+        installer (str): The configured installer.
+        remote_head (str): The upstream commit seen by the last check.
+        checked_at (float): When upstream was last checked.
+        updated_at (float): When the entry was last written.
+    """
+
+    def __init__(self, row: Dict[str, Any]) -> None:
+        self.dest_dir = row["dest_dir"]  # type: str
+        self.package_name = row["package_name"]  # type: str
+        self.url = row["url"]  # type: str
+        self.branch = row["branch"]  # type: str
+        self.commit_sha = row["commit_sha"]  # type: str
+        self.version = row["version"]  # type: str
+        self.scripts = json.loads(row["scripts"])  # type: Dict[str, str]
+        self.requirements = json.loads(row["requirements"])  # type: List[str]
+        self.wheel_path = row["wheel_path"]  # type: str
+        self.wheel_sha256 = row["wheel_sha256"]  # type: str
+        self.install_state = row["install_state"]  # type: str
+        self.installer = row["installer"]  # type: str
+        self.remote_head = row["remote_head"]  # type: str
+        self.checked_at = row["checked_at"]  # type: float
+        self.updated_at = row["updated_at"]  # type: float
+
+    @property
+    def status(self) -> str:
+        """
+        Whether the checkout is "behind" or "current" as of the last check
+        of upstream, "unknown" if upstream was never checked.
+        """
+        if not self.remote_head or not self.commit_sha:
+            return "unknown"
+        return "current" if self.remote_head == self.commit_sha else "behind"
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {column: getattr(self, column) for column in COLUMNS}
+        result["status"] = self.status
+        return result
+
+
+def get_registry_path() -> Path:
+    """
+    Get the path of the registry database, can be overridden by
+    $WAPP_REGISTRY.
+
+    Returns:
+        Path: The registry database file.
+    """
+    registry = os.environ.get("WAPP_REGISTRY")
+    if registry:
+        return Path(registry)
+    # wapp.utils loads the installers, list and status do without them
+    from wapp.utils import get_data_dir  # pylint: disable=C0415
+
+    return get_data_dir() / "registry.sqlite3"
+
+
+class Registry:
+    """
+    SQLite database of all wrapped projects, written by create and update
+    so list and status queries do not have to visit every project.
+
+    Attributes:
+        path (Path): The registry database file.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        """
+        Opens the registry, creating it if missing.
+
+        Args:
+            path (Optional[Path]): The registry database file, defaults to
+                get_registry_path().
+        """
+        self.path = path or get_registry_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent bulk updates write from several threads and processes
+        self._connection = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False
+        )
+        self._connection.row_factory = sqlite3.Row
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(SCHEMA)
+            columns = {
+                row["name"]
+                for row in self._connection.execute("PRAGMA table_info(packages)")
+            }
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in columns:
+                    self._connection.execute(
+                        f"ALTER TABLE packages ADD COLUMN {column} {definition}"
+                    )
+            self._connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def __enter__(self) -> "Registry":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def record(self, dest_dir: Path, **fields):
+        """
+        Create or update the entry of a wrapped project. Only the given
+        fields are changed.
+
+        Args:
+            dest_dir (Path): The directory of the wrapped project.
+            **fields: Column values, scripts are given as dict and
+                requirements as list.
+        """
+        unknown = set(fields) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown registry fields {', '.join(sorted(unknown))}")
+        if "scripts" in fields:
+            fields["scripts"] = json.dumps(fields["scripts"], sort_keys=True)
+        if "requirements" in fields:
+            fields["requirements"] = json.dumps(fields["requirements"])
+        fields["dest_dir"] = str(dest_dir.absolute())
+        fields["updated_at"] = time.time()
+
+        columns = list(fields)
+        updates = ", ".join(
+            f"{column}=excluded.{column}" for column in columns if column != "dest_dir"
+        )
+        with self._connection:
+            self._connection.execute(
+                f"INSERT INTO packages ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT(dest_dir) DO UPDATE SET {updates}",
+                [fields[column] for column in columns],
+            )
+
+    def get(self, dest_dir: Path) -> Optional[RegistryEntry]:
+        row = self._connection.execute(
+            "SELECT * FROM packages WHERE dest_dir = ?", (str(dest_dir.absolute()),)
+        ).fetchone()
+        return RegistryEntry(dict(row)) if row else None
+
+    def entries(self) -> List[RegistryEntry]:
+        rows = self._connection.execute(
+            "SELECT * FROM packages ORDER BY package_name, dest_dir"
+        ).fetchall()
+        return [RegistryEntry(dict(row)) for row in rows]
+
+    def remove(self, dest_dir: str):
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM packages WHERE dest_dir = ?", (dest_dir,)
+            )
+
+
+def record_project(dest_dir: Path, **fields):
+    """
+    Record a wrapped project in the registry. Failures are logged, the
+    registry must never break creating or updating a project.
+
+    Args:
+        dest_dir (Path): The directory of the wrapped project.
+        **fields: Column values, see RegistryEntry.
+    """
+    try:
+        with Registry() as registry:
+            registry.record(dest_dir, **fields)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Failed to record %s in the registry: %s", dest_dir, e)
+
+
+def get_wheel_fields(wheel_path: Path) -> Dict[str, str]:
+    """
+    Get the registry fields describing a built wheel.
+
+    Args:
+        wheel_path (Path): The wheel file.
+
+    Returns:
+        Dict[str, str]: The wheel path and its SHA-256.
+    """
+    digest = hashlib.sha256()
+    with open(str(wheel_path), "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return {
+        "wheel_path": str(wheel_path.absolute()),
+        "wheel_sha256": digest.hexdigest(),
+    }
+
+
+def get_requirement_fields(dest_dir: Path) -> Dict[str, List[str]]:
+    """
+    Get the registry fields describing the requirements of a wrapped project.
+
+    Args:
+        dest_dir (Path): The directory of the wrapped project.
+
+    Returns:
+        Dict[str, List[str]]: The requirements field, empty if the
+        requirements cannot be read.
+    """
+    from wapp.files.requirements import Requirements  # pylint: disable=C0415
+
+    requirements_path = dest_dir / "requirements.txt"
+    if not requirements_path.is_file():
+        return {"requirements": []}
+    try:
+        requirements = Requirements.from_config(requirements_path)
+    except (OSError, UnicodeDecodeError) as e:
+        logger.warning("Failed to read %s: %s", requirements_path, e)
+        return {}
+    return {"requirements": [str(item) for item in requirements.merge().values()]}
+
+
+def get_install_state(retval: int) -> str:
+    return INSTALLED if retval == 0 else INSTALL_FAILED
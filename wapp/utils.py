@@ -1,12 +1,31 @@
+import fcntl
+import filecmp
+import logging
+import os
 import re
+import shlex
+import shutil
+import signal
 import subprocess
+import sys
+import threading
+import zipfile
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
-import git
-from build import ProjectBuilder
+from wapp.cache import format_size, get_size
+from wapp.cache.wheel import get_cached_wheel, store_wheel
+from wapp.profiling import is_tracing, set_attribute, traced
 
+# GitPython, build and giturlparse are imported by the functions using them,
+# commands not touching Git start without loading them
+if TYPE_CHECKING:
+    import git
 
-def get_git_version_string(repo: git.Repo) -> str:
+logger = logging.getLogger(__name__)
+
+
+def get_git_version_string(repo: "git.Repo") -> str:
     """
     Generate a version string based on the latest commit in the repository.
 
@@ -23,6 +42,86 @@ def get_git_version_string(repo: git.Repo) -> str:
     return version
 
 
+@traced("clone")
+def clone_repo(
+    url: str,
+    to_path: Path,
+    branch: str = "",
+    depth: int = 0,
+    filter_spec: str = "",
+    sparse: Optional[List[str]] = None,
+    reference: Optional[Path] = None,
+) -> "git.Repo":
+    """
+    Clone a repository, optionally shallow, partial or sparse.
+
+    Args:
+        url (str): The URL of the repository.
+        to_path (Path): The directory to clone into.
+        branch (str): The branch or revision to check out.
+        depth (int): Truncate the history to this many commits, 0 for full history.
+        filter_spec (str): Partial clone filter, e.g. "blob:none".
+        sparse (Optional[List[str]]): Directories to check out besides the root files.
+        reference (Optional[Path]): Local mirror of the repository to clone from
+            instead of the URL, objects are hardlinked where possible.
+
+    Returns:
+        git.Repo: The cloned Git repository object.
+    """
+    clone_options = {}
+    if depth:
+        clone_options["depth"] = depth
+        # A shallow clone only contains the history of the cloned branch
+        if branch:
+            clone_options["branch"] = branch
+    if filter_spec:
+        clone_options["filter"] = filter_spec
+    if sparse is not None:
+        clone_options["sparse"] = True
+
+    source = url
+    if reference:
+        # Local clones hardlink objects but ignore --depth and --filter
+        source = reference.as_uri() if depth or filter_spec else str(reference)
+
+    import git  # pylint: disable=C0415
+
+    repo = git.Repo.clone_from(url=source, to_path=to_path, **clone_options)
+    if reference:
+        repo.remotes.origin.set_url(url)
+    if sparse:
+        repo.git.sparse_checkout("set", *sparse)
+    if branch and not depth:
+        repo.git.checkout(branch)
+    if is_tracing():
+        set_attribute("bytes_cloned", get_size(Path(repo.git_dir)))
+    return repo
+
+
+def get_repo_name(repo_url: str) -> Optional[str]:
+    """
+    Get the name of a repository from its Git URL or local path.
+
+    Args:
+        repo_url (str): The Git URL or local path, optionally suffixed by @branch.
+
+    Returns:
+        Optional[str]: The repository name including the @branch suffix, or
+        None if the URL is invalid.
+    """
+    local_path = repo_url.removeprefix("file://")
+    if repo_url.startswith("file://") or Path(local_path.rsplit("@", 1)[0]).is_dir():
+        name = local_path.rstrip("/").rsplit("/", 1)[-1]
+        return name.replace(".git@", "@").removesuffix(".git") or None
+
+    from giturlparse import parse as parse_giturl  # pylint: disable=C0415
+
+    parsed_repo_url = parse_giturl(repo_url, check_domain=False)
+    if not parsed_repo_url.valid:
+        return None
+    return parsed_repo_url.name
+
+
 def validate_package_name(repo_name: str) -> bool:
     """
     Check if a package name is valid (contains only alphanumeric characters and underscores).
@@ -62,64 +161,546 @@ def normalize_package_name(repo_name: str) -> str:
     return normalized_repo_name
 
 
-def update_via_pipx(package_name: str) -> None:
+def _pip_args(pip_args: Optional[List[str]]) -> List[str]:
+    return [f"--pip-args={shlex.join(pip_args)}"] if pip_args else []
+
+
+def _kill_process_group(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_process(
+    command: List[str],
+    prefix: str = "",
+    timeout: Optional[float] = None,
+    log_level: int = logging.INFO,
+) -> Tuple[int, str]:
     """
-    Update a package using pipx.
+    Run a command, streaming its output line by line into the logger.
+
+    The command runs in its own process group. On timeout or when wapp is
+    interrupted the whole group is killed, including processes spawned by
+    the command like pip below pipx.
 
     Args:
-        package_name (str): The name of the package to update.
+        command (List[str]): The command and its arguments.
+        prefix (str): Prepended to every logged line, e.g. the package name
+            to tell concurrent commands apart.
+        timeout (Optional[float]): Seconds before the command is killed,
+            None or 0 to wait forever.
+        log_level (int): The level output lines are logged with.
+
+    Raises:
+        RuntimeError: If the command timed out.
+
+    Returns:
+        Tuple[int, str]: The exit code and the combined output.
     """
-    result = subprocess.run(
-        ["pipx", "update", package_name],
+    process = subprocess.Popen(
+        command,
         encoding="utf-8",
-        check=False,
+        errors="replace",
+        stdin=subprocess.DEVNULL,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
+        start_new_session=True,
     )
-    return result.returncode, result.stdout
+    timed_out = threading.Event()
+
+    def _on_timeout():
+        timed_out.set()
+        _kill_process_group(process)
+
+    timer = None
+    if timeout:
+        timer = threading.Timer(timeout, _on_timeout)
+        timer.daemon = True
+        timer.start()
+
+    lines = []
+    try:
+        for line in process.stdout:
+            line = line.rstrip("\n")
+            lines.append(line)
+            if prefix:
+                logger.log(log_level, "  [%s] %s", prefix, line)
+            else:
+                logger.log(log_level, "  %s", line)
+        retval = process.wait()
+    except BaseException:
+        _kill_process_group(process)
+        process.wait()
+        raise
+    finally:
+        if timer:
+            timer.cancel()
+        process.stdout.close()
 
+    if timed_out.is_set():
+        raise RuntimeError(f'"{command[0]}" timed out after {timeout:.0f}s')
+    return retval, "\n".join(lines)
 
-def install_via_pipx(path: Path) -> str:
+
+@traced("install")
+def install_via_pipx(
+    path: Path,
+    editable: bool = False,
+    force: bool = False,
+    pip_args: Optional[List[str]] = None,
+    prefix: str = "",
+    timeout: Optional[float] = None,
+) -> Tuple[int, str]:
     """
-    Install a package using pipx.
+    Install a package using pipx, streaming its output.
 
     Args:
         path (Path): The path to the package to install.
+        editable (bool): Install the project directory in editable mode.
+        force (bool): Reinstall an already installed package, which is how
+            pipx upgrades a package from a local wheel.
+        pip_args (Optional[List[str]]): Additional arguments passed to pip.
+        prefix (str): Prepended to every logged line of output.
+        timeout (Optional[float]): Seconds before pipx is killed.
+
+    Returns:
+        Tuple[int, str]: The exit code and the output of pipx.
     """
-    result = subprocess.run(
-        ["pipx", "install", path.absolute()],
-        encoding="utf-8",
-        check=False,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-    )
-    return result.returncode, result.stdout
+    command = ["pipx", "install"] + _pip_args(pip_args)
+    if force:
+        command.append("--force")
+    if editable:
+        command.append("--editable")
+    return run_process(command + [str(path.absolute())], prefix, timeout)
+
+
+def get_installer_python(installer: str) -> str:
+    """
+    Get the interpreter the environments of an installer are created with.
+
+    pipx uses $PIPX_DEFAULT_PYTHON or the interpreter it runs on itself,
+    the layered installer the interpreter running wapp.
+
+    Args:
+        installer (str): The installer, "pipx" or "layered".
+
+    Returns:
+        str: The path of the interpreter.
+    """
+    if installer != "pipx":
+        return sys.executable
+    python = os.environ.get("PIPX_DEFAULT_PYTHON")
+    if python:
+        return python
+    pipx = shutil.which("pipx")
+    if not pipx:
+        return sys.executable
+    try:
+        with open(pipx, "r", encoding="utf-8") as f:
+            line = f.readline()
+        shebang = shlex.split(line[2:]) if line.startswith("#!") else []
+    except (OSError, UnicodeDecodeError, ValueError):
+        return sys.executable
+    if shebang and Path(shebang[0]).name == "env":
+        shebang = [shutil.which(shebang[1]) or ""] if len(shebang) > 1 else []
+    if shebang and "python" in Path(shebang[0]).name:
+        return shebang[0]
+    return sys.executable
+
+
+def get_data_dir() -> Path:
+    """
+    Get the directory containing the environments of the layered installer.
+
+    Defaults to $XDG_DATA_HOME/wapp and can be overridden by $WAPP_DATA_DIR.
+
+    Returns:
+        Path: The data directory.
+    """
+    data_dir = os.environ.get("WAPP_DATA_DIR")
+    if data_dir:
+        return Path(data_dir)
+    xdg_data_home = os.environ.get("XDG_DATA_HOME")
+    if xdg_data_home:
+        return Path(xdg_data_home) / "wapp"
+    return Path.home() / ".local" / "share" / "wapp"
+
+
+def get_bin_dir() -> Path:
+    """
+    Get the directory the layered installer links exposed scripts into.
+
+    Defaults to ~/.local/bin like pipx and can be overridden by $WAPP_BIN_DIR.
+
+    Returns:
+        Path: The bin directory.
+    """
+    return Path(os.environ.get("WAPP_BIN_DIR", Path.home() / ".local" / "bin"))
+
+
+def _run(
+    command: List[str], output: List[str], prefix: str, timeout: Optional[float]
+) -> int:
+    retval, command_output = run_process(command, prefix, timeout)
+    output.append(command_output + "\n")
+    return retval
+
+
+def _site_packages(venv_dir: Path) -> Path:
+    version = f"python{sys.version_info.major}.{sys.version_info.minor}"
+    return venv_dir / "lib" / version / "site-packages"
+
+
+def _get_pip_python() -> str:
+    # The environments are created and populated by the interpreter the
+    # layered installer runs pip from
+    python = get_installer_python("layered")
+    if python == sys.executable:
+        import importlib.util  # pylint: disable=C0415
+
+        has_pip = importlib.util.find_spec("pip") is not None
+    else:
+        has_pip = not subprocess.run(
+            [python, "-m", "pip", "--version"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        ).returncode
+    if not has_pip:
+        raise RuntimeError(
+            f"pip is not installed for {python}, the layered installer needs it"
+        )
+    return python
+
+
+def _get_installed(venv_dir: Path) -> List[str]:
+    # Pins of all distributions installed in a venv, from their dist-info
+    pins = []
+    site_packages = _site_packages(venv_dir)
+    if site_packages.is_dir():
+        for path in sorted(site_packages.glob("*.dist-info")):
+            name, _, version = path.name[: -len(".dist-info")].partition("-")
+            pins.append(f"{name}=={version}\n")
+    return pins
+
 
+def _create_venv(
+    venv_dir: Path, output: List[str], prefix: str, timeout: Optional[float]
+) -> int:
+    if (venv_dir / "bin" / "python").exists():
+        return 0
+    command = [_get_pip_python(), "-m", "venv", "--without-pip", str(venv_dir)]
+    return _run(command, output, prefix, timeout)
 
-def build_wheel(path: Path) -> Path:
+
+def _pip_install(
+    venv_dir: Path,
+    args: List[str],
+    pip_args: Optional[List[str]],
+    output: List[str],
+    prefix: str,
+    timeout: Optional[float],
+) -> int:
+    retval = _create_venv(venv_dir, output, prefix, timeout)
+    if retval:
+        return retval
+    command = [_get_pip_python(), "-m", "pip", "--disable-pip-version-check"]
+    command += ["--python", str(venv_dir / "bin" / "python"), "install"]
+    return _run(command + list(pip_args or []) + args, output, prefix, timeout)
+
+
+@traced("install")
+def install_via_layers(
+    package_name: str,
+    path: Path,
+    requirements_path: Path,
+    script_names: List[str],
+    editable: bool = False,
+    pip_args: Optional[List[str]] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[int, str]:
+    """
+    Install or upgrade a package on top of a shared base environment.
+
+    Dependencies are installed once into the base environment shared by
+    all layered packages, each package gets a venv chained to the base
+    environment by a .pth file. Distributions installed in the base
+    environment are never upgraded or downgraded: requirements differing
+    from the base requirements, and new requirements which cannot be
+    resolved without changing the base, are installed into the venv of the
+    package, taking precedence over the base. Exposed scripts are linked
+    into the bin directory.
+
+    Args:
+        package_name (str): The name of the wrapped package.
+        path (Path): The wheel or, for editable installs, the project directory.
+        requirements_path (Path): The requirements file of the wrapped package.
+        script_names (List[str]): The link names of the exposed scripts.
+        editable (bool): Install the project directory in editable mode.
+        pip_args (Optional[List[str]]): Additional arguments passed to pip.
+        timeout (Optional[float]): Seconds before each pip run is killed.
+
+    Raises:
+        RuntimeError: If pip is not available.
+
+    Returns:
+        Tuple[int, str]: The exit code and the output of the installation.
+    """
+    from wapp.files.requirements import Requirements  # pylint: disable=C0415
+
+    data_dir = get_data_dir()
+    data_dir.mkdir(parents=True, exist_ok=True)
+    base_dir = data_dir / "base"
+    venv_dir = data_dir / "venvs" / package_name
+    output = []  # type: List[str]
+
+    requirements = Requirements()
+    if requirements_path.is_file():
+        requirements = Requirements.from_config(requirements_path)
+
+    with DirectoryLock(data_dir, "base.lock", blocking=True):
+        base_requirements_path = base_dir / "wapp-requirements.txt"
+        base_requirements = Requirements()
+        if base_requirements_path.is_file():
+            base_requirements = Requirements.from_config(base_requirements_path)
+
+        conflicts = base_requirements.get_conflicts(requirements)
+        if conflicts:
+            logger.warning(
+                "Requirements %s conflict with the base environment, installing them into the venv of %s",
+                ", ".join(conflicts),
+                package_name,
+            )
+
+        missing = Requirements()
+        layer = Requirements()
+        for key, requirement in requirements.merge().items():
+            base_requirement = base_requirements.conf.get(key)
+            if base_requirement is None:
+                missing.conf[key] = requirement
+            elif str(base_requirement) != str(requirement):
+                layer.conf[key] = requirement
+        if missing.conf:
+            merged = Requirements(base_requirements.conf)
+            merged.conf.update(missing.conf)
+            candidate_path = base_dir.with_name("base-requirements.txt.tmp")
+            merged.write(candidate_path)
+            # Installed distributions keep their versions
+            pins_path = base_dir.with_name("base-constraints.txt.tmp")
+            pins_path.write_text("".join(_get_installed(base_dir)), encoding="utf-8")
+            retval = _pip_install(
+                base_dir,
+                ["-r", str(candidate_path), "-c", str(pins_path)],
+                pip_args,
+                output,
+                package_name,
+                timeout,
+            )
+            pins_path.unlink()
+            if retval:
+                logger.warning(
+                    "Requirements of %s cannot be installed without changing the base environment, installing them into its venv",
+                    package_name,
+                )
+                layer.conf.update(missing.conf)
+                candidate_path.unlink()
+            else:
+                os.replace(candidate_path, base_requirements_path)
+
+    # The package venv takes precedence over the chained base environment,
+    # pip resolves the requirements of the package against both
+    retval = _create_venv(venv_dir, output, package_name, timeout)
+    if retval:
+        return retval, "".join(output)
+    base_pth = _site_packages(venv_dir) / "_wapp_base.pth"
+    base_pth.parent.mkdir(parents=True, exist_ok=True)
+    base_pth.write_text(f"{_site_packages(base_dir)}\n", encoding="utf-8")
+    if layer.conf:
+        layer_path = venv_dir / "wapp-requirements.txt"
+        layer.write(layer_path)
+        retval = _pip_install(
+            venv_dir, ["-r", str(layer_path)], pip_args, output, package_name, timeout
+        )
+        if retval:
+            return retval, "".join(output)
+
+    args = ["--upgrade", "--force-reinstall", "--no-deps"]
+    args += ["-e", str(path)] if editable else [str(path)]
+    retval = _pip_install(venv_dir, args, pip_args, output, package_name, timeout)
+    if retval:
+        return retval, "".join(output)
+
+    bin_dir = get_bin_dir()
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    for script_name in script_names:
+        link = bin_dir / script_name
+        if link.exists() and not link.is_symlink():
+            logger.warning("  [%s] Not overwriting %s", package_name, link)
+            output.append(f"Not overwriting {link}\n")
+            continue
+        link.unlink(missing_ok=True)
+        link.symlink_to(venv_dir / "bin" / script_name)
+        logger.info("  [%s] Linked %s", package_name, link)
+        output.append(f"Linked {link}\n")
+    return retval, "".join(output)
+
+
+@traced("build_wheel")
+def build_wheel(
+    path: Path,
+    cache_key: Optional[str] = None,
+    backend: str = "setuptools",
+    before_build: Optional[Callable[[], Any]] = None,
+) -> Path:
     """
     Build a wheel for the package at the given path.
 
     Args:
         path (Path): The path to the package directory.
+        cache_key (Optional[str]): Look up and store the wheel in the wheel
+            cache under this key.
+        backend (str): Build through the "setuptools" build backend or write
+            the wheel directly with the "native" writer.
+        before_build (Optional[Callable[[], Any]]): Called before building,
+            skipped when the wheel is taken from the wheel cache.
 
     Returns:
         Path: The path to the built wheel file.
     """
-    builder = ProjectBuilder(path)
     out_dir = path / "dist"
-    builder.build("wheel", output_directory=out_dir)
-    wheel = list(out_dir.iterdir())[0]
+    if cache_key:
+        cached_wheel = get_cached_wheel(cache_key)
+        if cached_wheel:
+            logger.info("Using cached wheel %s", cached_wheel.name)
+            out_dir.mkdir(parents=True, exist_ok=True)
+            wheel = out_dir / cached_wheel.name
+            # A wheel of the same name may have been built from other files
+            if not wheel.exists() or not filecmp.cmp(
+                cached_wheel, wheel, shallow=False
+            ):
+                shutil.copy2(cached_wheel, wheel)
+            set_attribute("cache_hit", True)
+            set_attribute("wheel_size", wheel.stat().st_size)
+            return wheel
+
+    if before_build:
+        before_build()
+    if backend == "native":
+        from wapp.wheel_writer import WheelWriter  # pylint: disable=C0415
+
+        wheel = WheelWriter(path).write(out_dir)
+    elif backend == "setuptools":
+        from build import ProjectBuilder  # pylint: disable=C0415
+
+        # setuptools never prunes its build tree, removed modules would linger
+        shutil.rmtree(path / "build", ignore_errors=True)
+        builder = ProjectBuilder(path)
+        wheel = Path(builder.build("wheel", output_directory=out_dir))
+    else:
+        raise RuntimeError(f'Unknown build backend "{backend}"')
+    if cache_key:
+        store_wheel(cache_key, wheel)
+    set_attribute("backend", backend)
+    set_attribute("wheel_size", wheel.stat().st_size)
     return wheel
 
 
-def is_python_file(path: Path) -> bool:
-    if path.is_file():
-        if path.suffix == ".py":
-            return True
-        else:
-            with open(str(path.resolve()), "r", errors='ignore') as file:
-                if "#!/usr/bin/env python" in file.readline():
-                    return True
-    return False
-        
\ No newline at end of file
+def log_wheel_size_report(wheel_path: Path, top: int = 10):
+    """
+    Log the largest contributors to the size of a wheel, grouped by the
+    top-level files and directories of the wrapped repo.
+
+    Args:
+        wheel_path (Path): The path to the wheel file.
+        top (int): The number of contributors to log.
+    """
+    sizes = {}  # type: Dict[str, List[int]]
+    with zipfile.ZipFile(wheel_path) as archive:
+        for info in archive.infolist():
+            parts = info.filename.split("/")
+            if parts[0].endswith(".dist-info"):
+                name = parts[0]
+            else:
+                # wrapped_<package>/<package>/<entry>/...
+                name = "/".join(parts[:3])
+            size = sizes.setdefault(name, [0, 0])
+            size[0] += info.compress_size
+            size[1] += info.file_size
+
+    logger.info(
+        "Wheel size: %s (%d contributors)",
+        format_size(wheel_path.stat().st_size),
+        len(sizes),
+    )
+    for name, (compressed, uncompressed) in sorted(
+        sizes.items(), key=lambda item: item[1][0], reverse=True
+    )[:top]:
+        logger.info(
+            "  %10s %10s  %s", format_size(compressed), format_size(uncompressed), name
+        )
+
+
+class DirectoryLock:
+    """
+    Advisory lock on a wrapped project directory, preventing concurrent wapp
+    runs from modifying the same project.
+
+    Attributes:
+        path (Path): The path of the lock file.
+    """
+
+    LOCK_NAME = ".wapp.lock"
+
+    def __init__(
+        self, directory: Path, name: str = LOCK_NAME, blocking: bool = False
+    ) -> None:
+        """
+        Initializes a new DirectoryLock instance.
+
+        Args:
+            directory (Path): The directory to be locked.
+            name (str): The name of the lock file inside the directory.
+            blocking (bool): Wait for other processes instead of failing.
+        """
+        self.path = directory / name
+        self.blocking = blocking
+        self._fd = None  # type: Optional[int]
+
+    def acquire(self):
+        """
+        Acquires the lock.
+
+        Raises:
+            RuntimeError: If the lock is not blocking and held by another process.
+        """
+        operation = fcntl.LOCK_EX
+        if not self.blocking:
+            operation |= fcntl.LOCK_NB
+
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+        except BlockingIOError as e:
+            os.close(fd)
+            raise RuntimeError(
+                f'"{self.path.parent}" is locked by another wapp process'
+            ) from e
+        self._fd = fd
+
+    def release(self):
+        """
+        Releases the lock if it is held.
+        """
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "DirectoryLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
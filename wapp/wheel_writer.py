@@ -0,0 +1,235 @@
+import base64
+import csv
+import fnmatch
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from wapp.files.pyproject import Pyproject
+from wapp.filters import is_package_data_excluded
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+WHEEL_SRC = """Wheel-Version: 1.0
+Generator: wapp
+Root-Is-Purelib: true
+Tag: py3-none-any
+"""
+
+
+def _escape(name: str) -> str:
+    return re.sub(r"[-_.]+", "_", name)
+
+
+def _record_hash(digest: bytes) -> str:
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def _read_dependencies(path: Path) -> List[str]:
+    if not path.is_file():
+        return []
+    dependencies = []
+    with open(str(path), "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split(" #", 1)[0].strip()
+            if line and not line.startswith(("#", "-")):
+                dependencies.append(line)
+    return dependencies
+
+
+def _is_package(rel_dir: str, exclude_packages: List[str]) -> bool:
+    parts = rel_dir.split("/")
+    if any("." in part for part in parts):
+        return False
+    name = ".".join(parts)
+    return not any(fnmatch.fnmatchcase(name, pattern) for pattern in exclude_packages)
+
+
+def iter_package_files(
+    src_dir: Path,
+    exclude_package_data: Optional[List[str]] = None,
+    exclude_packages: Optional[List[str]] = None,
+) -> Iterator[Tuple[Path, str]]:
+    """
+    Iterate over all files below src_dir which are packaged into the wheel.
+
+    Mirrors the setuptools backend: hidden files and directories are skipped
+    like by the package-data globs, exclude-package-data patterns do not
+    apply to Python modules of discovered packages.
+
+    Args:
+        src_dir (Path): The src directory of the wrapped project.
+        exclude_package_data (Optional[List[str]]): The exclude-package-data
+            patterns of the wrapped project.
+        exclude_packages (Optional[List[str]]): The packages excluded from
+            package discovery.
+
+    Yields:
+        Tuple[Path, str]: The path of each file and its name inside the wheel.
+    """
+    exclude_package_data = exclude_package_data or []
+    exclude_packages = exclude_packages or []
+    for dirpath, dirnames, filenames in os.walk(src_dir):
+        # Skip leftovers of the setuptools backend
+        dirnames[:] = sorted(
+            d for d in dirnames if not d.startswith(".") and not d.endswith(".egg-info")
+        )
+        rel_dir = Path(dirpath).relative_to(src_dir).as_posix()
+        is_package = rel_dir != "." and _is_package(rel_dir, exclude_packages)
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            path = Path(dirpath) / filename
+            arcname = path.relative_to(src_dir).as_posix()
+            if not path.is_file():
+                continue
+            if not (is_package and filename.endswith(".py")) and (
+                is_package_data_excluded(arcname, exclude_package_data)
+            ):
+                continue
+            yield path, arcname
+
+
+class WheelWriter:
+    """
+    Writes a wheel directly from a wrapped project, bypassing the
+    setuptools build backend. Files are streamed from src/ into the archive
+    while their RECORD hashes are computed.
+
+    Attributes:
+        path (Path): The path to the wrapped project directory.
+        pyproject (Pyproject): The pyproject.toml of the wrapped project.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """
+        Initializes a new WheelWriter instance.
+
+        Args:
+            path (Path): The path to the wrapped project directory.
+        """
+        self.path = path
+        self.pyproject = Pyproject.from_config(path / "pyproject.toml")
+        self._records = []  # type: List[Tuple[str, str, int]]
+
+    @property
+    def dist_info(self) -> str:
+        return f"{_escape(self.pyproject.name)}-{self.pyproject.version}.dist-info"
+
+    @property
+    def wheel_name(self) -> str:
+        return (
+            f"{_escape(self.pyproject.name)}-{self.pyproject.version}-py3-none-any.whl"
+        )
+
+    def _metadata(self) -> str:
+        lines = [
+            "Metadata-Version: 2.1",
+            f"Name: {self.pyproject.name}",
+            f"Version: {self.pyproject.version}",
+        ]
+        for dependency in _read_dependencies(self.path / "requirements.txt"):
+            lines.append(f"Requires-Dist: {dependency}")
+        return "\n".join(lines) + "\n"
+
+    def _entry_points(self) -> str:
+        lines = ["[console_scripts]"]
+        for link_name, entry_point in self.pyproject.conf["project"][
+            "scripts"
+        ].items():
+            lines.append(f"{link_name} = {entry_point}")
+        return "\n".join(lines) + "\n"
+
+    def _top_level(self, src_dir: Path) -> str:
+        names = sorted(
+            path.name
+            for path in src_dir.iterdir()
+            if path.is_dir() and not path.name.endswith(".egg-info")
+        )
+        return "\n".join(names) + "\n"
+
+    def _write_file(self, archive: zipfile.ZipFile, path: Path, arcname: str):
+        zip_info = zipfile.ZipInfo.from_file(path, arcname)
+        zip_info.compress_type = zipfile.ZIP_DEFLATED
+        digest = hashlib.sha256()
+        size = 0
+        with open(str(path), "rb") as src, archive.open(
+            zip_info, "w", force_zip64=zip_info.file_size > 0x7FFFFFFF
+        ) as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+        self._records.append((arcname, _record_hash(digest.digest()), size))
+
+    def _write_str(self, archive: zipfile.ZipFile, arcname: str, content: str):
+        data = content.encode("utf-8")
+        archive.writestr(arcname, data, compress_type=zipfile.ZIP_DEFLATED)
+        self._records.append(
+            (arcname, _record_hash(hashlib.sha256(data).digest()), len(data))
+        )
+
+    def write(self, out_dir: Path) -> Path:
+        """
+        Writes the wheel into out_dir.
+
+        Args:
+            out_dir (Path): The directory the wheel is written to.
+
+        Returns:
+            Path: The path to the written wheel file.
+        """
+        src_dir = self.path / "src"
+        out_dir.mkdir(parents=True, exist_ok=True)
+        wheel_path = out_dir / self.wheel_name
+        self._records = []
+
+        fd, tmp_name = tempfile.mkstemp(suffix=".whl.tmp", dir=out_dir)
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(tmp_name, "w") as archive:
+                for path, arcname in iter_package_files(
+                    src_dir,
+                    self.pyproject.exclude_package_data,
+                    self.pyproject.exclude_packages,
+                ):
+                    self._write_file(archive, path, arcname)
+
+                self._write_str(
+                    archive, f"{self.dist_info}/METADATA", self._metadata()
+                )
+                self._write_str(archive, f"{self.dist_info}/WHEEL", WHEEL_SRC)
+                self._write_str(
+                    archive,
+                    f"{self.dist_info}/entry_points.txt",
+                    self._entry_points(),
+                )
+                self._write_str(
+                    archive, f"{self.dist_info}/top_level.txt", self._top_level(src_dir)
+                )
+
+                record = io.StringIO()
+                writer = csv.writer(record, lineterminator="\n")
+                writer.writerows(self._records)
+                writer.writerow((f"{self.dist_info}/RECORD", "", ""))
+                archive.writestr(
+                    f"{self.dist_info}/RECORD",
+                    record.getvalue(),
+                    compress_type=zipfile.ZIP_DEFLATED,
+                )
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, wheel_path)
+        finally:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+
+        logger.debug("Created %s", wheel_path)
+        return wheel_path